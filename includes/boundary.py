@@ -0,0 +1,133 @@
+import datetime
+import logging
+from abc import ABC, abstractmethod
+from typing import Tuple
+import includes.common as common
+import includes.exceptions as exceptions
+from includes.sequence_number import SequenceNumber
+
+log = logging.getLogger(__name__)
+
+SEQUENCE_NUMBER_POSITIONS = ['AT_SEQUENCE_NUMBER', 'AFTER_SEQUENCE_NUMBER', 'BEFORE_SEQUENCE_NUMBER']
+TIMESTAMP_POSITIONS = ['AT_TIMESTAMP', 'AFTER_TIMESTAMP', 'BEFORE_TIMESTAMP']
+
+
+class EndingBoundary(ABC):
+    """
+    Finds where the records of a shard stop matching the configured ending_position. Batches must be passed in the
+    order they were read, as a boundary may span more than one get_records() response.
+    """
+
+    def __init__(self, position: str):
+        self._position = position
+
+    @property
+    def position(self) -> str:
+        return self._position
+
+    @abstractmethod
+    def cut(self, records: list) -> Tuple[int, bool]:
+        """
+        :param records: The records of a get_records() response, in shard order
+        :return: How many of the leading records are within the boundary, and whether the boundary was reached, in
+                 which case no later record of the shard is within it either
+        """
+        ...
+
+
+class SequenceNumberBoundary(EndingBoundary):
+    """
+    AT_SEQUENCE_NUMBER: Up to and including the sequence number
+    AFTER_SEQUENCE_NUMBER: Up to and including the sequence number, plus the very next record
+    BEFORE_SEQUENCE_NUMBER: Up to the record directly preceding the sequence number
+
+    The sequence number does not have to exist in the shard: the first greater sequence number also ends the scrape.
+    """
+
+    def __init__(self, position: str, sequence_number: str | int | SequenceNumber):
+        if position not in SEQUENCE_NUMBER_POSITIONS:
+            raise exceptions.InvalidArgumentException(
+                f"position must be one of: {repr(SEQUENCE_NUMBER_POSITIONS)}. Received: {common.type_repr(position)}")
+        super().__init__(position)
+        self._sequence_number = SequenceNumber(sequence_number)
+        # Set once the sequence number was read with AFTER_SEQUENCE_NUMBER, the record following it being the last one
+        self._include_next = False
+
+    def cut(self, records: list) -> Tuple[int, bool]:
+        for i, record in enumerate(records):
+            if self._include_next:
+                return i + 1, True
+
+            sequence_number = SequenceNumber(record.SequenceNumber)
+            if self._position == 'BEFORE_SEQUENCE_NUMBER':
+                if sequence_number >= self._sequence_number:
+                    return i, True
+            elif self._position == 'AT_SEQUENCE_NUMBER':
+                if sequence_number == self._sequence_number:
+                    return i + 1, True
+                if sequence_number > self._sequence_number:
+                    return i, True
+            else:
+                if sequence_number == self._sequence_number:
+                    self._include_next = True
+                elif sequence_number > self._sequence_number:
+                    return i + 1, True
+        return len(records), False
+
+
+class TimestampBoundary(EndingBoundary):
+    """
+    Compares ApproximateArrivalTimestamp (in UTC, to the second) against the ending timestamp:
+    AT_TIMESTAMP: Up to and including the first contiguous set of records at the timestamp
+    AFTER_TIMESTAMP: Up to and including the first contiguous set of records later than the timestamp
+    BEFORE_TIMESTAMP: Up to the first record at or later than the timestamp
+    """
+
+    def __init__(self, position: str, timestamp: str | datetime.datetime):
+        if position not in TIMESTAMP_POSITIONS:
+            raise exceptions.InvalidArgumentException(
+                f"position must be one of: {repr(TIMESTAMP_POSITIONS)}. Received: {common.type_repr(position)}")
+        super().__init__(position)
+        self._timestamp = to_utc_second(timestamp)
+        # Timestamp of the contiguous set of records currently being read up to its end
+        self._set_timestamp = None
+
+    def cut(self, records: list) -> Tuple[int, bool]:
+        for i, record in enumerate(records):
+            timestamp = to_utc_second(record.ApproximateArrivalTimestamp)
+            if self._set_timestamp is not None:
+                if timestamp != self._set_timestamp:
+                    return i, True
+                continue
+
+            if self._position == 'BEFORE_TIMESTAMP':
+                if timestamp >= self._timestamp:
+                    return i, True
+            elif self._position == 'AT_TIMESTAMP':
+                if timestamp == self._timestamp:
+                    self._set_timestamp = timestamp
+                elif timestamp > self._timestamp:
+                    return i, True
+            elif timestamp > self._timestamp:
+                self._set_timestamp = timestamp
+        return len(records), False
+
+
+def to_utc_second(timestamp: str | datetime.datetime) -> datetime.datetime:
+    """Returns the timestamp as a naive UTC datetime without microseconds. Naive timestamps are assumed to be UTC."""
+    if isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    common.require_type(timestamp, datetime.datetime, exceptions.InvalidArgumentException)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return timestamp.replace(microsecond=0)
+
+
+def new_ending_boundary(position: str, *, sequence_number: str | int | SequenceNumber | None,
+                        timestamp: str | datetime.datetime | None) -> EndingBoundary | None:
+    """Returns None for ending positions not bound to a point of the shard (TOTAL_RECORDS_PER_SHARD and LATEST)."""
+    if position in SEQUENCE_NUMBER_POSITIONS:
+        return SequenceNumberBoundary(position, sequence_number)
+    if position in TIMESTAMP_POSITIONS:
+        return TimestampBoundary(position, timestamp)
+    return None
@@ -0,0 +1,177 @@
+import os
+import re
+import json
+import datetime
+import logging
+from typing import Callable, Optional, Union
+import includes.common as common
+import includes.exceptions as exceptions
+from includes.sequence_number import SequenceNumber
+
+log = logging.getLogger(__name__)
+
+
+class ShardCheckpoint(common.BaseCommonClass):
+    def __init__(self, passed_data: Union[dict, str]):
+        self._shard_id = None
+        self._sequence_number = None
+        self._total_found_records = None
+        self._record_count = None
+        self._output_position = None
+        self._completed = False
+        self._updated_at = None
+
+        # Have to call parent after defining attributes
+        super().__init__(passed_data)
+
+    @classmethod
+    def _add_props(cls, proprules: common.PropRules) -> None:
+        proprules.add_prop("shard_id", types=[str])
+        proprules.add_prop("sequence_number", types=[str])
+        proprules.add_prop("total_found_records", types=[int], numeric_positive=True)
+        proprules.add_prop("record_count", types=[int], numeric_positive=True)
+        proprules.add_prop("output_position", types=[str, type(None)])
+        proprules.add_prop("completed", types=[bool])
+
+    @property
+    def shard_id(self) -> str:
+        return self._shard_id
+
+    @property
+    def sequence_number(self) -> str:
+        """The sequence number of the last record read from the shard, written to disk or not (e.g. filtered out)."""
+        return self._sequence_number
+
+    @property
+    def total_found_records(self) -> int:
+        """The number of records read from the shard so far."""
+        return self._total_found_records
+
+    @property
+    def record_count(self) -> int:
+        """The number of records written to the shard's output directory so far."""
+        return self._record_count
+
+    @property
+    def output_position(self) -> Optional[str]:
+        """Where the record writer was in its output when the checkpoint was taken (see RecordWriter.position)."""
+        return self._output_position
+
+    @property
+    def completed(self) -> bool:
+        return self._completed
+
+    @property
+    def updated_at(self) -> Optional[str]:
+        return self._updated_at
+
+    def _is_valid(self):
+        super()._is_valid()
+        try:
+            SequenceNumber(self._sequence_number)
+        except ValueError as ex:
+            raise exceptions.InvalidArgumentException(f"Invalid checkpoint sequence_number: {ex}") from ex
+
+    def toJson(self, *, indent: Optional[Union[int, None]] = None) -> str:
+        return json.dumps({
+            "shard_id": self.shard_id,
+            "sequence_number": self.sequence_number,
+            "total_found_records": self.total_found_records,
+            "record_count": self.record_count,
+            "output_position": self.output_position,
+            "completed": self.completed,
+            "updated_at": self.updated_at,
+        }, indent=indent, default=str)
+
+
+class CheckpointStore:
+    """
+    Reads and writes one checkpoint file per shard at checkpoints/<stream_name>/<shard_id>.json.
+    Checkpoints are written to a temporary file first and then renamed over the previous one, so a crash mid-write
+    always leaves either the previous or the new checkpoint in place, never a partial file.
+    """
+
+    def __init__(self, stream_name: str, *, base_dir: str = 'checkpoints'):
+        common.require_type(stream_name, str, exceptions.InvalidArgumentException)
+        # Safety: We strip all but safe characters before creating any files/dirs
+        self._dir_path = f"{base_dir}/{re.sub(r'[^A-Za-z0-9-_.]', '', stream_name)}"
+
+    @property
+    def dir_path(self) -> str:
+        return self._dir_path
+
+    def load(self, shard_id: str) -> Optional[ShardCheckpoint]:
+        filename_uri = self._file_path(shard_id)
+        if not os.path.exists(filename_uri):
+            return None
+        with open(filename_uri, 'r') as f:
+            contents = f.read()
+        try:
+            return ShardCheckpoint(contents)
+        except Exception as ex:
+            raise exceptions.FileProcessingError(
+                f"The checkpoint file '{filename_uri}' is not in the expected format. Please correct or remove the "
+                f"file to continue scraping. Detailed error: {ex}") from ex
+
+    def save(self, checkpoint: ShardCheckpoint) -> None:
+        common.require_type(checkpoint, ShardCheckpoint, exceptions.InvalidArgumentException)
+        if not os.path.exists(self._dir_path):
+            os.makedirs(self._dir_path)
+
+        filename_uri = self._file_path(checkpoint.shard_id)
+        with open(f"{filename_uri}.tmp", 'w') as f:
+            f.write(checkpoint.toJson(indent=4))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{filename_uri}.tmp", filename_uri)
+        log.debug(f"Checkpoint saved for shard {checkpoint.shard_id}: {checkpoint.sequence_number}")
+
+    def _file_path(self, shard_id: str) -> str:
+        common.require_type(shard_id, str, exceptions.InvalidArgumentException)
+        return f"{self._dir_path}/{re.sub(r'[^A-Za-z0-9-_]', '', shard_id)}.json"
+
+
+class CheckpointTracker:
+    """
+    Follows the batches written for a single shard and saves a checkpoint every `interval` written batches.
+    Only ever advanced after a batch is written, and sync (if passed) is called before every save to force the written
+    records to disk, so the saved checkpoint never points past data lost in a crash.
+    """
+
+    def __init__(self, store: CheckpointStore, shard_id: str, interval: int, *,
+                 sync: Optional[Callable[[], None]] = None):
+        common.require_type(store, CheckpointStore, exceptions.InvalidArgumentException)
+        common.require_type(shard_id, str, exceptions.InvalidArgumentException)
+        common.require_type(interval, int, exceptions.InvalidArgumentException)
+        self._store = store
+        self._shard_id = shard_id
+        self._interval = interval
+        self._sync = sync
+        self._batches_since_save = 0
+        self._latest = None
+
+    def batch_written(self, *, sequence_number: str, total_found_records: int, record_count: int,
+                      output_position: Optional[str]) -> None:
+        self._latest = {
+            "shard_id": self._shard_id,
+            "sequence_number": sequence_number,
+            "total_found_records": total_found_records,
+            "record_count": record_count,
+            "output_position": output_position,
+        }
+        self._batches_since_save += 1
+        if self._batches_since_save >= self._interval:
+            self.flush()
+
+    def flush(self, *, completed: bool = False) -> None:
+        """Saves the latest written batch, if it has not been saved yet (or to flag the shard as completed)."""
+        if self._latest is None or (self._batches_since_save == 0 and not completed):
+            return
+        if self._sync is not None:
+            self._sync()
+        self._store.save(ShardCheckpoint({
+            **self._latest,
+            "completed": completed,
+            "updated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }))
+        self._batches_since_save = 0
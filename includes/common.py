@@ -14,6 +14,71 @@ from typing import Type
 log = logging.getLogger()
 
 
+class ClassSchema:
+    """
+    The attributes of a BaseSuperclass subclass, worked out once from its first instance and shared by all of them:
+    - fields: The backing attribute each passed data key is loaded into (e.g. "stream_name" -> "_stream_name")
+    - public_names: The public non-callable attributes (properties included), as listed by __str__/__repr__ and
+      compared by __eq__/__hash__
+    """
+
+    def __init__(self, obj: object):
+        cls = type(obj)
+        instance_attribs = {name: value for name, value in vars(obj).items() if not callable(value)}
+        public_names = set([i for i in instance_attribs if i[0:1] != '_'])
+        for name in dir(cls):
+            if name[0:1] == '_':
+                continue
+            class_attrib = getattr(cls, name)
+            if isinstance(class_attrib, property) or not callable(class_attrib):
+                public_names.add(name)
+        self._public_names = sorted(public_names)
+
+        # We first look for hidden _ prefixed versions of the values, so we can define property decorators. Otherwise,
+        # the standard attribute names. Callables are never loaded into, so a key cannot overwrite __del__ or a method
+        self._fields = {}
+        for name in instance_attribs:
+            if name[0:1] == '_' and name[1:2] != '_':
+                self._fields[name[1:]] = name
+        for name in self._public_names:
+            self._fields.setdefault(name, name)
+
+    @property
+    def fields(self) -> dict:
+        return self._fields
+
+    @property
+    def public_names(self) -> list:
+        return self._public_names
+
+    def values(self, obj: object) -> tuple:
+        return tuple([getattr(obj, i) for i in self._public_names])
+
+
+# ClassSchemas, keyed by class (see schema_of())
+_class_schemas = {}
+
+
+def schema_of(obj: object) -> ClassSchema:
+    schema = _class_schemas.get(type(obj))
+    if schema is None:
+        schema = ClassSchema(obj)
+        _class_schemas[type(obj)] = schema
+    return schema
+
+
+def hashable(value) -> object:
+    """Returns value, with lists turned into tuples and dicts and sets into frozensets (nested too), so it hashes."""
+    if isinstance(value, (list, tuple)):
+        return tuple([hashable(i) for i in value])
+    if isinstance(value, dict):
+        # Dicts compare equal whatever their key order, so they must hash the same too
+        return frozenset([(k, hashable(v)) for k, v in value.items()])
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
 # Abstract class that allows population of pre-defined attributes from a passed dict or json
 class BaseSuperclass(ABC):
     @abstractmethod
@@ -33,17 +98,11 @@ class BaseSuperclass(ABC):
             return
         try:
             passed_data = json_or_dict_or_obj_to_dict(passed_data)
+            fields = schema_of(self).fields
             for key in passed_data:
-                # We make SURE to ensure it's not callable, so they don't try to overwrite __del__
-                # or something by naming a key that is a method as opposed to a property
-
-                # We first check if we have hidden _ prefixed versions of the values, so we can define property
-                # decorators. Otherwise, look for the standard attribute names
-                if hasattr(self, "_" + key) and not callable(getattr(self, "_" + key)):
-                    setattr(self, "_" + key, passed_data[key])
-                else:
-                    if hasattr(self, key) and not callable(getattr(self, key)):
-                        setattr(self, key, passed_data[key])
+                attrib = fields.get(key)
+                if attrib is not None:
+                    setattr(self, attrib, passed_data[key])
         except Exception as ex:
             raise ValueError(f"Could not convert passed_data to a dict. passed_data: {repr(passed_data)}") from ex
 
@@ -54,52 +113,51 @@ class BaseCommonClass(BaseSuperclass):
     def __init__(self, passed_data: dict | str = None):
         # Define the default attributes
         if not hasattr(self, '_proprules'):
-            self._proprules = PropRules()
+            self._proprules = self._class_proprules()
         # Have to call parent after defining attributes to populate them
         super().__init__(passed_data)
         self._is_valid()
         self._post_init_processing()
 
+    @classmethod
+    def _class_proprules(cls) -> 'PropRules':
+        # The rules are the same for every object of a class, so they (and their compiled validator) are only built
+        # once per class
+        proprules = cls.__dict__.get('_proprules_of_class')
+        if proprules is None:
+            proprules = PropRules()
+            cls._add_props(proprules)
+            cls._proprules_of_class = proprules
+        return proprules
+
+    @classmethod
+    def _add_props(cls, proprules: 'PropRules') -> None:
+        """Adds the validation rules of the class. Objects setting their own self._proprules skip these."""
+        pass
+
     def _is_valid(self):
         self._is_valid_proprules()
 
     def _is_valid_proprules(self) -> None:
-        attribs = {}
-        for item in dir(self):
-            if not callable(getattr(self, item)):
-                attribs[item] = getattr(self, item)
-        self._proprules.validate(attribs)
+        self._proprules.validate(self._proprules.attribs_of(self))
+
     def _post_init_processing(self):
         del self._base_superclass_passed_data
 
     def __str__(self):
-        attribs = []
-        for item in dir(self):
-            if callable(getattr(self, item)) or item[0:1] == '_':
-                continue
-            attribs.append(item)
-
-        attrib_pairs = []
-        for item in attribs:
-            attrib_pairs.append(f"{item}={getattr(self, item)}")
-
-        return ','.join(map(str, attrib_pairs))
+        return ','.join([f"{i}={getattr(self, i)}" for i in schema_of(self).public_names])
 
     def __repr__(self):
-        attribs = []
-        for item in dir(self):
-            if callable(getattr(self, item)) or item[0:1] == '_':
-                continue
-            attribs.append(item)
-
-        attrib_pairs = []
-        for item in attribs:
-            attrib_pairs.append(f"{item}={repr(getattr(self, item))}")
-
-        return ','.join(map(str, attrib_pairs))
+        return ','.join([f"{i}={repr(getattr(self, i))}" for i in schema_of(self).public_names])
 
     def __eq__(self, other):
-        return repr(self) == repr(other)
+        if type(self) is not type(other):
+            return NotImplemented
+        schema = schema_of(self)
+        return schema.values(self) == schema.values(other)
+
+    def __hash__(self):
+        return hash((type(self), hashable(schema_of(self).values(self))))
 
 
 class Collection(ABC):
@@ -142,7 +200,12 @@ class Collection(ABC):
         return output
 
     def __eq__(self, other):
-        return repr(self) == repr(other)
+        if type(self) is not type(other):
+            return NotImplemented
+        return self._items == other._items
+
+    # The items of a collection can change, so it can't be hashed
+    __hash__ = None
 
 
 class RestrictedCollection(Collection):
@@ -171,6 +234,8 @@ class PropRules:
         self._numeric_positive: dict = {}
         self._populated: dict = {}
         self._regexp: dict = {}
+        self._validator = None
+        self._prop_names = None
 
     def add_prop(self, prop_name: str,
                  enums: list | None = None,
@@ -211,6 +276,10 @@ class PropRules:
             If not specified, any value is allowed unless another rule adds a condition.
         """
 
+        # Rules changed, the validator is compiled again when next needed
+        self._validator = None
+        self._prop_names = None
+
         if enums is not None:
             self._enums[prop_name] = enums
 
@@ -229,152 +298,155 @@ class PropRules:
         if numeric_positive is not None:
             self._numeric_positive[prop_name] = numeric_positive
 
-    def validate(self, attribs=None, orig_passed_data: str = None):
-        # Drop the special attribs if set
-        if "_proprules" in attribs.keys():
-            del attribs["_proprules"]
-        if "__dict__" in attribs.keys():
-            del attribs["__dict__"]
+    def prop_names(self) -> list:
+        """The names of every property that has at least one rule."""
+        if self._prop_names is None:
+            names = []
+            for rules in [self._populated, self._enums, self._types, self._numeric, self._numeric_positive,
+                          self._regexp]:
+                names.extend([i for i in rules if i not in names])
+            self._prop_names = names
+        return list(self._prop_names)
+
+    def attribs_of(self, obj: object) -> dict:
+        """
+        Returns the non-callable values of the properties with rules, read from obj. Unlike walking dir(obj), only the
+        properties being validated are evaluated.
+        """
+        attribs = {}
+        if self._prop_names is None:
+            self.prop_names()
+        for name in self._prop_names:
+            try:
+                value = getattr(obj, name)
+            except AttributeError:
+                continue
+            if not callable(value):
+                attribs[name] = value
+        return attribs
 
+    def validate(self, attribs=None, orig_passed_data: str = None):
         if attribs is None:
             attribs = {}
+        self.validator()(attribs, orig_passed_data)
 
-        debug_passed_data = f" Original passed data: {repr(orig_passed_data)}"
-
-        for attrib in self._populated:
-            if self._populated[attrib] is False:
-                self._is_valid_not_populated(attrib, attribs, debug_passed_data)
+    def validator(self):
+        """
+        Returns the rules compiled into a single function validating an attribs dict: validator(attribs,
+        orig_passed_data=None). Rules are checked in the same order as always (populated, enums, types, numeric,
+        numeric_positive, regexp), and error messages are only built once a rule fails. Validators are cached per set of
+        rules, so every object of a class shares one.
+        """
+        if self._validator is not None:
+            return self._validator
+        cache_key = self._cache_key()
+        compiled = _compiled_validators.get(cache_key)
+        if compiled is None:
+            compiled = self._compile()
+            _compiled_validators[cache_key] = compiled
+        self._validator = compiled
+        return compiled
+
+    def _cache_key(self) -> tuple:
+        return (
+            tuple(self._populated.items()),
+            tuple((attrib, repr(enums)) for attrib, enums in self._enums.items()),
+            tuple((attrib, tuple(types)) for attrib, types in self._types.items()),
+            tuple(self._numeric.items()),
+            tuple(self._numeric_positive.items()),
+            tuple(self._regexp.items()),
+        )
+
+    def _compile(self):
+        # A (attrib, check, error) triple per rule, where check(value) -> bool and error(attrib, value) -> str
+        checks = []
+        for attrib, populated in self._populated.items():
+            if populated is False:
+                checks.append((attrib, _is_not_populated, _error_not_populated))
             else:
-                self._is_valid_populated(attrib, attribs, debug_passed_data)
-        for attrib in self._enums:
-            self.is_valid_enums(attrib, attribs, debug_passed_data)
-        for attrib in self._types:
-            self.is_valid_types(attrib, attribs, debug_passed_data)
-        for attrib in self._numeric:
-            self._is_valid_numeric(attrib, attribs, debug_passed_data)
-        for attrib in self._numeric_positive:
-            self._is_valid_numeric_positive(attrib, attribs, debug_passed_data)
-        for attrib in self._regexp:
-            self._is_valid_regexp(attrib, attribs, debug_passed_data)
-
-    def is_valid_enums(self, attrib, attribs, debug_passed_data):
-        self._is_valid_exists(attrib, attribs, debug_passed_data)
-        if attribs[attrib] not in self._enums[attrib]:
-            raise exceptions.ValidationError(
-                f"'{attrib}' attribute must be of the following string enums: {str(self._enums[attrib])}. Received:"
-                f"{repr(type(attribs[attrib]))} {repr(attribs[attrib])}")
-
-    def is_valid_types(self, attrib, attribs, debug_passed_data):
-        self._is_valid_exists(attrib, attribs, debug_passed_data)
-        if type(attribs[attrib]) not in self._types[attrib]:
-            raise exceptions.ValidationError(
-                f"'{attrib}' attribute must be of type: {str(self._types[attrib])}. Received:"
-                f"{repr(type(attribs[attrib]))} {repr(attribs[attrib])}")
-
-    def _is_valid_numeric(self, attrib, attribs, debug_passed_data):
-        self._is_valid_exists(attrib, attribs, debug_passed_data)
-        error_msg_not_numeric = f"'{attrib}' must be a numeric value. " \
-                                f"Received: {type(attribs[attrib])} {repr(attribs[attrib])}"
-
-        # If is numeric for this attrib is true, require a numeric value. If false, ensure its not numeric
-        if self._numeric[attrib]:
-            # Bools are not considered numeric for our PropRules
-            if attribs[attrib] is True or attribs[attrib] is False:
-                raise exceptions.ValidationError(error_msg_not_numeric)
-
-            try:
-                validate_numeric(attribs[attrib])
-            except (TypeError, ValueError) as ex:
-                raise exceptions.ValidationError(error_msg_not_numeric) from ex
-            return
-
-        # Bools are not considered numeric for our PropRules
-        if attribs[attrib] is True or attribs[attrib] is False:
-            return
-
-        try:
-            validate_numeric(attribs[attrib])
-            raise exceptions.ValidationError(
-                f"'{attrib}' cannot be a numeric value. Received: {type(attribs[attrib])} {repr(attribs[attrib])}")
-        except (TypeError, ValueError) as ex:
-            return
-
-    def _is_valid_numeric_positive(self, attrib, attribs, debug_passed_data):
-        self._is_valid_exists(attrib, attribs, debug_passed_data)
-        error_msg_not_numeric = f"'{attrib}' must be a positive numeric value. " \
-                                f"Received: {type(attribs[attrib])} {repr(attribs[attrib])}"
-        # If is numeric for this attrib is true, require a numeric value. If false, ensure its not numeric
-        if self._numeric_positive[attrib]:
-            # Bools are not considered numeric for our PropRules,
-            if attribs[attrib] is True or attribs[attrib] is False:
-                raise exceptions.ValidationError(error_msg_not_numeric)
-            try:
-                validate_numeric_pos(attribs[attrib])
-            except (TypeError, ValueError) as ex:
-                raise exceptions.ValidationError(error_msg_not_numeric) from ex
-            return
-
-        # Bools are not considered numeric for our PropRules
-        if attribs[attrib] is True or attribs[attrib] is False:
-            return
-
-        try:
-            validate_numeric_pos(attribs[attrib])
-            raise exceptions.ValidationError(
-                f"'{attrib}' cannot be a positive numeric value. "
-                f"Received: {type(attribs[attrib])} {repr(attribs[attrib])}")
-        except (TypeError, ValueError) as ex:
-            return
-
-    def _is_valid_not_populated(self, attrib, attribs, debug_passed_data):
-        self._is_valid_exists(attrib, attribs, debug_passed_data)
-
-        if attribs[attrib] is None:
-            return
-
-        if isinstance(attribs[attrib], str) and attribs[attrib] == "":
-            return
-
-        if isinstance(attribs[attrib], (dict, list)) and len(attribs[attrib]) == 0:
-            return
-
-        raise exceptions.ValidationError(
-            f"'{attrib}' is a required attribute but must be null, an empty string, "
-            f"or empty collection. Received: {type(attribs[attrib])} {repr(attribs[attrib])}")
-
-    def _is_valid_populated(self, attrib, attribs, debug_passed_data):
-        self._is_valid_exists(attrib, attribs, debug_passed_data)
-
-        if isinstance(attribs[attrib], str) and attribs[attrib].strip() != "":
-            return
+                checks.append((attrib, _is_populated, _error_populated))
+        for attrib, enums in self._enums.items():
+            checks.append((attrib, lambda value, enums=enums: value in enums,
+                           lambda name, value, enums=enums: f"'{name}' attribute must be of the following string "
+                                                            f"enums: {str(enums)}. Received:{repr(type(value))} "
+                                                            f"{repr(value)}"))
+        for attrib, types in self._types.items():
+            checks.append((attrib, lambda value, types=tuple(types): type(value) in types,
+                           lambda name, value, types=types: f"'{name}' attribute must be of type: {str(types)}. "
+                                                            f"Received:{repr(type(value))} {repr(value)}"))
+        for attrib, numeric in self._numeric.items():
+            if numeric:
+                checks.append((attrib, lambda value: _is_numeric(value, validate_numeric),
+                               lambda name, value: f"'{name}' must be a numeric value. "
+                                                   f"Received: {type(value)} {repr(value)}"))
+            else:
+                checks.append((attrib, lambda value: not _is_numeric(value, validate_numeric),
+                               lambda name, value: f"'{name}' cannot be a numeric value. "
+                                                   f"Received: {type(value)} {repr(value)}"))
+        for attrib, numeric_positive in self._numeric_positive.items():
+            if numeric_positive:
+                checks.append((attrib, lambda value: _is_numeric(value, validate_numeric_pos),
+                               lambda name, value: f"'{name}' must be a positive numeric value. "
+                                                   f"Received: {type(value)} {repr(value)}"))
+            else:
+                checks.append((attrib, lambda value: not _is_numeric(value, validate_numeric_pos),
+                               lambda name, value: f"'{name}' cannot be a positive numeric value. "
+                                                   f"Received: {type(value)} {repr(value)}"))
+        for attrib, pattern in self._regexp.items():
+            checks.append((attrib, lambda value, regexp=re.compile(pattern): isinstance(value, str)
+                           and regexp.match(value) is not None,
+                           lambda name, value, pattern=pattern: f"'{name}' must be a string and match the pattern: "
+                                                                f"'{pattern}'. Received: {type(value)} {repr(value)}"))
+
+        def validator(attribs: dict, orig_passed_data: str = None) -> None:
+            for attrib, check, error in checks:
+                if attrib not in attribs:
+                    raise exceptions.ValidationError(
+                        f"'{attrib}' is a required attribute and does not exist in attributes received. Original "
+                        f"passed data: {repr(orig_passed_data)}")
+                if not check(attribs[attrib]):
+                    raise exceptions.ValidationError(error(attrib, attribs[attrib]))
+
+        return validator
+
+
+# Compiled PropRules validators, keyed by their rules (see PropRules.validator())
+_compiled_validators = {}
+
+
+def _is_numeric(value, validate) -> bool:
+    # Bools are not considered numeric for our PropRules
+    if value is True or value is False:
+        return False
+    try:
+        validate(value)
+    except (TypeError, ValueError):
+        return False
+    return True
 
-        if isinstance(attribs[attrib], (int, float)):
-            return
 
-        if isinstance(attribs[attrib], (dict, list)) and len(attribs[attrib]) > 0:
-            return
+def _is_populated(value) -> bool:
+    if isinstance(value, str):
+        return value.strip() != ""
+    if isinstance(value, (int, float)):
+        return True
+    return isinstance(value, (dict, list)) and len(value) > 0
 
-        raise exceptions.ValidationError(
-            f"'{attrib}' is a required attribute that must be populated (empty collections or whitespace characters are"
-            f" not considered populated). Received: {type(attribs[attrib])} {repr(attribs[attrib])}")
 
-    def _is_valid_regexp(self, attrib, attribs, debug_passed_data):
-        self._is_valid_exists(attrib, attribs, debug_passed_data)
+def _error_populated(attrib, value) -> str:
+    return f"'{attrib}' is a required attribute that must be populated (empty collections or whitespace characters " \
+           f"are not considered populated). Received: {type(value)} {repr(value)}"
 
-        pattern = self._regexp[attrib]
-        error_msg_not_pattern = f"'{attrib}' must be a string and match the pattern: '{pattern}'. Received: " \
-                                f"{type(attribs[attrib])} {repr(attribs[attrib])}"
 
-        if not isinstance(attribs[attrib], str):
-            raise exceptions.ValidationError(error_msg_not_pattern)
+def _is_not_populated(value) -> bool:
+    if value is None or (isinstance(value, str) and value == ""):
+        return True
+    return isinstance(value, (dict, list)) and len(value) == 0
 
-        if not re.match(pattern, attribs[attrib]):
-            raise exceptions.ValidationError(error_msg_not_pattern)
 
-    def _is_valid_exists(self, attrib, attribs, debug_passed_data):
-        if attrib not in attribs.keys():
-            raise exceptions.ValidationError(
-                f"'{attrib}' is a required attribute and does not exist in attributes received.{debug_passed_data}")
+def _error_not_populated(attrib, value) -> str:
+    return f"'{attrib}' is a required attribute but must be null, an empty string, or empty collection. " \
+           f"Received: {type(value)} {repr(value)}"
 
 
 def validate_list_append_upto_n_items_inputs(base_list: list, from_list: list, upto_item_count=None):
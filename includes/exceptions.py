@@ -31,6 +31,11 @@ class UnexpectedInternalHostResponse(InternalError):
     pass
 
 
+class ShardScrapeError(Exception):
+    """Raised when one or more shards failed to scrape while other shards were scraped in parallel"""
+    pass
+
+
 class AwsError(Exception):
     """Sub-base exception for errors related to aws (unexpected response, permission denied etc)"""
     pass
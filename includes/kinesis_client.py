@@ -1,21 +1,44 @@
-from typing import Union, Optional
+from typing import Callable, Union, Optional
 import includes.exceptions as exceptions
 import time
 import re
 import datetime
 import includes.common as common
+import includes.boundary as boundary
+import includes.checkpoint as checkpoint
+import includes.kpl as kpl
+import includes.lineage as lineage
+import includes.pipeline as pipeline
+import includes.poll_controller as poll_controller
+import includes.read_budget as read_budget
+from includes.sequence_number import SequenceNumber
+import includes.record_filter as record_filter
+import includes.record_store as record_store
+import includes.shard_map as shard_map
+from includes.shard_window import ShardWindow
 import logging
 import botocore
+import botocore.exceptions
 import os
 from abc import ABC, abstractmethod
 import base64
 import boto3
 import json
+import threading
+import contextlib
+import shutil
+import concurrent.futures
 
 log = logging.getLogger(__name__)
 
 
 class GetRecordsIteration(ABC):
+    """
+    The state of a get_records() loop iteration. Setters do not validate right away: a changed object is validated
+    once by validate(), or when it is passed on to a new iteration object, so a loop mutating several values only pays
+    for a single validation per poll. Setters validate immediately when the module logger is at DEBUG level.
+    """
+
     @abstractmethod
     def __init__(self, *,
                  total_found_records: int,
@@ -27,15 +50,30 @@ class GetRecordsIteration(ABC):
         self._response_no_records = response_no_records
         self._loop_count = loop_count
         self._shard_id = shard_id
-        self._proprules = common.PropRules()
-        self._proprules.add_prop("total_found_records", types=[int], numeric_positive=True)
-        self._proprules.add_prop("response_no_records", types=[int], numeric_positive=True)
-        self._proprules.add_prop("loop_count", types=[int], numeric_positive=True)
-        self._proprules.add_prop("shard_id", types=[str])
+        self._proprules = self._class_proprules()
+        self._validate_on_set = log.isEnabledFor(logging.DEBUG)
+        self._validated = False
 
         # Make sure to call is valid after calling super init ONLY in child classes
         # self._is_valid()  -- Do call call this in the abstract class
 
+    @classmethod
+    def _class_proprules(cls) -> common.PropRules:
+        # The rules are the same for every object of a class, so they are only built once per class
+        proprules = cls.__dict__.get('_proprules_of_class')
+        if proprules is None:
+            proprules = common.PropRules()
+            cls._add_props(proprules)
+            cls._proprules_of_class = proprules
+        return proprules
+
+    @classmethod
+    def _add_props(cls, proprules: common.PropRules) -> None:
+        proprules.add_prop("total_found_records", types=[int], numeric_positive=True)
+        proprules.add_prop("response_no_records", types=[int], numeric_positive=True)
+        proprules.add_prop("loop_count", types=[int], numeric_positive=True)
+        proprules.add_prop("shard_id", types=[str])
+
     @property
     def total_found_records(self):
         return self._total_found_records
@@ -43,7 +81,7 @@ class GetRecordsIteration(ABC):
     @total_found_records.setter
     def total_found_records(self, value):
         self._total_found_records = value
-        self._is_valid()
+        self._changed()
 
     @property
     def response_no_records(self):
@@ -52,7 +90,7 @@ class GetRecordsIteration(ABC):
     @response_no_records.setter
     def response_no_records(self, value):
         self._response_no_records = value
-        self._is_valid()
+        self._changed()
 
     @property
     def loop_count(self):
@@ -61,22 +99,29 @@ class GetRecordsIteration(ABC):
     @loop_count.setter
     def loop_count(self, value):
         self._loop_count = value
-        self._is_valid()
+        self._changed()
 
     @property
     def shard_id(self):
         return self._shard_id
 
+    def validate(self) -> None:
+        """Validates the object if it changed since it was last validated."""
+        if not self._validated:
+            self._is_valid()
+
+    def _changed(self) -> None:
+        self._validated = False
+        if self._validate_on_set:
+            self._is_valid()
+
     @abstractmethod
     def _is_valid(self):
         self._is_valid_proprules()
+        self._validated = True
 
     def _is_valid_proprules(self) -> None:
-        attribs = {}
-        for item in dir(self):
-            if not callable(getattr(self, item)):
-                attribs[item] = getattr(self, item)
-        self._proprules.validate(attribs)
+        self._proprules.validate(self._proprules.attribs_of(self))
 
 
 class GetRecordsIterationInput(GetRecordsIteration):
@@ -97,20 +142,12 @@ class GetRecordsIterationInput(GetRecordsIteration):
             shard_id=shard_id
         )
 
-        # Inject proprules requirement into the proprules requirements list after inheriting from parent
-        self._proprules.add_prop("shard_iterator", types=[str])
-
-        # Recall the validation that is called in super().__init__ again after appending the new proprules
         self._is_valid()
 
-    @property
-    def total_found_records(self):
-        return self._total_found_records
-
-    @total_found_records.setter
-    def total_found_records(self, value):
-        self._total_found_records = value
-        self._is_valid()
+    @classmethod
+    def _add_props(cls, proprules: common.PropRules) -> None:
+        super()._add_props(proprules)
+        proprules.add_prop("shard_iterator", types=[str])
 
     @property
     def shard_iterator(self):
@@ -142,25 +179,15 @@ class GetRecordsIterationResponse(GetRecordsIteration):
             shard_id=shard_id
         )
 
-        # Inject proprules requirement into the proprules requirements list after inheriting from parent
-        self._proprules.add_prop("break_iteration", types=[bool])
-        self._proprules.add_prop("found_records", types=[int], numeric_positive=True)
-        self._proprules.add_prop("next_shard_iterator", types=[str])
-
-        # Recall the validation that is called in super().__init__ again after appending the new proprules
         self._is_valid()
 
-        # Must be after
-        # self.__dict__ = common.get_obj_proprules_stripped_dict(self)
-
-    @property
-    def total_found_records(self):
-        return self._total_found_records
-
-    @total_found_records.setter
-    def total_found_records(self, value):
-        self._total_found_records = value
-        self._is_valid()
+    @classmethod
+    def _add_props(cls, proprules: common.PropRules) -> None:
+        super()._add_props(proprules)
+        proprules.add_prop("break_iteration", types=[bool])
+        proprules.add_prop("found_records", types=[int], numeric_positive=True)
+        # None once a closed shard was read to its end
+        proprules.add_prop("next_shard_iterator", types=[str, type(None)])
 
     @property
     def found_records(self):
@@ -181,24 +208,101 @@ class GetRecordsIterationResponse(GetRecordsIteration):
                                                       f" exceed total_found_records ({self.total_found_records}).")
 
 
-class Record(common.BaseCommonClass):
+class Record:
+    """
+    A single Kinesis record. Unlike the BaseCommonClass models, a Record is a plain __slots__ object with a fixed set of
+    fields, as one is built for every record scraped or replayed. Build the records of a whole get_records() response
+    or file batch with from_batch(), which checks the batch once rather than each record on its own.
+    """
+    __slots__ = ('_SequenceNumber', '_ApproximateArrivalTimestamp', '_Data', '_PartitionKey', '_SubSequenceNumber',
+                 '_ExplicitHashKey', '_base64_encoded')
+
+    # The allowed types of each field, checked the same way PropRules does
+    _FIELD_TYPES = {
+        "SequenceNumber": [str],
+        "PartitionKey": [str],
+        "ApproximateArrivalTimestamp": [datetime.datetime, str],
+        # Only set on the user records expanded from a KPL aggregated record (see sub_records())
+        "SubSequenceNumber": [int, type(None)],
+        "ExplicitHashKey": [str, type(None)],
+    }
+
     def __init__(self, passed_data: [dict], *, base64_encoded: bool = False):
-        self._SequenceNumber = None
-        self._ApproximateArrivalTimestamp = None
-        self._Data = None
-        self._PartitionKey = None
-        self._proprules = common.PropRules()
-        self._proprules.add_prop("SequenceNumber", types=[str])
-        self._proprules.add_prop("PartitionKey", types=[str])
-        self._proprules.add_prop("ApproximateArrivalTimestamp", types=[datetime.datetime, str])
+        try:
+            passed_data = common.json_or_dict_or_obj_to_dict(passed_data)
+        except Exception as ex:
+            raise ValueError(f"Could not convert passed_data to a dict. passed_data: {repr(passed_data)}") from ex
+        self._load(passed_data, base64_encoded)
+        self._is_valid()
 
+    @classmethod
+    def from_batch(cls, items: list, *, base64_encoded: bool = False) -> list:
+        """
+        Returns a Record per item (a dict, or an already built Record which is kept as-is). The fields of the whole batch
+        are type checked in a single pass; each record is only checked on its own to report the offending one.
+        """
+        records = []
+        for item in items:
+            if isinstance(item, Record):
+                records.append(item)
+                continue
+            if not isinstance(item, dict):
+                records.append(cls(item, base64_encoded=base64_encoded))
+                continue
+            record = cls.__new__(cls)
+            record._load(item, base64_encoded)
+            records.append(record)
+
+        for field, types in cls._FIELD_TYPES.items():
+            attribute = f"_{field}"
+            if not all([type(getattr(i, attribute)) in types for i in records]):
+                for record in records:
+                    record._is_valid()
+        return records
+
+    def _load(self, passed_data: dict, base64_encoded: bool) -> None:
+        get = passed_data.get
+        self._SequenceNumber = get("SequenceNumber")
+        self._ApproximateArrivalTimestamp = get("ApproximateArrivalTimestamp")
+        self._Data = get("Data")
+        self._PartitionKey = get("PartitionKey")
+        self._SubSequenceNumber = get("SubSequenceNumber")
+        self._ExplicitHashKey = get("ExplicitHashKey")
         # We need to store state if the Data element is base64 encoded. This is due to boto3 get_records()
         # automatically base64 decodes it but when we write it to disk its written in base64 to properly refect
         # the value stored in the stream
         self._base64_encoded = bool(base64_encoded)
 
-        # Have to call parent after defining attributes
-        super().__init__(passed_data)
+    def _is_valid(self) -> None:
+        for field, types in self._FIELD_TYPES.items():
+            value = getattr(self, f"_{field}")
+            if type(value) not in types:
+                raise exceptions.ValidationError(
+                    f"'{field}' attribute must be of type: {str(types)}. Received:{repr(type(value))} {repr(value)}")
+
+    def _fields(self) -> tuple:
+        return (self._ApproximateArrivalTimestamp, self._Data, self._ExplicitHashKey, self._PartitionKey,
+                self._SequenceNumber, self._SubSequenceNumber, self._base64_encoded)
+
+    def __str__(self):
+        return f"ApproximateArrivalTimestamp={self._ApproximateArrivalTimestamp},Data={self._Data}," \
+               f"ExplicitHashKey={self._ExplicitHashKey},PartitionKey={self._PartitionKey}," \
+               f"SequenceNumber={self._SequenceNumber},SubSequenceNumber={self._SubSequenceNumber}," \
+               f"base64_encoded={self._base64_encoded}"
+
+    def __repr__(self):
+        return f"ApproximateArrivalTimestamp={repr(self._ApproximateArrivalTimestamp)},Data={repr(self._Data)}," \
+               f"ExplicitHashKey={repr(self._ExplicitHashKey)},PartitionKey={repr(self._PartitionKey)}," \
+               f"SequenceNumber={repr(self._SequenceNumber)},SubSequenceNumber={repr(self._SubSequenceNumber)}," \
+               f"base64_encoded={repr(self._base64_encoded)}"
+
+    def __eq__(self, other):
+        if not isinstance(other, Record):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self):
+        return hash(self._fields())
 
     @property
     def SequenceNumber(self) -> str:
@@ -220,26 +324,54 @@ class Record(common.BaseCommonClass):
     def PartitionKey(self) -> str:
         return self._PartitionKey
 
+    @property
+    def SubSequenceNumber(self) -> Optional[int]:
+        return self._SubSequenceNumber
+
+    @property
+    def ExplicitHashKey(self) -> Optional[str]:
+        return self._ExplicitHashKey
+
     @property
     def base64_encoded(self) -> bool:
         return self._base64_encoded
 
+    def sub_records(self) -> list:
+        """
+        Returns the user records of a KPL aggregated record, each with the SequenceNumber and ApproximateArrivalTimestamp
+        of this record, its index as SubSequenceNumber and its own PartitionKey, ExplicitHashKey and Data. Returns
+        [self] if this record is not aggregated.
+        """
+        data = base64.b64decode(self.Data) if self.base64_encoded else self.Data
+        user_records = kpl.try_deaggregate(data)
+        if user_records is None:
+            return [self]
+        return Record.from_batch([{
+            "SequenceNumber": self.SequenceNumber,
+            "ApproximateArrivalTimestamp": self.ApproximateArrivalTimestamp,
+            "Data": sub_data,
+            "PartitionKey": partition_key,
+            "SubSequenceNumber": i,
+            "ExplicitHashKey": explicit_hash_key,
+        } for i, (partition_key, explicit_hash_key, sub_data) in enumerate(user_records)])
+
     def toJson(self, *, indent: Optional[Union[int, None]] = None) -> str:
         data = self.Data
         if not self.base64_encoded:
             encoded_bytes = base64.b64encode(common.to_bytes(self.Data))
             data = encoded_bytes.decode("utf-8")
 
-        return json.dumps({
+        record = {
             "SequenceNumber": self.SequenceNumber,
             "ApproximateArrivalTimestamp": self.ApproximateArrivalTimestamp,
             "Data": data,
             "PartitionKey": self.PartitionKey
-        }, indent=indent, default=str)
-
-    def _is_valid(self):
-        super()._is_valid()
-        ...  # TODO: Add validators for Record to confirm the record contains valid info
+        }
+        if self.SubSequenceNumber is not None:
+            record["SubSequenceNumber"] = self.SubSequenceNumber
+        if self.ExplicitHashKey is not None:
+            record["ExplicitHashKey"] = self.ExplicitHashKey
+        return json.dumps(record, indent=indent, default=str)
 
 
 class RecordsCollection(common.RestrictedCollection):
@@ -266,24 +398,30 @@ class Boto3GetRecordsResponse(common.BaseCommonClass):
         self._Records = None
         self._NextShardIterator = None
         self._MillisBehindLatest = None
-        self._proprules = common.PropRules()
-        self._proprules.add_prop("Records", types=[RecordsCollection])
-        self._proprules.add_prop("NextShardIterator", types=[str])
-        self._proprules.add_prop("MillisBehindLatest", types=[int])
 
         # If Records exists in the passed data, we re-pack it as RecordCollection of Record items
         if 'Records' in passed_data.keys():
-            passed_data["Records"] = RecordsCollection([Record(i) for i in passed_data["Records"]])
+            passed_data["Records"] = RecordsCollection(Record.from_batch(passed_data["Records"]))
 
         # Have to call parent after defining attributes other they are not populated
         super().__init__(passed_data)
 
+    # Holds a RecordsCollection, which can't be hashed
+    __hash__ = None
+
+    @classmethod
+    def _add_props(cls, proprules: common.PropRules) -> None:
+        proprules.add_prop("Records", types=[RecordsCollection])
+        # Omitted once a closed shard (e.g. the parent of a resharding) was read to its end
+        proprules.add_prop("NextShardIterator", types=[str, type(None)])
+        proprules.add_prop("MillisBehindLatest", types=[int])
+
     @property
     def Records(self) -> RecordsCollection:
         return self._Records
 
     @property
-    def NextShardIterator(self) -> str:
+    def NextShardIterator(self) -> Optional[str]:
         return self._NextShardIterator
 
     @property
@@ -292,8 +430,15 @@ class Boto3GetRecordsResponse(common.BaseCommonClass):
 
 
 class ClientConfig(common.BaseCommonClass):
-    def __init__(self, passed_data: Union[dict, str], boto_client: botocore.client.BaseClient):
+    def __init__(self, passed_data: Union[dict, str], boto_client: botocore.client.BaseClient, *,
+                 boto_client_factory: Optional[Callable[[], botocore.client.BaseClient]] = None):
+        """
+        boto_client_factory, if passed, is called to build the kinesis client of every parallel scrape worker (see
+        shard_workers and timestamp_slices). It must return a new client each time, e.g.
+        `lambda: boto3.session.Session().client('kinesis', 'us-east-1')`, as boto3 sessions are not thread safe.
+        """
         self._boto_client = boto_client
+        self._boto_client_factory = boto_client_factory
         self._debug_level = None
         self._stream_name = None
         self._shard_ids = None
@@ -307,6 +452,26 @@ class ClientConfig(common.BaseCommonClass):
         self._poll_batch_size = None
         self._poll_delay = None
         self._max_empty_polls = None
+        self._shard_workers = 1
+        self._pipeline_queue_size = 0
+        self._output_format = 'files'
+        self._segment_max_records = 100000
+        self._segment_max_bytes = 67108864
+        self._checkpoint_interval = 0
+        self._poll_mode = 'fixed'
+        self._max_poll_delay = 5
+        self._shard_read_calls_per_second = 0
+        self._shard_read_bytes_per_second = 0
+        self._stream_read_calls_per_second = 0
+        self._stream_read_bytes_per_second = 0
+        self._poll_target_bytes = 0
+        self._stop_at_latest = False
+        self._timestamp_slices = 1
+        self._shard_map_cache_ttl = 0
+        self._partition_keys = []
+        self._partition_key_filter = False
+        self._record_filter = {}
+        self._kpl_deaggregate = False
 
         # Have to call parent after defining attributes other they are not populated
         super().__init__(passed_data)
@@ -315,6 +480,10 @@ class ClientConfig(common.BaseCommonClass):
     def boto_client(self):
         return self._boto_client
 
+    @property
+    def boto_client_factory(self):
+        return self._boto_client_factory
+
     @property
     def debug_level(self):
         return self._debug_level
@@ -367,6 +536,86 @@ class ClientConfig(common.BaseCommonClass):
     def max_empty_polls(self):
         return self._max_empty_polls
 
+    @property
+    def shard_workers(self):
+        return self._shard_workers
+
+    @property
+    def pipeline_queue_size(self):
+        return self._pipeline_queue_size
+
+    @property
+    def output_format(self):
+        return self._output_format
+
+    @property
+    def segment_max_records(self):
+        return self._segment_max_records
+
+    @property
+    def segment_max_bytes(self):
+        return self._segment_max_bytes
+
+    @property
+    def checkpoint_interval(self):
+        return self._checkpoint_interval
+
+    @property
+    def poll_mode(self):
+        return self._poll_mode
+
+    @property
+    def max_poll_delay(self):
+        return self._max_poll_delay
+
+    @property
+    def shard_read_calls_per_second(self):
+        return self._shard_read_calls_per_second
+
+    @property
+    def shard_read_bytes_per_second(self):
+        return self._shard_read_bytes_per_second
+
+    @property
+    def stream_read_calls_per_second(self):
+        return self._stream_read_calls_per_second
+
+    @property
+    def stream_read_bytes_per_second(self):
+        return self._stream_read_bytes_per_second
+
+    @property
+    def poll_target_bytes(self):
+        return self._poll_target_bytes
+
+    @property
+    def stop_at_latest(self):
+        return self._stop_at_latest
+
+    @property
+    def timestamp_slices(self):
+        return self._timestamp_slices
+
+    @property
+    def shard_map_cache_ttl(self):
+        return self._shard_map_cache_ttl
+
+    @property
+    def partition_keys(self):
+        return self._partition_keys
+
+    @property
+    def partition_key_filter(self):
+        return self._partition_key_filter
+
+    @property
+    def record_filter(self):
+        return self._record_filter
+
+    @property
+    def kpl_deaggregate(self):
+        return self._kpl_deaggregate
+
     def _is_valid(self):
         self._validate_boto_client()
         self._validate_required_configs()
@@ -380,15 +629,32 @@ class ClientConfig(common.BaseCommonClass):
         self._validate_sequence_number('ending')
         self._validate_timestamp_usage('ending')
         self._validate_batch_size()
+        self._validate_poll_target_bytes()
         self._validate_poll_delay()
+        self._validate_poll_mode()
+        self._validate_read_budget()
         self._validate_total_records_per_shard()
         self._validate_max_empty_polls()
+        self._validate_stop_at_latest()
+        self._validate_shard_workers()
+        self._validate_pipeline_queue_size()
+        self._validate_output_format()
+        self._validate_checkpoint_interval()
+        self._validate_timestamp_slices()
+        self._validate_shard_map_cache_ttl()
+        self._validate_partition_keys()
+        self._validate_record_filter()
+        self._validate_kpl_deaggregate()
 
     def _validate_boto_client(self):
         if not isinstance(self.boto_client, botocore.client.BaseClient):
             raise exceptions.InvalidArgumentException(
                 f"A boto3 Kinesis client object is required. Example: \"boto3.client('kinesis')\". "
                 f"Value provided: {str(type(self.boto_client))} {repr(self.boto_client)}")
+        if self.boto_client_factory is not None and not callable(self.boto_client_factory):
+            raise exceptions.InvalidArgumentException(
+                f"boto_client_factory must be a callable returning a new boto3 Kinesis client. "
+                f"Value provided: {str(type(self.boto_client_factory))} {repr(self.boto_client_factory)}")
 
     def _validate_batch_size(self):
         try:
@@ -399,8 +665,17 @@ class ClientConfig(common.BaseCommonClass):
                 f"string, or an integer.\nValue provided: "
                 f"{repr(type(self._poll_batch_size))} {repr(self._poll_batch_size)}"
             ) from e
-        if int(self._poll_batch_size) > 500:
-            raise exceptions.ConfigValidationError('config-kinesis_scraper.yaml: poll_batch_size cannot exceed 500')
+        if int(self._poll_batch_size) > poll_controller.MAX_GET_RECORDS_LIMIT:
+            raise exceptions.ConfigValidationError(
+                f'config-kinesis_scraper.yaml: poll_batch_size cannot exceed {poll_controller.MAX_GET_RECORDS_LIMIT}')
+
+    def _validate_poll_target_bytes(self):
+        # AWS quota: A single get_records() response holds up to 10MB
+        if type(self._poll_target_bytes) is not int or self._poll_target_bytes < 0 \
+                or self._poll_target_bytes > 10485760:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"poll_target_bytes\" must be an integer between 0-10485760.\n"
+                f"Value provided: {repr(type(self._poll_target_bytes))} {repr(self._poll_target_bytes)}")
 
     def _validate_debug_level(self):
         debug_levels = [
@@ -454,6 +729,116 @@ class ClientConfig(common.BaseCommonClass):
         if int(self._max_empty_polls) > 2000:
             raise exceptions.ConfigValidationError('config-kinesis_scraper.yaml: max_empty_polls cannot exceed 2000')
 
+    def _validate_stop_at_latest(self):
+        if type(self._stop_at_latest) is not bool:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"stop_at_latest\" must be true or false.\nValue provided: "
+                f"{repr(type(self._stop_at_latest))} {repr(self._stop_at_latest)}")
+
+    def _validate_shard_workers(self):
+        if type(self._shard_workers) is not int or self._shard_workers < 1:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"shard_workers\" must be an integer of 1 or greater.\nValue provided: "
+                f"{repr(type(self._shard_workers))} {repr(self._shard_workers)}")
+        if self._shard_workers > 64:
+            raise exceptions.ConfigValidationError('config-kinesis_scraper.yaml: shard_workers cannot exceed 64')
+
+    def _validate_pipeline_queue_size(self):
+        if type(self._pipeline_queue_size) is not int or self._pipeline_queue_size < 0:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"pipeline_queue_size\" must be an integer of 0 or greater.\n"
+                f"Value provided: {repr(type(self._pipeline_queue_size))} {repr(self._pipeline_queue_size)}")
+        if self._pipeline_queue_size > 1000:
+            raise exceptions.ConfigValidationError('config-kinesis_scraper.yaml: pipeline_queue_size cannot exceed 1000')
+
+    def _validate_output_format(self):
+        output_formats = ['files', 'segments']
+        if self._output_format not in output_formats:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: output_format must be one of: {repr(output_formats)}\n"
+                f"Value provided: {repr(type(self._output_format))} {repr(self._output_format)}")
+        for config_name in ['segment_max_records', 'segment_max_bytes']:
+            value = getattr(self, config_name)
+            if type(value) is not int or value < 1:
+                raise exceptions.ConfigValidationError(
+                    f"config-kinesis_scraper.yaml: \"{config_name}\" must be an integer of 1 or greater.\n"
+                    f"Value provided: {repr(type(value))} {repr(value)}")
+
+    def _validate_checkpoint_interval(self):
+        if type(self._checkpoint_interval) is not int or self._checkpoint_interval < 0:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"checkpoint_interval\" must be an integer of 0 or greater.\n"
+                f"Value provided: {repr(type(self._checkpoint_interval))} {repr(self._checkpoint_interval)}")
+
+    def _validate_timestamp_slices(self):
+        if type(self._timestamp_slices) is not int or self._timestamp_slices < 1:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"timestamp_slices\" must be an integer of 1 or greater.\n"
+                f"Value provided: {repr(type(self._timestamp_slices))} {repr(self._timestamp_slices)}")
+        if self._timestamp_slices > 64:
+            raise exceptions.ConfigValidationError('config-kinesis_scraper.yaml: timestamp_slices cannot exceed 64')
+        if self._timestamp_slices == 1:
+            return
+        if self._starting_position != 'AT_TIMESTAMP' \
+                or self._ending_position not in ['LATEST', 'AT_TIMESTAMP', 'AFTER_TIMESTAMP', 'BEFORE_TIMESTAMP']:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: If \"timestamp_slices\" is greater than 1, \"starting_position\" must "
+                f"be AT_TIMESTAMP and \"ending_position\" must be LATEST or *_TIMESTAMP.\nValues provided: "
+                f"{repr(self._starting_position)} {repr(self._ending_position)}")
+        if self._checkpoint_interval > 0:
+            raise exceptions.ConfigValidationError(
+                'config-kinesis_scraper.yaml: timestamp_slices cannot be combined with checkpoint_interval')
+
+    def _validate_shard_map_cache_ttl(self):
+        if type(self._shard_map_cache_ttl) is not int or not 0 <= self._shard_map_cache_ttl <= 3600:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"shard_map_cache_ttl\" must be an integer between 0-3600.\n"
+                f"Value provided: {repr(type(self._shard_map_cache_ttl))} {repr(self._shard_map_cache_ttl)}")
+
+    def _validate_partition_keys(self):
+        # AWS quota: A partition key is 1 to 256 unicode characters long
+        if not isinstance(self._partition_keys, list) \
+                or not all([type(i) is str and 1 <= len(i) <= 256 for i in self._partition_keys]):
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"partition_keys\" must be a list of strings, each 1-256 characters "
+                f"long.\nValue provided: {repr(type(self._partition_keys))} {repr(self._partition_keys)}")
+        if type(self._partition_key_filter) is not bool:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"partition_key_filter\" must be true or false.\nValue provided: "
+                f"{repr(type(self._partition_key_filter))} {repr(self._partition_key_filter)}")
+        if self._partition_key_filter and len(self._partition_keys) == 0:
+            raise exceptions.ConfigValidationError(
+                'config-kinesis_scraper.yaml: partition_key_filter requires at least one of partition_keys')
+
+    def _validate_record_filter(self):
+        if not isinstance(self._record_filter, dict) \
+                or not set(self._record_filter.keys()).issubset({'partition_key_pattern', 'data_fields'}):
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"record_filter\" must be a dictionary holding partition_key_pattern "
+                f"and/or data_fields.\nValue provided: {repr(type(self._record_filter))} {repr(self._record_filter)}")
+        data_fields = self._record_filter.get('data_fields', {})
+        if not isinstance(data_fields, dict) or not all([type(i) is str and i != '' for i in data_fields.keys()]):
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"record_filter.data_fields\" must be a dictionary of field paths to "
+                f"values.\nValue provided: {repr(type(data_fields))} {repr(data_fields)}")
+        try:
+            record_filter.RecordFilter(partition_key_pattern=self._record_filter.get('partition_key_pattern'))
+        except exceptions.InvalidArgumentException as ex:
+            raise exceptions.ConfigValidationError(f"config-kinesis_scraper.yaml: {ex}") from ex
+
+    def _validate_kpl_deaggregate(self):
+        if type(self._kpl_deaggregate) is not bool:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: \"kpl_deaggregate\" must be true or false.\nValue provided: "
+                f"{repr(type(self._kpl_deaggregate))} {repr(self._kpl_deaggregate)}")
+
+    def derive(self, **overrides) -> 'ClientConfig':
+        """Returns a copy of this config with the given values replaced, e.g. to scrape part of a shard."""
+        passed_data = {name[1:]: value for name, value in vars(self).items()
+                       if name not in ['_boto_client', '_boto_client_factory', '_proprules']}
+        passed_data.update(overrides)
+        return ClientConfig(passed_data, self._boto_client, boto_client_factory=self._boto_client_factory)
+
     def _validate_total_records_per_shard(self):
         if self.ending_position == 'TOTAL_RECORDS_PER_SHARD':
             try:
@@ -478,6 +863,42 @@ class ClientConfig(common.BaseCommonClass):
         if float(self.poll_delay) < 0 or float(self.poll_delay) > 10:
             raise exceptions.ConfigValidationError('config-kinesis_scraper.yaml: poll_delay must be between 0-10')
 
+    def _validate_poll_mode(self):
+        poll_modes = ['fixed', 'adaptive']
+        if self._poll_mode not in poll_modes:
+            raise exceptions.ConfigValidationError(
+                f"config-kinesis_scraper.yaml: poll_mode must be one of: {repr(poll_modes)}\n"
+                f"Value provided: {repr(type(self._poll_mode))} {repr(self._poll_mode)}")
+        try:
+            common.validate_numeric_pos(self._max_poll_delay)
+        except (TypeError, ValueError) as e:
+            raise exceptions.ConfigValidationError(
+                f"If config-kinesis_scraper.yaml: \"max_poll_delay\" must be a positive numeric "
+                f"string, a float, or an integer.\nValue provided: "
+                f"{repr(type(self._max_poll_delay))} {repr(self._max_poll_delay)}"
+            ) from e
+        if float(self._max_poll_delay) > 60:
+            raise exceptions.ConfigValidationError('config-kinesis_scraper.yaml: max_poll_delay must be between 0-60')
+
+    def _validate_read_budget(self):
+        for config_name in ['shard_read_calls_per_second', 'shard_read_bytes_per_second',
+                            'stream_read_calls_per_second', 'stream_read_bytes_per_second']:
+            value = getattr(self, config_name)
+            try:
+                common.validate_numeric_pos(value)
+            except (TypeError, ValueError) as e:
+                raise exceptions.ConfigValidationError(
+                    f"If config-kinesis_scraper.yaml: \"{config_name}\" must be a positive numeric "
+                    f"string, a float, or an integer.\nValue provided: {repr(type(value))} {repr(value)}"
+                ) from e
+        # AWS quota: Each shard supports up to 5 GetRecords calls and 2MB per second
+        if float(self._shard_read_calls_per_second) > 5:
+            raise exceptions.ConfigValidationError(
+                'config-kinesis_scraper.yaml: shard_read_calls_per_second must be between 0-5')
+        if float(self._shard_read_bytes_per_second) > 2097152:
+            raise exceptions.ConfigValidationError(
+                'config-kinesis_scraper.yaml: shard_read_bytes_per_second must be between 0-2097152')
+
     def _post_init_processing(self):
         super()._post_init_processing()
         # Setup logging
@@ -495,6 +916,10 @@ class ClientConfig(common.BaseCommonClass):
             self._ending_sequence_number = None
         if self._poll_delay is not None:
             self._poll_delay = float(self._poll_delay)
+        self._max_poll_delay = float(self._max_poll_delay)
+        for config_name in ['shard_read_calls_per_second', 'shard_read_bytes_per_second',
+                            'stream_read_calls_per_second', 'stream_read_bytes_per_second']:
+            setattr(self, f'_{config_name}', float(getattr(self, config_name)))
 
     def _validate_sequence_number(self, position_type: str) -> None:
         # If any of these are set for the {starting/ending}_positions, the shard_id must have exactly 1 value
@@ -514,13 +939,13 @@ class ClientConfig(common.BaseCommonClass):
                     f"\nValue provided: {value_provided_type} {value_provided}"
                 )
             try:
-                common.validate_numeric_pos(getattr(self, f"{position_type}_sequence_number"))
-            except (TypeError, ValueError) as e:
+                SequenceNumber(getattr(self, f"{position_type}_sequence_number"))
+            except ValueError as e:
                 value_provided_type = repr(type(getattr(self, f"{position_type}_sequence_number")))
                 value_provided = repr(getattr(self, f"{position_type}_sequence_number"))
                 raise exceptions.ConfigValidationError(
                     f"config-kinesis_scraper.yaml: If \"{position_type}_position\" is *_SEQUENCE_NUMBER, "
-                    f"the value must be a positive numeric string, float or an integer."
+                    f"the value must be a positive numeric string or an integer."
                     f"\nValue provided: {value_provided_type} {value_provided}"
                 ) from e
 
@@ -601,13 +1026,56 @@ class ClientConfig(common.BaseCommonClass):
 
 
 class Client:
-    def __init__(self, client_config: ClientConfig):
+    def __init__(self, client_config: ClientConfig, *, output_dir: str = 'scraped_events',
+                 shared_read_budget: read_budget.ReadBudget = None):
         common.require_instance(client_config, ClientConfig, exceptions.InvalidArgumentException)
         self._client_config = client_config
+        self._output_dir = output_dir
 
         # Setup default attributes
         self._current_shard_iterator = None
 
+        # Holds the boto3 client owned by each parallel scrape worker thread
+        self._thread_local = threading.local()
+
+        # Record encode/write pipelines and record writers of the shards currently being scraped, keyed by shard id
+        self._pipelines = {}
+        self._record_writers = {}
+        self._checkpoint_trackers = {}
+
+        self._poll_controllers = {}
+        self._batch_limits = {}
+        # The Limit passed to the last get_records() call of each shard
+        self._last_limits = {}
+        self._ending_boundaries = {}
+
+        # Shared by all parallel scrape workers (and timestamp slices), so the limits apply to the whole scrape
+        self._read_budget = shared_read_budget
+        if self._read_budget is None:
+            self._read_budget = read_budget.ReadBudget(
+                shard_calls_per_second=self._client_config.shard_read_calls_per_second,
+                shard_bytes_per_second=self._client_config.shard_read_bytes_per_second,
+                stream_calls_per_second=self._client_config.stream_read_calls_per_second,
+                stream_bytes_per_second=self._client_config.stream_read_bytes_per_second,
+            )
+
+        # Sequence number of the last record returned by get_records() for each shard, used to renew expired iterators
+        self._last_sequence_numbers = {}
+
+        self._checkpoint_store = None
+        if self._client_config.checkpoint_interval > 0:
+            self._checkpoint_store = checkpoint.CheckpointStore(self._client_config.stream_name)
+        # Runs on every batch before it is written. Shared by all parallel scrape workers
+        self._record_filter = record_filter.RecordFilter(
+            partition_keys=self._client_config.partition_keys if self._client_config.partition_key_filter else None,
+            partition_key_pattern=self._client_config.record_filter.get('partition_key_pattern'),
+            data_fields=self._client_config.record_filter.get('data_fields'),
+        )
+        self._shard_map_cache = None
+        if self._client_config.shard_map_cache_ttl > 0:
+            self._shard_map_cache = shard_map.ShardMapCache(self._client_config.stream_name,
+                                                            ttl=self._client_config.shard_map_cache_ttl)
+
     def _confirm_shards_exist(self, shard_ids_detected: list):
         for shard_id in self._client_config.shard_ids:
             if shard_id not in shard_ids_detected:
@@ -615,76 +1083,510 @@ class Client:
                     f'Specified shard_id "{shard_id}" does not exist in stream '
                     f'"{self._client_config.stream_name}". Detected shards: {repr(shard_ids_detected)}')
 
+    def _confirm_shard_dirs_resumable(self, shard_ids: list):
+        # Output without a checkpoint cannot be resumed from, so scraping the shard again would append duplicates to it
+        log.debug('Checking for existing shard directories before beginning scraping')
+        for shard_id in shard_ids:
+            dir_path = record_store.shard_dir(shard_id, base_dir=self._output_dir)
+            log.debug(f'Checking if shard dir exists {dir_path}: {os.path.exists(dir_path)}')
+            if os.path.isdir(dir_path) and len(os.listdir(dir_path)) > 0 and self._load_checkpoint(shard_id) is None:
+                raise FileExistsError(f'Scrapped shard directory {dir_path} currently exists. To prevent '
+                                      f'conflicts/overwriting existing data, please move any previously scrapped '
+                                      f'messages and their shard id directory elsewhere and re-run this tool. ')
+
     def begin_scraping(self):
-        shard_ids_detected = self._get_shard_ids_of_stream()
+        shards_detected = self._list_shards()
+        shard_ids_detected = [i.shard_id for i in shards_detected]
         self._confirm_shards_exist(shard_ids_detected)
 
-        # Pre-check: Confirm we are not trying to scrape any shards that already have been written to disk
-        log.debug('Checking for exiting shard directories before beginning scraping')
-        for shard_id in shard_ids_detected:
-            dir_path = f'scraped_events/{shard_id}'
-            log.debug(dir_path)
-            log.debug(f'Checking if shard dir exists {dir_path}: {os.path.exists(dir_path)}')
-            # TODO: Re-add this check
-            # if os.path.exists(dir_path):
-            #     raise FileExistsError(f'Scrapped shard directory {dir_path} currently exists. To prevent '
-            #                           f'conflicts/overwriting existing data, please move any previously scrapped '
-            #                           f'messages and their shard id directory elsewhere and re-run this tool. ')
-
-        # Passed all checks, now we iterate through each shard id specified by the config (or all if not specified)
+        # Iterate through each shard id specified by the config (or all if not specified)
         shard_ids_to_scrape = shard_ids_detected
         if len(self._client_config.shard_ids) > 0:
             shard_ids_to_scrape = self._client_config.shard_ids
+        elif len(self._client_config.partition_keys) > 0:
+            shard_ids_to_scrape = [i.shard_id for i in shard_map.owning_shards(shards_detected,
+                                                                               self._client_config.partition_keys)]
+            log.info(f'Scraping {len(shard_ids_to_scrape)} of {len(shard_ids_detected)} shards, which hold the '
+                     f'configured partition_keys')
+
+        # Pre-check: Confirm we are not trying to scrape any shards that already have been written to disk
+        self._confirm_shard_dirs_resumable(shard_ids_to_scrape)
 
         log.debug(f'Shard ids to scrape: {repr(shard_ids_to_scrape)}')
-        self._scrape_shards(shard_ids_to_scrape)
+        shard_lineage = lineage.ShardLineage.from_shards(shards_detected, shard_ids_to_scrape)
+        shard_lineage.save(self._output_dir)
+        self._scrape_shards(shard_ids_to_scrape, shard_lineage)
 
-    def _scrape_shards(self, shard_ids=None):
+    def _scrape_shards(self, shard_ids=None, shard_lineage: lineage.ShardLineage = None):
         if shard_ids is None:
             raise exceptions.InvalidArgumentException('_scrape_shards called with None.')
+        # Without a lineage, the shards are scraped as unrelated shards
+        if shard_lineage is None:
+            shard_lineage = lineage.ShardLineage({shard_id: [] for shard_id in shard_ids})
 
-        for shard_id in shard_ids:
+        if self._client_config.shard_workers > 1 and len(shard_ids) > 1:
+            self._scrape_shards_parallel(shard_ids, shard_lineage)
+            return
+
+        for shard_id in shard_lineage.order():
             self._scrape_records_for_shard(shard_id)
 
+    def _scrape_shards_parallel(self, shard_ids: list, shard_lineage: lineage.ShardLineage) -> None:
+        """
+        Scrapes each shard on its own worker thread. Every shard has an independent read quota, so the total
+        scrape time is bound by the busiest shard rather than the number of shards.
+
+        A child shard (see ShardLineage) is only started once all of its parents finished, so the records of a
+        partition key are still read in order across a reshard, while unrelated lineages are scraped in parallel.
+
+        A shard that fails does not stop the other workers, though its descendants are not scraped. Once every shard
+        has finished, the failures are raised together as a single ShardScrapeError.
+        """
+        workers = min(self._client_config.shard_workers, len(shard_ids))
+        log.info(f'Scraping {len(shard_ids)} shards using {workers} parallel workers...')
+
+        failed_shards = {}
+        finished = set()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scraper') as executor:
+            futures = {}
+            while True:
+                for shard_id in shard_lineage.ready(finished):
+                    if shard_id not in futures.values():
+                        futures[executor.submit(self._scrape_records_for_shard, shard_id)] = shard_id
+                running = [i for i, shard_id in futures.items() if shard_id not in finished]
+                if len(running) == 0:
+                    break
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    shard_id = futures[future]
+                    finished.add(shard_id)
+                    try:
+                        future.result()
+                    except Exception as ex:
+                        log.error(f'Scraping failed for shard {shard_id}: {repr(ex)}')
+                        log.debug(common.get_exception_trace(ex))
+                        failed_shards[shard_id] = ex
+                        for descendant in shard_lineage.descendants(shard_id):
+                            if descendant not in finished:
+                                finished.add(descendant)
+                                failed_shards[descendant] = exceptions.ShardScrapeError(
+                                    f'Not scraped, as its parent shard {shard_id} failed to scrape')
+                        continue
+                    log.info(f'Finished scraping shard: {shard_id}')
+
+        if len(failed_shards) > 0:
+            failures = ', '.join([f'{shard_id}: {repr(ex)}' for shard_id, ex in failed_shards.items()])
+            raise exceptions.ShardScrapeError(
+                f'{len(failed_shards)} of {len(shard_ids)} shards failed to scrape. Failed shards: {failures}')
+
+    def _boto_client(self) -> botocore.client.BaseClient:
+        # The main thread uses the configured client, while each parallel scrape worker lazily creates its own
+        if threading.current_thread() is threading.main_thread():
+            return self._client_config.boto_client
+
+        boto_client = getattr(self._thread_local, 'boto_client', None)
+        if boto_client is None:
+            boto_client = self._new_boto_client()
+            self._thread_local.boto_client = boto_client
+        return boto_client
+
+    def _new_boto_client(self) -> botocore.client.BaseClient:
+        """
+        Builds a kinesis client for a worker thread using the configured boto_client_factory. Without one, the client
+        is built with the same region, endpoint_url and botocore config as the configured client, from a new boto3
+        session of its own (boto3 sessions are not thread safe) using the default credential chain.
+        """
+        if self._client_config.boto_client_factory is not None:
+            boto_client = self._client_config.boto_client_factory()
+            if not isinstance(boto_client, botocore.client.BaseClient):
+                raise exceptions.InvalidArgumentException(
+                    f"boto_client_factory must return a boto3 Kinesis client. "
+                    f"Value returned: {str(type(boto_client))} {repr(boto_client)}")
+            return boto_client
+
+        configured_client = self._client_config.boto_client
+        region_name = configured_client.meta.region_name
+        log.debug(f'Creating kinesis client in region {region_name} for worker {threading.current_thread().name}')
+        return boto3.session.Session().client('kinesis', region_name=region_name,
+                                              endpoint_url=configured_client.meta.endpoint_url,
+                                              config=configured_client.meta.config)
+
     def _scrape_records_for_shard(self, shard_id: str) -> None:
-        next_shard_iterator = self._shard_iterator(shard_id)
+        if self._client_config.timestamp_slices > 1:
+            self._scrape_shard_slices(shard_id)
+            return
+
+        shard_checkpoint = self._load_checkpoint(shard_id)
+        if shard_checkpoint is not None and shard_checkpoint.completed:
+            log.info(f'Skipping shard {shard_id}: its checkpoint in {self._checkpoint_store.dir_path} is marked as '
+                     f'completed. Remove the checkpoint file to scrape the shard again.')
+            return
+
         total_found_records = 0
+        if shard_checkpoint is None:
+            next_shard_iterator = self._shard_iterator(shard_id)
+        else:
+            next_shard_iterator = self._resume_from_checkpoint(shard_checkpoint)
+            total_found_records = shard_checkpoint.total_found_records
+            self._last_sequence_numbers[shard_id] = shard_checkpoint.sequence_number
         response_no_records = 0
         loop_count = 1
 
-        while next_shard_iterator:
-            iterator_response_obj = self._scrape_records_for_shard_iterator(GetRecordsIterationInput(
-                total_found_records=total_found_records,
-                response_no_records=response_no_records,
-                shard_iterator=next_shard_iterator,
-                loop_count=loop_count,
-                shard_id=shard_id
-            ))
-
-            # Break the iteration only if the iteration response states it is time to do so
-            if iterator_response_obj.break_iteration:
+        completed = False
+        self._start_checkpoint_tracker(shard_id)
+        try:
+            with self._records_pipeline(shard_id):
+                while next_shard_iterator:
+                    iterator_response_obj = self._scrape_records_for_shard_iterator(GetRecordsIterationInput(
+                        total_found_records=total_found_records,
+                        response_no_records=response_no_records,
+                        shard_iterator=next_shard_iterator,
+                        loop_count=loop_count,
+                        shard_id=shard_id
+                    ))
+
+                    # Break the iteration only if the iteration response states it is time to do so
+                    if iterator_response_obj.break_iteration:
+                        break
+
+                    # Set the variables for the next iteration
+                    total_found_records = iterator_response_obj.total_found_records
+                    response_no_records = iterator_response_obj.response_no_records
+                    next_shard_iterator = iterator_response_obj.next_shard_iterator
+                    loop_count = iterator_response_obj.loop_count
+            completed = True
+            if self._record_filter.enabled:
+                scanned_count, matched_count = self._record_filter.counters(shard_id)
+                log.info(f'Record filter matched {matched_count} of the {scanned_count} records scanned in shard '
+                         f'{shard_id}')
+        finally:
+            self._last_sequence_numbers.pop(shard_id, None)
+            self._poll_controllers.pop(shard_id, None)
+            self._batch_limits.pop(shard_id, None)
+            self._last_limits.pop(shard_id, None)
+            self._ending_boundaries.pop(shard_id, None)
+            self._stop_checkpoint_tracker(shard_id, completed)
+            self._close_record_writer(shard_id)
+
+    def _scrape_shard_slices(self, shard_id: str) -> None:
+        """
+        Splits the time range of the shard into timestamp_slices slices and scrapes them concurrently, each with its own
+        client writing to a temporary directory. Once every slice is done, their output is moved into the shard's
+        output directory in order.
+
+        Slices must not overlap, so the first record of each slice is located up front: the slice before it ends right
+        before that record (BEFORE_SEQUENCE_NUMBER), and the slice itself starts exactly at it (AT_SEQUENCE_NUMBER).
+        """
+        slice_configs = self._timestamp_slice_configs(shard_id)
+        slices_dir = f"{self._output_dir}/.slices-{re.sub(r'[^A-Za-z0-9-_]', '', shard_id)}"
+        if os.path.exists(slices_dir):
+            shutil.rmtree(slices_dir)
+        log.info(f'Scraping shard {shard_id} in {len(slice_configs)} parallel timestamp slices...')
+
+        try:
+            self._scrape_slices_into(shard_id, slice_configs, slices_dir)
+        finally:
+            # Slices are only scraped again from scratch, so the output of failed slices is of no further use
+            shutil.rmtree(slices_dir, ignore_errors=True)
+
+    def _scrape_slices_into(self, shard_id: str, slice_configs: list, slices_dir: str) -> None:
+        failed_slices = {}
+        slice_clients = [Client(i, output_dir=f'{slices_dir}/slice-{n}', shared_read_budget=self._read_budget)
+                         for n, i in enumerate(slice_configs)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(slice_clients),
+                                                   thread_name_prefix=f'slice-{shard_id}') as executor:
+            futures = {executor.submit(i._scrape_records_for_shard, shard_id): n for n, i in enumerate(slice_clients)}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except Exception as ex:
+                    log.error(f'Scraping failed for slice {futures[future]} of shard {shard_id}: {repr(ex)}')
+                    log.debug(common.get_exception_trace(ex))
+                    failed_slices[futures[future]] = ex
+
+        if len(failed_slices) > 0:
+            failures = ', '.join([f'slice {n}: {repr(ex)}' for n, ex in sorted(failed_slices.items())])
+            raise exceptions.ShardScrapeError(
+                f'{len(failed_slices)} of {len(slice_configs)} timestamp slices of shard {shard_id} failed to '
+                f'scrape. Failed slices: {failures}')
+
+        try:
+            record_writer = self._record_writer(shard_id)
+            for n in range(len(slice_clients)):
+                record_writer.adopt(record_store.shard_dir(shard_id, base_dir=f'{slices_dir}/slice-{n}'))
+        finally:
+            self._close_record_writer(shard_id)
+
+    def _timestamp_slice_configs(self, shard_id: str) -> list:
+        # Slices without any records, or starting at the same record as the next one, are dropped
+        slice_starts = [(self._client_config.starting_timestamp, None)]
+        for timestamp in self._timestamp_slice_starts()[1:]:
+            first_record = self._first_record_at(shard_id, timestamp)
+            if first_record is None:
                 break
+            first_sequence_number = first_record.SequenceNumber
+            if first_sequence_number != slice_starts[-1][1]:
+                slice_starts.append((timestamp, first_sequence_number))
+
+        slice_configs = []
+        for n, (timestamp, first_sequence_number) in enumerate(slice_starts):
+            overrides = {'shard_ids': [shard_id], 'shard_workers': 1, 'timestamp_slices': 1}
+            if first_sequence_number is not None:
+                overrides.update({'starting_position': 'AT_SEQUENCE_NUMBER',
+                                  'starting_sequence_number': first_sequence_number})
+            if n + 1 < len(slice_starts):
+                overrides.update({'ending_position': 'BEFORE_SEQUENCE_NUMBER',
+                                  'ending_sequence_number': slice_starts[n + 1][1]})
+            slice_configs.append(self._client_config.derive(**overrides))
+        return slice_configs
+
+    def _timestamp_slice_starts(self) -> list:
+        # The range ends at the ending timestamp, or now for LATEST
+        timestamp_format = '%Y-%m-%d %H:%M:%S'
+        start = datetime.datetime.strptime(self._client_config.starting_timestamp, timestamp_format)
+        end = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        if self._client_config.ending_timestamp is not None:
+            end = datetime.datetime.strptime(self._client_config.ending_timestamp, timestamp_format)
+
+        slice_length = max(end - start, datetime.timedelta(0)) / self._client_config.timestamp_slices
+        slice_starts = []
+        for n in range(self._client_config.timestamp_slices):
+            timestamp = (start + slice_length * n).strftime(timestamp_format)
+            if timestamp not in slice_starts:
+                slice_starts.append(timestamp)
+        return slice_starts
+
+    def _first_record_at(self, shard_id: str, timestamp: str) -> Optional['Record']:
+        """Returns the first record at or after the timestamp, or None if there is none yet."""
+        iterator = self._get_new_shard_iterator(shard_id, iterator_type='AT_TIMESTAMP', timestamp=timestamp)
+        for _ in range(self._client_config.max_empty_polls):
+            response = self._get_records(iterator, shard_id=shard_id, limit=1)
+            if len(response.Records) > 0:
+                return response.Records[0]
+            # A closed shard read to its end has no next iterator
+            if response.MillisBehindLatest == 0 or response.NextShardIterator is None:
+                return None
+            iterator = response.NextShardIterator
+        return None
+
+    def locate(self, start_timestamp: Union[datetime.datetime, str],
+               end_timestamp: Union[datetime.datetime, str, None] = None) -> dict:
+        """
+        Returns a ShardWindow per shard (the configured shard_ids, or all shards of the stream), holding the first and
+        last sequence number of the records that arrived from start_timestamp up to, but excluding, end_timestamp (or
+        now if None). Timestamps are UTC, to the second. Only a handful of single record reads are made per shard, so
+        the window can be located before any bulk reading (see ShardWindow.config_overrides()).
+        """
+        start = boundary.to_utc_second(start_timestamp)
+        end = boundary.to_utc_second(end_timestamp if end_timestamp is not None
+                                     else datetime.datetime.now(datetime.timezone.utc))
+        if start >= end:
+            raise exceptions.InvalidArgumentException(
+                f"start_timestamp must be earlier than end_timestamp. Values provided: {start} {end}")
 
-            # Set the variables for the next iteration
-            total_found_records = iterator_response_obj.total_found_records
-            response_no_records = iterator_response_obj.response_no_records
-            next_shard_iterator = iterator_response_obj.next_shard_iterator
-            loop_count = iterator_response_obj.loop_count
+        shard_ids = self._client_config.shard_ids
+        if len(shard_ids) == 0:
+            # Every shard open at start_timestamp or created after it, whatever the configured starting_position
+            shard_filter = {'Type': 'AT_TIMESTAMP', 'Timestamp': start.strftime('%Y-%m-%d %H:%M:%S')}
+            shard_ids = [i.shard_id for i in self._list_shards_matching(shard_filter)]
+        return {shard_id: self._locate_shard(shard_id, start, end) for shard_id in shard_ids}
+
+    def _locate_shard(self, shard_id: str, start: datetime.datetime, end: datetime.datetime) -> ShardWindow:
+        """
+        An AT_TIMESTAMP iterator gives the first record at or after a timestamp, but a shard cannot be read backwards,
+        so the last record before the end is found by binary searching for the last second a record arrived at before
+        it, then reading forward through the records of that second only.
+        """
+        window = {
+            'shard_id': shard_id,
+            'start_timestamp': start.strftime('%Y-%m-%d %H:%M:%S'),
+            'end_timestamp': end.strftime('%Y-%m-%d %H:%M:%S'),
+            'first_sequence_number': None,
+            'last_sequence_number': None,
+        }
+        first_record = self._first_record_at(shard_id, window['start_timestamp'])
+        if first_record is None or boundary.to_utc_second(first_record.ApproximateArrivalTimestamp) >= end:
+            log.info(f'No records found in shard {shard_id} between {start} and {end}')
+            return ShardWindow(window)
+        window['first_sequence_number'] = first_record.SequenceNumber
+
+        # Invariant: a record arrived at the second low, and none arrived from high up to the end
+        low = boundary.to_utc_second(first_record.ApproximateArrivalTimestamp)
+        high = end
+        while high - low > datetime.timedelta(seconds=1):
+            middle = low + datetime.timedelta(seconds=(high - low).total_seconds() // 2)
+            record = self._first_record_at(shard_id, middle.strftime('%Y-%m-%d %H:%M:%S'))
+            timestamp = None if record is None else boundary.to_utc_second(record.ApproximateArrivalTimestamp)
+            if timestamp is not None and timestamp < end:
+                low = timestamp
+            else:
+                high = middle
+
+        window['last_sequence_number'] = self._last_sequence_number_before(shard_id, low, end)
+        log.info(f"Located records of shard {shard_id} between {start} and {end}: "
+                 f"{window['first_sequence_number']} - {window['last_sequence_number']}")
+        return ShardWindow(window)
+
+    def _last_sequence_number_before(self, shard_id: str, timestamp: datetime.datetime,
+                                     end: datetime.datetime) -> Optional[str]:
+        # Reads forward from the timestamp until the first record at or after the end, or the tip of the shard
+        last_sequence_number = None
+        iterator = self._get_new_shard_iterator(shard_id, iterator_type='AT_TIMESTAMP',
+                                                timestamp=timestamp.strftime('%Y-%m-%d %H:%M:%S'))
+        empty_polls = 0
+        while empty_polls < self._client_config.max_empty_polls:
+            response = self._get_records(iterator, shard_id=shard_id)
+            for record in response.Records:
+                if boundary.to_utc_second(record.ApproximateArrivalTimestamp) >= end:
+                    return last_sequence_number
+                last_sequence_number = record.SequenceNumber
+            if response.MillisBehindLatest == 0 and len(response.Records) < self._last_limits[shard_id]:
+                break
+            if response.NextShardIterator is None:
+                break
+            empty_polls = empty_polls + 1 if len(response.Records) == 0 else 0
+            iterator = response.NextShardIterator
+        return last_sequence_number
+
+    def _load_checkpoint(self, shard_id: str) -> Optional[checkpoint.ShardCheckpoint]:
+        if self._checkpoint_store is None:
+            return None
+        return self._checkpoint_store.load(shard_id)
+
+    def _resume_from_checkpoint(self, shard_checkpoint: checkpoint.ShardCheckpoint) -> str:
+        """
+        Discards any output written after the checkpoint was taken and returns an iterator positioned right after the
+        last checkpointed record, so no record is written twice or skipped.
+        """
+        shard_id = shard_checkpoint.shard_id
+        log.info(f'Resuming shard {shard_id} from checkpoint taken at {shard_checkpoint.updated_at}: '
+                 f'{shard_checkpoint.record_count} records written, last sequence number '
+                 f'{shard_checkpoint.sequence_number}')
+        self._record_writer(shard_id).truncate(shard_checkpoint.record_count, shard_checkpoint.output_position)
+        return self._get_new_shard_iterator(shard_id,
+                                            iterator_type='AFTER_SEQUENCE_NUMBER',
+                                            sequence_number=shard_checkpoint.sequence_number)
+
+    def _start_checkpoint_tracker(self, shard_id: str) -> None:
+        if self._checkpoint_store is None:
+            return
+        self._checkpoint_trackers[shard_id] = checkpoint.CheckpointTracker(
+            self._checkpoint_store, shard_id, self._client_config.checkpoint_interval,
+            sync=self._record_writer(shard_id).sync)
+
+    def _stop_checkpoint_tracker(self, shard_id: str, completed: bool) -> None:
+        # Whether the shard finished or failed, save the last written batch so a re-run continues from it
+        tracker = self._checkpoint_trackers.pop(shard_id, None)
+        if tracker is not None:
+            tracker.flush(completed=completed)
+
+    def _batch_written(self, shard_id: str, total_found_records: int, last_sequence_number: str) -> None:
+        """
+        Records the progress of the shard once a batch is on disk. The checkpoint holds the last record read (rather
+        than written), as total_found_records counts every record read: a resume must not read filtered records again.
+        """
+        tracker = self._checkpoint_trackers.get(shard_id)
+        if tracker is None:
+            return
+        record_writer = self._record_writer(shard_id)
+        if record_writer.record_count is None:
+            # Nothing was written yet, so resuming from the start of the shard loses nothing
+            return
+        tracker.batch_written(sequence_number=last_sequence_number,
+                              total_found_records=total_found_records,
+                              record_count=record_writer.record_count,
+                              output_position=record_writer.position)
+
+    @contextlib.contextmanager
+    def _records_pipeline(self, shard_id: str):
+        """
+        While active, records dispatched for the shard are encoded and written to disk on separate threads joined
+        by bounded queues, so get_records() polling never waits on disk writes. Leaving the context waits for every
+        queued record to be written. Does nothing if pipeline_queue_size is 0.
+        """
+        if self._client_config.pipeline_queue_size < 1:
+            yield
+            return
+
+        record_writer = self._record_writer(shard_id)
+
+        def encode(item):
+            records, total_found_records, last_sequence_number = item
+            return record_writer.encode(records), total_found_records, last_sequence_number
+
+        def write(item):
+            encoded_records, total_found_records, last_sequence_number = item
+            if len(encoded_records) > 0:
+                record_writer.write(encoded_records)
+            self._batch_written(shard_id, total_found_records, last_sequence_number)
+
+        records_pipeline = pipeline.Pipeline(
+            f'pipeline-{shard_id}',
+            [encode, write],
+            self._client_config.pipeline_queue_size
+        )
+        self._pipelines[shard_id] = records_pipeline
+        try:
+            with records_pipeline:
+                yield
+        finally:
+            del self._pipelines[shard_id]
+
+    def _dispatch_records(self, shard_id: str, records: RecordsCollection, total_found_records: int,
+                          last_sequence_number: str) -> None:
+        """
+        Writes the records kept from a batch, then checkpoints the batch as read up to last_sequence_number. Batches
+        with no records to write (e.g. all filtered out) are only checkpointed.
+        """
+        records_pipeline = self._pipelines.get(shard_id)
+        if records_pipeline is None:
+            if len(records) > 0:
+                self._process_records(shard_id, records)
+            self._batch_written(shard_id, total_found_records, last_sequence_number)
+            return
+
+        self._validate_process_records_args(shard_id, records)
+        records_pipeline.submit((records, total_found_records, last_sequence_number))
+
+    def _record_writer(self, shard_id: str) -> record_store.RecordWriter:
+        record_writer = self._record_writers.get(shard_id)
+        if record_writer is not None:
+            return record_writer
+
+        if self._client_config.output_format == 'segments':
+            record_writer = record_store.SegmentRecordWriter(shard_id,
+                                                             max_records=self._client_config.segment_max_records,
+                                                             max_bytes=self._client_config.segment_max_bytes,
+                                                             base_dir=self._output_dir)
+        else:
+            record_writer = record_store.FileRecordWriter(shard_id, base_dir=self._output_dir)
+        self._record_writers[shard_id] = record_writer
+        return record_writer
+
+    def _close_record_writer(self, shard_id: str) -> None:
+        record_writer = self._record_writers.pop(shard_id, None)
+        if record_writer is not None:
+            record_writer.close()
 
     def _scrape_records_for_shard_iterator(self, iterator_obj: GetRecordsIterationInput) \
             -> GetRecordsIterationResponse:
 
         # Increment total loop counter
         iterator_obj.loop_count += 1
+        # Validates the input once per poll, whichever values were changed since the previous iteration
+        iterator_obj.validate()
 
         self._scrape_records_for_shard_handle_poll_delay(
             iterator_obj.loop_count, iterator_obj.shard_iterator, iterator_obj.shard_id
         )
 
         # Make the boto3 call
-        response = self._get_records(iterator_obj.shard_iterator)
+        response = self._poll_records(iterator_obj.shard_iterator, iterator_obj.shard_id)
 
         if len(response.Records) > 0:
+            self._last_sequence_numbers[iterator_obj.shard_id] = \
+                response.Records[len(response.Records) - 1].SequenceNumber
             iterator_obj.total_found_records += len(response.Records)
             log.debug(f'Found {len(response.Records)} in batch.')
 
@@ -702,12 +1604,30 @@ class Client:
                 records_count_upto_to_add = self._calculate_iteration_upto_add(
                     iterator_obj.total_found_records - len(response.Records), len(response.Records))
 
+            # If ending_position is a sequence number or timestamp, drop the records past it
+            response_records = [i for i in response.Records]
+            boundary_reached = False
+            records_past_boundary = 0
+            ending_boundary = self._ending_boundary(iterator_obj.shard_id)
+            if ending_boundary is not None:
+                records_within_boundary, boundary_reached = ending_boundary.cut(response_records)
+                records_past_boundary = len(response_records) - records_within_boundary
+                response_records = response_records[:records_within_boundary]
+
             records_to_process = RecordsCollection(common.list_append_upto_n_items_from_new_list(
                 records_to_process,
-                [i for i in response.Records],
+                response_records,
                 records_count_upto_to_add)
             )
-            self._process_records(iterator_obj.shard_id, records_to_process)
+            # Aggregated records are expanded after the ending position was applied, as it is set in Kinesis records
+            if self._client_config.kpl_deaggregate:
+                records_to_process = RecordsCollection([j for i in records_to_process for j in i.sub_records()])
+            # Records not matching the record filter are read (and counted) but not written
+            if self._record_filter.enabled:
+                records_to_process = RecordsCollection(self._record_filter.apply(iterator_obj.shard_id,
+                                                                                 records_to_process))
+            self._dispatch_records(iterator_obj.shard_id, records_to_process, iterator_obj.total_found_records,
+                                   self._last_sequence_numbers[iterator_obj.shard_id])
 
             # If we are at the total per shard, we terminate the loop
             break_iteration = False
@@ -716,6 +1636,16 @@ class Client:
                 break_iteration = True
                 log.info(f'Reached {self._client_config.total_records_per_shard} max records per shard '
                          f'limit for shard {iterator_obj.shard_id}\n')
+            elif boundary_reached:
+                break_iteration = True
+                log.info(f'Reached ending_position {self._client_config.ending_position} for shard '
+                         f'{iterator_obj.shard_id}, {records_past_boundary} records of the '
+                         f'last batch were past it\n')
+            elif self._reached_latest(iterator_obj.shard_id, response):
+                break_iteration = True
+            elif response.NextShardIterator is None:
+                break_iteration = True
+                log.info(f'Shard {iterator_obj.shard_id} is closed and was read to its end\n')
 
             iterator_response = GetRecordsIterationResponse(
                 total_found_records=iterator_obj.total_found_records,
@@ -740,6 +1670,11 @@ class Client:
                      f'{iterator_obj.shard_id} and found a total of {len(response.Records)} records, '
                      f'current iterator: {iterator_obj.shard_iterator}\n'
                      f'Aborting further reads for current shard: {iterator_obj.shard_id}')
+        elif self._reached_latest(iterator_obj.shard_id, response):
+            break_iteration = True
+        elif response.NextShardIterator is None:
+            break_iteration = True
+            log.info(f'Shard {iterator_obj.shard_id} is closed and was read to its end\n')
 
         # End of iteration, build and return new iterator response
         iterator_response = GetRecordsIterationResponse(
@@ -753,6 +1688,31 @@ class Client:
         )
         return iterator_response
 
+    def _ending_boundary(self, shard_id: str) -> Optional[boundary.EndingBoundary]:
+        if shard_id not in self._ending_boundaries:
+            self._ending_boundaries[shard_id] = boundary.new_ending_boundary(
+                self._client_config.ending_position,
+                sequence_number=self._client_config.ending_sequence_number,
+                timestamp=self._client_config.ending_timestamp)
+        return self._ending_boundaries[shard_id]
+
+    def _reached_latest(self, shard_id: str, response: Boto3GetRecordsResponse) -> bool:
+        """
+        With stop_at_latest enabled, a shard read up to LATEST is done as soon as a response is caught up with the tip
+        of the stream (MillisBehindLatest of 0) and holds fewer records than requested, instead of waiting for
+        max_empty_polls empty responses.
+        """
+        if self._client_config.ending_position != 'LATEST' or not self._client_config.stop_at_latest:
+            return False
+        if response.MillisBehindLatest != 0:
+            return False
+        limit = self._last_limits.get(shard_id, int(self._client_config.poll_batch_size))
+        if len(response.Records) >= limit:
+            return False
+        log.info(f'\n\nShard {shard_id} is caught up with the tip of the stream (MillisBehindLatest: 0). '
+                 f'Aborting further reads for current shard: {shard_id}')
+        return True
+
     def _calculate_iteration_upto_add(self, total_found_records_without_records_count: int, records_count: int) -> int:
         """
         :param total_found_records: The total found records for all get_records calls for the current shard.
@@ -772,25 +1732,117 @@ class Client:
         return records_count
 
     def _scrape_records_for_shard_handle_poll_delay(self, loop_count: int, iterator: str, shard_id: str) -> None:
-        if self._client_config.poll_delay > 0:
-            log.info(f"Wait delay of {self._client_config.poll_delay} seconds per poll_delay setting...")
-            time.sleep(self._client_config.poll_delay)
+        self._poll_controller(shard_id).wait()
         log.info(f'get_records() loop count: {str(loop_count)} for shard: {shard_id}')
         log.debug(f'Current iterator: {iterator}')
 
-    def _get_records(self, iterator: str) -> Boto3GetRecordsResponse:
+    def _get_records(self, iterator: str, *, shard_id: str = None, limit: int = None) -> Boto3GetRecordsResponse:
+        use_read_budget = shard_id is not None and self._read_budget.enabled
+        if use_read_budget:
+            self._read_budget.before_call(shard_id)
+
+        batch_limit = self._batch_limit(shard_id)
+        if limit is None:
+            limit = self._client_config.poll_batch_size if batch_limit is None else batch_limit.limit
+            if shard_id is not None:
+                self._last_limits[shard_id] = int(limit)
+
         timer_start = time.time()
 
-        response = self._client_config.boto_client.get_records(
+        response = self._boto_client().get_records(
             ShardIterator=iterator,
-            Limit=self._client_config.poll_batch_size
+            Limit=limit
         )
 
         timer_end = time.time()
         log.debug(f'get_records() completed in {timer_end - timer_start} seconds.')
 
+        if use_read_budget or batch_limit is not None:
+            response_size = self._get_records_response_size(response)
+            if use_read_budget:
+                self._read_budget.after_call(shard_id, response_size)
+            if batch_limit is not None:
+                batch_limit.observe(len(response.get('Records', [])), response_size)
+                log.debug(f'Average record size: {batch_limit.average_record_size} bytes, next get_records() '
+                          f'Limit: {batch_limit.limit}')
+
         return Boto3GetRecordsResponse(response)
 
+    def _batch_limit(self, shard_id: str | None) -> Optional[poll_controller.AdaptiveBatchLimit]:
+        # Returns None if the Limit is fixed to poll_batch_size
+        if shard_id is None or self._client_config.poll_target_bytes == 0:
+            return None
+        batch_limit = self._batch_limits.get(shard_id)
+        if batch_limit is None:
+            batch_limit = poll_controller.AdaptiveBatchLimit(int(self._client_config.poll_batch_size),
+                                                             self._client_config.poll_target_bytes)
+            self._batch_limits[shard_id] = batch_limit
+        return batch_limit
+
+    def _poll_controller(self, shard_id: str) -> poll_controller.PollController:
+        controller = self._poll_controllers.get(shard_id)
+        if controller is None:
+            controller = poll_controller.new_poll_controller(self._client_config.poll_mode,
+                                                             poll_delay=self._client_config.poll_delay,
+                                                             max_poll_delay=self._client_config.max_poll_delay)
+            self._poll_controllers[shard_id] = controller
+        return controller
+
+    def _poll_records(self, iterator: str, shard_id: str) -> Boto3GetRecordsResponse:
+        controller = self._poll_controller(shard_id)
+        throttled_retries = 0
+        while True:
+            try:
+                response = self._get_records_renewing_expired(iterator, shard_id)
+            except botocore.exceptions.ClientError as ex:
+                if ex.response.get('Error', {}).get('Code') != 'ProvisionedThroughputExceededException' \
+                        or not controller.retry_throttled:
+                    raise
+                if throttled_retries >= poll_controller.MAX_THROTTLED_RETRIES:
+                    log.error(f'get_records() was throttled {throttled_retries + 1} times in a row for shard '
+                              f'{shard_id}, giving up')
+                    raise
+                throttled_retries += 1
+                log.warning(f'get_records() was throttled for shard {shard_id}, retrying...')
+                controller.throttled()
+                controller.wait()
+                continue
+            controller.records_received(len(response.Records), response.MillisBehindLatest)
+            return response
+
+    def _get_records_renewing_expired(self, iterator: str, shard_id: str) -> Boto3GetRecordsResponse:
+        """
+        Shard iterators expire 5 minutes after being returned. If the iterator expired (e.g. due to a slow disk or a
+        long poll_delay), a new one is fetched right after the last record seen and the call is retried once.
+        """
+        try:
+            return self._get_records(iterator, shard_id=shard_id)
+        except botocore.exceptions.ClientError as ex:
+            if ex.response.get('Error', {}).get('Code') != 'ExpiredIteratorException':
+                raise
+        log.warning(f'Shard iterator for shard {shard_id} expired, getting a new iterator...')
+        return self._get_records(self._renew_shard_iterator(shard_id), shard_id=shard_id)
+
+    def _renew_shard_iterator(self, shard_id: str) -> str:
+        last_sequence_number = self._last_sequence_numbers.get(shard_id)
+        if last_sequence_number is None:
+            # No record was returned yet, so the configured starting position has not been read past
+            return self._get_new_shard_iterator(shard_id)
+        return self._get_new_shard_iterator(shard_id,
+                                            iterator_type='AFTER_SEQUENCE_NUMBER',
+                                            sequence_number=last_sequence_number)
+
+    @staticmethod
+    def _get_records_response_size(response: dict) -> int:
+        # Kinesis counts the data blob and partition key of every record towards the read throughput of the shard
+        try:
+            return sum([len(common.to_bytes(i['Data'])) + len(common.to_bytes(i['PartitionKey']))
+                        for i in response['Records']])
+        except Exception as ex:
+            error_msg = f'received an unexpected response from boto3 kinesis get_records(): {repr(ex)}'
+            log.error(error_msg)
+            raise exceptions.AwsUnexpectedResponse(error_msg) from ex
+
     # If we don't have an existing/current shard iterator, we grab a new one, otherwise return the current one
     def _shard_iterator(self, shard_id: str) -> str:
         if not isinstance(shard_id, str):
@@ -802,51 +1854,36 @@ class Client:
 
         return self._get_new_shard_iterator(shard_id)
 
-    def _get_new_shard_iterator(self, shard_id: str) -> str:
+    def _get_new_shard_iterator(self, shard_id: str, *, iterator_type: str = None, sequence_number: str = None,
+                                timestamp: Union[datetime.datetime, str] = None) -> str:
+        """
+        Returns an iterator for the configured starting position, unless an iterator_type is passed, in which case
+        the passed sequence_number or timestamp is used instead (e.g. to resume after a checkpointed record).
+        """
         if not isinstance(shard_id, str):
             raise exceptions.InvalidArgumentException(
                 f"shard_id must be a string.\nType provided: {repr(type(shard_id))}")
 
+        if iterator_type is None:
+            iterator_type = self._client_config.starting_position
+            sequence_number = self._client_config.starting_sequence_number
+            timestamp = self._client_config.starting_timestamp
+
         # If we have a timestamp specified, we call client.get_shard_iterator with the timestamp,
         # otherwise call it without that argument
         log.info(f'Getting iterator for shard id: {shard_id}')
-        if self._client_config.starting_timestamp is not None:
-            log.debug(f'Calling get_shard_iterator() with: '
-                      f'StreamName={self._client_config.stream_name} '
-                      f'ShardId={shard_id} '
-                      f'ShardIteratorType={self._client_config.starting_position} '
-                      f'Timestamp={self._client_config.starting_timestamp}'
-                      )
-            response = self._client_config.boto_client.get_shard_iterator(
-                StreamName=self._client_config.stream_name,
-                ShardId=shard_id,
-                ShardIteratorType=self._client_config.starting_position,
-                Timestamp=self._client_config.starting_timestamp
-            )
-        elif self._client_config.starting_sequence_number is not None:
-            log.debug(f'Calling get_shard_iterator() with: '
-                      f'StreamName={self._client_config.stream_name} '
-                      f'ShardId={shard_id} '
-                      f'ShardIteratorType={self._client_config.starting_position} '
-                      f'StartingSequenceNumber={self._client_config.starting_sequence_number}'
-                      )
-            response = self._client_config.boto_client.get_shard_iterator(
-                StreamName=self._client_config.stream_name,
-                ShardId=shard_id,
-                ShardIteratorType=self._client_config.starting_position,
-                StartingSequenceNumber=self._client_config.starting_sequence_number,
-            )
-        else:
-            log.debug(f'Calling get_shard_iterator() with: '
-                      f'StreamName={self._client_config.stream_name} '
-                      f'ShardId={shard_id} '
-                      f'ShardIteratorType={self._client_config.starting_position}'
-                      )
-            response = self._client_config.boto_client.get_shard_iterator(
-                StreamName=self._client_config.stream_name,
-                ShardId=shard_id,
-                ShardIteratorType=self._client_config.starting_position,
-            )
+        kwargs = {
+            'StreamName': self._client_config.stream_name,
+            'ShardId': shard_id,
+            'ShardIteratorType': iterator_type,
+        }
+        if timestamp is not None:
+            kwargs['Timestamp'] = timestamp
+        elif sequence_number is not None:
+            kwargs['StartingSequenceNumber'] = str(sequence_number)
+
+        log.debug(f'Calling get_shard_iterator() with: ' + ' '.join([f'{k}={v}' for k, v in kwargs.items()]))
+        response = self._boto_client().get_shard_iterator(**kwargs)
 
         # TODO: Replace this with a custom object and validator
         try:
@@ -861,30 +1898,71 @@ class Client:
         return iterator
 
     def _get_shard_ids_of_stream(self) -> list:
-        log.info('Getting shard ids from AWS...')
-        response = self._client_config.boto_client.describe_stream(StreamName=self._client_config.stream_name)
-        log.info(f"Stream name: {response['StreamDescription']['StreamName']}")
-        log.info(f"Stream ARN: {response['StreamDescription']['StreamARN']}")
+        return [i.shard_id for i in self._list_shards()]
 
-        shard_ids = []
-        shard_details = response['StreamDescription']['Shards']
-        log.debug(f'Detecting shard ids that exist for stream: {self._client_config.stream_name}')
+    def _list_shards(self) -> list:
+        return self._list_shards_matching(self._shard_filter())
+
+    def _list_shards_matching(self, shard_filter: Optional[dict]) -> list:
+        if self._shard_map_cache is not None:
+            shards = self._shard_map_cache.load(shard_filter)
+            if shards is not None:
+                log.info(f'Using the shard map cached in {self._shard_map_cache.file_path}')
+                return shards
 
-        # # TODO: Replace this with a custom object and validator
-        for node in shard_details:
+        log.info('Getting shard ids from AWS...')
+        log.debug(f'Detecting shard ids that exist for stream: {self._client_config.stream_name}')
+        kwargs = {'StreamName': self._client_config.stream_name}
+        if shard_filter is not None:
+            kwargs['ShardFilter'] = shard_filter
+        shards = []
+        while True:
+            response = self._boto_client().list_shards(**kwargs)
             try:
-                log.info(f"Detected shard id: {node['ShardId']}")
-                shard_ids.append(node['ShardId'])
+                shards.extend([shard_map.Shard.from_response(node) for node in response['Shards']])
             except Exception as ex:
-                error_msg = f'received an unexpected response from boto3 kinesis describe_stream(): {repr(ex)}'
+                error_msg = f'received an unexpected response from boto3 kinesis list_shards(): {repr(ex)}'
                 log.error(error_msg)
                 log.debug(f'Response value:')
                 log.debug(response)
                 raise exceptions.AwsUnexpectedResponse(error_msg) from ex
-        return shard_ids
+            if response.get('NextToken') is None:
+                break
+            # Follow-up pages must only pass the token, not the stream name or filter
+            kwargs = {'NextToken': response['NextToken']}
+
+        for shard in shards:
+            log.info(f"Detected shard id: {shard.shard_id}" + (' (closed)' if shard.closed else ''))
+        if self._shard_map_cache is not None:
+            self._shard_map_cache.save(shard_filter, shards)
+        return shards
+
+    def _shard_filter(self) -> Optional[dict]:
+        """
+        When scraping every shard, only the shards that can hold records from the starting position onward are listed,
+        e.g. shards closed before starting_timestamp are skipped. Configured shard_ids are always checked against all
+        shards of the stream instead, so they are never reported as missing.
+
+        The AFTER_SHARD_ID filter is not used: it lists shards by shard id order rather than by when they hold records,
+        so it would drop the parents a child shard is read after, and no starting position maps to it.
+        """
+        if len(self._client_config.shard_ids) > 0:
+            return None
+        if self._client_config.starting_position == 'AT_TIMESTAMP':
+            return {'Type': 'AT_TIMESTAMP', 'Timestamp': self._client_config.starting_timestamp}
+        if self._client_config.starting_position == 'LATEST':
+            return {'Type': 'AT_LATEST'}
+        if self._client_config.starting_position == 'TRIM_HORIZON':
+            return {'Type': 'AT_TRIM_HORIZON'}
+        return None
+
+    def _process_records(self, shard_id: str, records: RecordsCollection):
+        self._validate_process_records_args(shard_id, records)
+        record_writer = self._record_writer(shard_id)
+        record_writer.write(record_writer.encode(records))
 
     @staticmethod
-    def _process_records(shard_id: str, records: RecordsCollection):
+    def _validate_process_records_args(shard_id: str, records: RecordsCollection):
         if not isinstance(shard_id, str):
             raise exceptions.InvalidArgumentException(
                 f'"shard_id" must be of type str. Received: {repr(type(shard_id))} {repr(shard_id)}')
@@ -892,31 +1970,3 @@ class Client:
         if not isinstance(records, RecordsCollection):
             raise exceptions.InvalidArgumentException(
                 f'"records" must be of type RecordsCollection. Received: {repr(type(records))} {repr(records)}')
-
-        # Safety: We strip all but safe characters before creating any files/dirs
-        shard_id = re.sub(r'[^A-Za-z0-9-_]', '', shard_id)
-        dir_path = f'scraped_events/{shard_id}'
-        log.debug(f'Processing records for batch')
-        log.debug(f'mkdirs path: {dir_path}')
-
-        if not os.path.exists(dir_path):
-            os.makedirs(dir_path)
-
-        prefix = common.count_files_in_dir(dir_path)
-        log.debug(f'Initial prefix is: {prefix}')
-        for record in records:
-            prefix += 1
-            # Safety: We strip all but safe characters before creating any files/dirs
-            timestamp = re.sub(r'[^A-Za-z0-9-:_]', '',
-                               record.ApproximateArrivalTimestamp.strftime('%Y-%m-%d_%H:%M:%S'))
-            log.debug(f'timestamp: {timestamp}')
-            filename_uri = f"{dir_path}/{prefix}-{timestamp.replace(':', ';')}.json"
-            log.debug(f'Filename: {filename_uri}')
-
-            try:
-                with open(filename_uri, "x") as f:
-                    f.write(record.toJson(indent=4))
-            except FileExistsError as ex:
-                raise FileExistsError(f'The file "{filename_uri}" already exists when trying to create an event '
-                                      f'record file. Be sure scraping is not being run with a populated '
-                                      f'scraped_events/{shard_id} directory.') from ex
@@ -0,0 +1,130 @@
+import hashlib
+from typing import List, Optional, Tuple
+
+# Kinesis Producer Library (KPL) aggregated record format:
+#   MAGIC + protobuf encoded AggregatedRecord + MD5 digest of the protobuf bytes
+#
+#   message AggregatedRecord {
+#     repeated string partition_key_table     = 1;
+#     repeated string explicit_hash_key_table = 2;
+#     repeated Record records                 = 3;
+#   }
+#   message Record {
+#     required uint64 partition_key_index     = 1;
+#     optional uint64 explicit_hash_key_index = 2;
+#     required bytes  data                    = 3;
+#     repeated Tag    tags                    = 4;
+#   }
+MAGIC = b'\xf3\x89\x9a\xc2'
+DIGEST_SIZE = 16
+
+# Protobuf wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH_DELIMITED = 2
+_FIXED32 = 5
+
+
+def is_aggregated(data: bytes) -> bool:
+    """Whether the Data of a Kinesis record holds KPL aggregated user records (checked by magic prefix and digest)."""
+    if not isinstance(data, bytes) or len(data) <= len(MAGIC) + DIGEST_SIZE or not data.startswith(MAGIC):
+        return False
+    message = memoryview(data)[len(MAGIC):-DIGEST_SIZE]
+    return hashlib.md5(message).digest() == data[-DIGEST_SIZE:]
+
+
+def deaggregate(data: bytes) -> List[Tuple[str, Optional[str], bytes]]:
+    """
+    Returns a (partition key, explicit hash key or None, data) tuple per user record of a KPL aggregated record, in the
+    order they were aggregated. The blob is parsed in place through a memoryview: each user record's data is copied
+    out exactly once.
+
+    :raises ValueError: If the data is not a valid aggregated record
+    """
+    sub_records = try_deaggregate(data)
+    if sub_records is None:
+        raise ValueError("The data is not a KPL aggregated record (magic prefix or MD5 digest mismatch)")
+    return sub_records
+
+
+def try_deaggregate(data: bytes) -> Optional[List[Tuple[str, Optional[str], bytes]]]:
+    """
+    Same as deaggregate(), but returns None if the data is not an aggregated record, so callers handling both kinds of
+    records only check the magic prefix and digest once.
+
+    :raises ValueError: If the data is an aggregated record but its user records cannot be parsed
+    """
+    if not is_aggregated(data):
+        return None
+    message = memoryview(data)[len(MAGIC):-DIGEST_SIZE]
+
+    partition_keys = []
+    explicit_hash_keys = []
+    records = []
+    for field_number, value in _fields(message):
+        if field_number == 1:
+            partition_keys.append(bytes(value).decode('utf-8'))
+        elif field_number == 2:
+            explicit_hash_keys.append(bytes(value).decode('utf-8'))
+        elif field_number == 3:
+            records.append(value)
+
+    sub_records = []
+    for record in records:
+        partition_key_index, explicit_hash_key_index, record_data = None, None, None
+        for field_number, value in _fields(record):
+            if field_number == 1:
+                partition_key_index = value
+            elif field_number == 2:
+                explicit_hash_key_index = value
+            elif field_number == 3:
+                record_data = value
+        if partition_key_index is None or record_data is None:
+            raise ValueError("An aggregated user record is missing its partition_key_index or data")
+        try:
+            explicit_hash_key = None
+            if explicit_hash_key_index is not None:
+                explicit_hash_key = explicit_hash_keys[explicit_hash_key_index]
+            sub_records.append((partition_keys[partition_key_index], explicit_hash_key, bytes(record_data)))
+        except IndexError as ex:
+            raise ValueError(f"An aggregated user record references a missing table entry: {ex}") from ex
+    return sub_records
+
+
+def _fields(message: memoryview):
+    """Yields the (field number, value) pairs of a protobuf message: ints for varints, memoryviews otherwise."""
+    position = 0
+    while position < len(message):
+        key, position = _varint(message, position)
+        field_number, wire_type = key >> 3, key & 0x07
+        if wire_type == _VARINT:
+            value, position = _varint(message, position)
+        elif wire_type == _LENGTH_DELIMITED:
+            length, position = _varint(message, position)
+            if position + length > len(message):
+                raise ValueError("Truncated length delimited protobuf field")
+            value = message[position:position + length]
+            position += length
+        elif wire_type in (_FIXED64, _FIXED32):
+            size = 8 if wire_type == _FIXED64 else 4
+            value = message[position:position + size]
+            position += size
+        else:
+            raise ValueError(f"Unsupported protobuf wire type: {wire_type}")
+        if position > len(message):
+            raise ValueError("Truncated protobuf field")
+        yield field_number, value
+
+
+def _varint(message: memoryview, position: int):
+    value = 0
+    shift = 0
+    while True:
+        if position >= len(message) or shift > 63:
+            raise ValueError("Truncated or oversized protobuf varint")
+        byte = message[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
@@ -1,10 +1,17 @@
+import os
+import base64
 import shutil
+import tempfile
+import concurrent.futures
 from typing import Union, Any
 import botocore
 import json
 import includes.kinesis_client as kinesis_client
 import datetime
 import includes.common as common
+import includes.lineage as lineage
+import includes.record_store as record_store
+import includes.replay_cache as replay_cache
 import logging
 import re
 from typing import List
@@ -13,6 +20,9 @@ import includes.exceptions as exceptions
 log = logging.getLogger(__name__)
 log.setLevel("DEBUG")
 
+# How many files each precheck worker validates at a time
+PRECHECK_CHUNK_SIZE = 1000
+
 
 class Files(common.Collection):
     def __init__(self, *, shard_id: str = None, file_list: list = None):
@@ -34,11 +44,17 @@ class Files(common.Collection):
         self._shard_id = shard_id
         self._dir_path = f'scraped_events/{self._shard_id}'
         self._is_valid()
-        files_unsorted: List[str] = [f for f in os.listdir(self._dir_path)]
+        files_unsorted: List[str] = [f for f in os.listdir(self._dir_path) if not record_store.is_segment_name(f)
+                                     and not record_store.is_segment_index_name(f)]
         items: List[str] = sorted(files_unsorted,
                                   key=lambda x: (
                                       int(re.search(r'^\d+', x).group()) if re.search(r'^\d+', x) else float(
                                           'inf'), x))
+
+        # Records stored in segment files are listed after any per-record files, one reference per record. They are
+        # listed from the segment indexes, so segments are only read by the precheck
+        for segment in record_store.list_segments(self._dir_path):
+            items.extend(record_store.segment_refs(self._dir_path, segment))
         return items
 
     def _init_from_file_list(self, items: list):
@@ -56,13 +72,15 @@ class Files(common.Collection):
     @staticmethod
     def validate_file_name(file_name: str):
         common.require_type(file_name, str)
-        file_pattern = r'^\d{1,10}-\d{4}-\d{2}-\d{2}_\d{2};\d{2};\d{2}\.json$'
-        if not re.match(file_pattern, file_name):
+        if record_store.is_segment_ref(file_name):
+            return
+        if not re.match(record_store.FILE_NAME_PATTERN, file_name):
             raise ValueError(f"Invalid file name format. {Files.expected_pattern_error(file_name)}")
 
     @staticmethod
     def expected_pattern_error(file_name: Any):
-        return f"Expected pattern: {str} 'X-YYYY-MM-DD_HH;MM;SS' Received: {common.type_repr(file_name)}"
+        return f"Expected pattern: {str} 'X-YYYY-MM-DD_HH;MM;SS.json' or 'segment-XXXXXX.jsonl' " \
+               f"Received: {common.type_repr(file_name)}"
 
 
 class FileListBatchIterator(common.Collection):
@@ -121,6 +139,9 @@ class ClientConfig(common.BaseCommonClass):
         self._bisect_on_error = None
         self._tumbling_window_seconds = None
         self._custom_checkpoints = None
+        self._kpl_aggregation = 'keep'
+        self._replay_cache_records = 10000
+        self._precheck_workers = 0
 
         # Have to call parent after defining attributes other they are not populated
         super().__init__(passed_data)
@@ -173,6 +194,19 @@ class ClientConfig(common.BaseCommonClass):
     def custom_checkpoints(self):
         return self._custom_checkpoints
 
+    @property
+    def kpl_aggregation(self):
+        return self._kpl_aggregation
+
+    @property
+    def replay_cache_records(self):
+        return self._replay_cache_records
+
+    @property
+    def precheck_workers(self):
+        """The processes validating files before a replay. 0 uses one per CPU core."""
+        return self._precheck_workers
+
     def _is_valid(self):
         common.require_instance(self.boto_client, botocore.client.BaseClient)
         if self.function_name == 'function_name_here':
@@ -190,6 +224,18 @@ class ClientConfig(common.BaseCommonClass):
         if self.custom_checkpoints != "N/A":
             raise ValueError('config-lambda_replay.yaml: custom_checkpoints is not yet supported!')
 
+        if self.kpl_aggregation not in ['keep', 'expand']:
+            raise ValueError(f'config-lambda_replay.yaml: kpl_aggregation must be keep or expand. '
+                             f'Value provided: {common.type_repr(self.kpl_aggregation)}')
+
+        if type(self.replay_cache_records) is not int or self.replay_cache_records < 0:
+            raise ValueError(f'config-lambda_replay.yaml: replay_cache_records must be a whole number of 0 or more. '
+                             f'Value provided: {common.type_repr(self.replay_cache_records)}')
+
+        if type(self.precheck_workers) is not int or not 0 <= self.precheck_workers <= 64:
+            raise ValueError(f'config-lambda_replay.yaml: precheck_workers must be a whole number from 0 to 64. '
+                             f'Value provided: {common.type_repr(self.precheck_workers)}')
+
     def _post_init_processing(self):
         super()._post_init_processing()
         # Setup logging
@@ -226,6 +272,9 @@ class Client:
         shards_ids = []
         for shard_id in file_list:
             filepath = os.path.join(dir_path, shard_id)
+            # Dot-directories hold the work in progress of the scraper (e.g. timestamp slices), not scraped shards
+            if shard_id.startswith('.'):
+                continue
             if os.path.isdir(filepath):
                 shards_ids.append(shard_id)
                 try:
@@ -236,6 +285,14 @@ class Client:
                         f"expected  pattern for a Kinesis message created by the Kinesis-SLR. Please correct or remove "
                         f"the offending file to begin replaying events {ex}") from ex
 
+        # Shards are replayed in the order they were scraped in, so the records of a partition key reach the lambda
+        # from the parent shards of a reshard before those from its children
+        shard_lineage = lineage.load(dir_path)
+        if shard_lineage is not None:
+            order = shard_lineage.order()
+            shards_ids = sorted(shards_ids, key=lambda i: order.index(i) if i in order else len(order))
+            log.debug(f"Replaying shards in the order of the saved shard lineage: {repr(shards_ids)}")
+
         for shard_id in shards_ids:
             self._process_shard_dir(shard_id)
 
@@ -249,17 +306,24 @@ class Client:
             log.info(f"Shard directory {shard_id} contains no records. Skipping.")
             return
 
-        self._precheck_files_batch_iterator(file_batch_obj)
+        # Records parsed by the precheck are kept for the replay, so each file is only read and parsed once
+        with replay_cache.ReplayCache(max_records=self._client_config.replay_cache_records) as records_cache:
+            self._precheck_files_batch_iterator(file_batch_obj, records_cache)
+            if records_cache.spilled_count > 0:
+                log.info(f"{records_cache.spilled_count} records of shard {shard_id} over replay_cache_records were "
+                         f"spilled to a temporary file.")
 
-        for files_batch in file_batch_obj:
-            self._process_batch(shard_id, files_batch)
+            for files_batch in file_batch_obj:
+                self._process_batch(shard_id, files_batch, records_cache)
 
-    def _precheck_files_batch_iterator(self, file_batch_iterator: FileListBatchIterator):
+    def _precheck_files_batch_iterator(self, file_batch_iterator: FileListBatchIterator,
+                                       records_cache: replay_cache.ReplayCache = None):
         """
         Reads every single message in the scrapped directory about to be processed to ensure the valid format
         of every event file. We don't want to begin processing then encounter a bad message on disk halfway through.
 
         Args: file_iterator (FileListBatchIterator): Files from the shard directory about to be replayed
+              records_cache (ReplayCache): If passed, the parsed records are added to it for the replay to use
 
         Returns: None.
         """
@@ -270,27 +334,52 @@ class Client:
             raise exceptions.InvalidArgumentException(ex) from ex
 
         log.info(f"Verifying integrity of all files for shard {file_batch_iterator.shard_id} before replay begins...")
-        i = 0
-        for file in list(file_batch_iterator.items):
-            i += 1
-            with open(f"scraped_events/{file_batch_iterator.shard_id}/{file}", 'r') as f:
-                contents = f.read()
-                try:
-                    kinesis_client.Record(contents)
-                except Exception as ex:
-                    raise exceptions.FileProcessingError(
-                        f"Cannot begin replaying events: Scrapped file '{file_batch_iterator.shard_id}/{file}' is not "
-                        f"in the expected format. Please correct or remove the offending file to begin replaying "
-                        f"events. Detailed error: {ex}") from ex
-
-        log.info(f"Scan complete: All {i} files for shard {file_batch_iterator.shard_id}"
+        dir_path = f"scraped_events/{file_batch_iterator.shard_id}"
+        files = list(file_batch_iterator.items)
+        chunk_starts = range(0, len(files), PRECHECK_CHUNK_SIZE)
+        chunks = [files[i:i + PRECHECK_CHUNK_SIZE] for i in chunk_starts]
+        # Workers only send back the records that fit in memory, and write any others to a spill file of their own
+        capacity = 0 if records_cache is None else records_cache.memory_capacity
+        keep_records = [max(0, min(len(chunk), capacity - start)) for start, chunk in zip(chunk_starts, chunks)]
+        spill_rest = [records_cache is not None] * len(chunks)
+        workers = min(self._client_config.precheck_workers or os.cpu_count() or 1, len(chunks))
+
+        executor = None
+        if workers > 1:
+            log.info(f"Verifying {len(files)} files in {len(chunks)} chunks with {workers} processes...")
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        failures = []
+        try:
+            # Results are collected in file order, so the records cache is filled in replay order
+            results = (map if executor is None else executor.map)(_precheck_files, [dir_path] * len(chunks), chunks,
+                                                                  keep_records, spill_rest)
+            for records, spill_path, spill_index, chunk_failures in results:
+                if records_cache is not None:
+                    for file, record in records:
+                        records_cache.add(file, record)
+                    if spill_path is not None:
+                        records_cache.adopt_spill_file(spill_path, spill_index)
+                failures.extend(chunk_failures)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        if len(failures) > 0:
+            file, error = failures[0]
+            others = "" if len(failures) == 1 else f" {len(failures) - 1} more files failed the check as well."
+            raise exceptions.FileProcessingError(
+                f"Cannot begin replaying events: Scrapped file '{dir_path}/{file}' is not "
+                f"in the expected format. Please correct or remove the offending file to begin replaying "
+                f"events. Detailed error: {error}{others}")
+
+        log.info(f"Scan complete: All {len(files)} files for shard {file_batch_iterator.shard_id}"
                  f" are in the expected format.")
 
-    def _process_batch(self, shard_id: str, file_list: Files):
+    def _process_batch(self, shard_id: str, file_list: Files, records_cache: replay_cache.ReplayCache = None):
         common.require_type(shard_id, str, exceptions.InvalidArgumentException)
         common.require_type(file_list, Files, exceptions.InvalidArgumentException)
 
-        payload = self._build_payload(shard_id, file_list)
+        payload = self._build_payload(shard_id, file_list, records_cache)
         batch_range_label = file_list[0]
         if len(list(file_list)) > 1:
             batch_range_label = f"{file_list[0]}..{file_list[-1]}"
@@ -316,38 +405,66 @@ class Client:
 
         log.info(f"Writing the following {len(list(file_list))} messages to dlq: {', '.join(list(file_list))}")
 
-        # Copy the files to the destination directory
-        for file in file_list:
-            shutil.copy(f"scraped_events/{shard_id}/{file}", dir_path)
+        # Copy the files to the destination directory. Records stored in segments are appended to a new dlq segment,
+        # so the dlq directory can be replayed the same way as a scraped shard directory
+        segment_lines = []
+        with record_store.RecordReader(f"scraped_events/{shard_id}") as reader:
+            for file in file_list:
+                if record_store.is_segment_ref(file):
+                    segment_lines.append(reader.read(file).rstrip('\n').encode('utf-8') + b'\n')
+                    continue
+                shutil.copy(f"scraped_events/{shard_id}/{file}", dir_path)
+        if len(segment_lines) > 0:
+            dlq_writer = record_store.SegmentRecordWriter(shard_id, max_records=len(segment_lines),
+                                                          max_bytes=sum([len(i) for i in segment_lines]),
+                                                          base_dir='dlq')
+            dlq_writer.write(segment_lines)
+            dlq_writer.close()
         log.info(f"{len(list(file_list))} files written to dlq successfully.")
 
-    def _build_payload(self, shard_id: str, file_list: Files) -> dict:
+    def _build_payload(self, shard_id: str, file_list: Files, records_cache: replay_cache.ReplayCache = None) -> dict:
+        """
+        Returns the event sent to the lambda for a batch of scraped records: a record each, or with kpl_aggregation set
+        to expand, one per user record of a KPL aggregated record. Records are taken from records_cache if passed, and
+        only read from disk if they are not cached.
+        """
         common.require_type(shard_id, str, exceptions.InvalidArgumentException)
         common.require_type(file_list, Files, exceptions.InvalidArgumentException)
-        final_payload = {"Records": []}
-
-        for file in list(file_list):
-            final_payload["Records"].append(self._build_payload_inner(shard_id, file))
-
-        return final_payload
-
-    def _build_payload_inner(self, shard_id: str, file: str) -> dict:
         try:
             kinesis_client.ClientConfig.validate_shard_id(shard_id)
         except [TypeError, ValueError] as ex:
             raise exceptions.InvalidArgumentException(ex) from ex
-        Files.validate_file_name(file)
 
-        with open(f"scraped_events/{shard_id}/{file}", 'r') as f:
-            contents = f.read()
-            record = kinesis_client.Record(contents)
+        contents = []
+        with record_store.RecordReader(f"scraped_events/{shard_id}") as reader:
+            for file in list(file_list):
+                Files.validate_file_name(file)
+                record = None if records_cache is None else records_cache.pop(file)
+                if record is None:
+                    record = json.loads(reader.read(file))
+                contents.append(record)
+        records = kinesis_client.Record.from_batch(contents, base64_encoded=True)
+
+        final_payload = {"Records": []}
+        for record in records:
+            if self._client_config.kpl_aggregation == 'expand':
+                final_payload["Records"].extend([self._build_event_record(shard_id, i) for i in record.sub_records()])
+            else:
+                final_payload["Records"].append(self._build_event_record(shard_id, record))
+
+        return final_payload
+
+    def _build_event_record(self, shard_id: str, record: kinesis_client.Record) -> dict:
+        data = record.Data
+        if not record.base64_encoded:
+            data = base64.b64encode(record.Data).decode('utf-8')
 
         inner_payload = {
             "kinesis": {
                 "kinesisSchemaVersion": "1.0",
                 "partitionKey": record.PartitionKey,
                 "sequenceNumber": record.SequenceNumber,
-                "data": record.Data,
+                "data": data,
                 "approximateArrivalTimestamp":
                     datetime.datetime.fromisoformat(record.ApproximateArrivalTimestamp).timestamp()
             },
@@ -361,3 +478,40 @@ class Client:
         }
 
         return inner_payload
+
+
+def _precheck_files(dir_path: str, files: list, keep_records: int, spill_rest: bool) -> tuple:
+    """
+    Reads and validates a chunk of scraped files, in a precheck worker process. Returns a tuple of:
+    - The (file, Record) pairs of the valid files among the first keep_records files
+    - With spill_rest, the path of a temporary file holding the raw JSON of the other valid files, and its (file,
+      offset, length) index (see ReplayCache.adopt_spill_file()). Otherwise None and [], the other files being only
+      checked
+    - The (file, error) pairs of the invalid files
+    """
+    records = []
+    spill_file = None
+    spill_index = []
+    failures = []
+    try:
+        with record_store.RecordReader(dir_path) as reader:
+            for i, file in enumerate(files):
+                try:
+                    contents = reader.read(file)
+                    record = kinesis_client.Record(contents, base64_encoded=True)
+                except Exception as ex:
+                    failures.append((file, str(ex)))
+                    continue
+                if i < keep_records:
+                    records.append((file, record))
+                elif spill_rest:
+                    if spill_file is None:
+                        spill_file = tempfile.NamedTemporaryFile(prefix='kinesis-slr-replay-', suffix='.jsonl',
+                                                                 delete=False)
+                    line = contents.rstrip('\n').encode('utf-8') + b'\n'
+                    spill_index.append((file, spill_file.tell(), len(line)))
+                    spill_file.write(line)
+    finally:
+        if spill_file is not None:
+            spill_file.close()
+    return records, None if spill_file is None else spill_file.name, spill_index, failures
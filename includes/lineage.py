@@ -0,0 +1,118 @@
+import os
+import json
+import logging
+from typing import List
+import includes.common as common
+import includes.exceptions as exceptions
+import includes.shard_map as shard_map
+
+log = logging.getLogger(__name__)
+
+# Written next to the shard directories, so a replay can follow the same order
+LINEAGE_FILE_NAME = 'lineage.json'
+
+
+class ShardLineage:
+    """
+    The parent/child relations between the shards being scraped, built from the ParentShardId and
+    AdjacentParentShardId of each shard. After a split or merge, records of a partition key are in the parent shard up
+    to the reshard and in a child shard after it, so a child must only be read once all of its parents were.
+
+    Parents that are not being scraped (e.g. shards that expired, or were filtered out) are ignored.
+    """
+
+    def __init__(self, parents: dict):
+        """
+        :param parents: The parent shard ids of every shard, keyed by shard id in the order the shards should be read
+                        in when there are no relations between them
+        """
+        common.require_type(parents, dict, exceptions.InvalidArgumentException)
+        self._shard_ids = list(parents.keys())
+        self._parents = {shard_id: [i for i in shard_parents if i in parents]
+                         for shard_id, shard_parents in parents.items()}
+        self._children = {shard_id: [] for shard_id in self._shard_ids}
+        for shard_id, shard_parents in self._parents.items():
+            for parent in shard_parents:
+                self._children[parent].append(shard_id)
+        # Validates the relations up front, rather than leaving the scheduler waiting on shards that never finish
+        self.order()
+
+    @classmethod
+    def from_shards(cls, shards: List[shard_map.Shard], shard_ids: list = None) -> 'ShardLineage':
+        """Builds the lineage of the given shard_ids (or all shards), from the shards listed for the stream."""
+        shards_by_id = {i.shard_id: i for i in shards}
+        if shard_ids is None:
+            shard_ids = list(shards_by_id.keys())
+        parents = {}
+        for shard_id in shard_ids:
+            shard = shards_by_id.get(shard_id)
+            shard_parents = [] if shard is None else [shard.parent_shard_id, shard.adjacent_parent_shard_id]
+            parents[shard_id] = [i for i in shard_parents if i is not None]
+        return cls(parents)
+
+    @property
+    def shard_ids(self) -> list:
+        return list(self._shard_ids)
+
+    def parents(self, shard_id: str) -> list:
+        return list(self._parents[shard_id])
+
+    def children(self, shard_id: str) -> list:
+        return list(self._children[shard_id])
+
+    def ready(self, finished: set) -> list:
+        """Returns the shards that are not finished yet, and whose parents all are."""
+        return [i for i in self._shard_ids
+                if i not in finished and all([j in finished for j in self._parents[i]])]
+
+    def descendants(self, shard_id: str) -> list:
+        descendants = []
+        pending = self.children(shard_id)
+        while len(pending) > 0:
+            child = pending.pop(0)
+            if child not in descendants:
+                descendants.append(child)
+                pending.extend(self._children[child])
+        return descendants
+
+    def order(self) -> list:
+        """Returns every shard after all of its parents, otherwise keeping the order the shards were given in."""
+        ordered = []
+        while len(ordered) < len(self._shard_ids):
+            ready = self.ready(set(ordered))
+            if len(ready) == 0:
+                raise exceptions.InvalidArgumentException(
+                    f"The shard lineage holds a cycle between shards: "
+                    f"{repr([i for i in self._shard_ids if i not in ordered])}")
+            ordered.append(ready[0])
+        return ordered
+
+    def toJson(self, *, indent: int = None) -> str:
+        return json.dumps({
+            "order": self.order(),
+            "parents": self._parents,
+        }, indent=indent)
+
+    def save(self, dir_path: str) -> None:
+        if not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        filename_uri = f"{dir_path}/{LINEAGE_FILE_NAME}"
+        with open(f"{filename_uri}.tmp", 'w') as f:
+            f.write(self.toJson(indent=4))
+        os.replace(f"{filename_uri}.tmp", filename_uri)
+        log.debug(f"Shard lineage saved to {filename_uri}")
+
+
+def load(dir_path: str) -> ShardLineage | None:
+    """Returns the lineage saved in dir_path, or None if there is none."""
+    filename_uri = f"{dir_path}/{LINEAGE_FILE_NAME}"
+    if not os.path.exists(filename_uri):
+        return None
+    try:
+        with open(filename_uri, 'r') as f:
+            contents = json.load(f)
+        return ShardLineage({shard_id: contents['parents'][shard_id] for shard_id in contents['order']})
+    except Exception as ex:
+        raise exceptions.FileProcessingError(
+            f"The shard lineage file '{filename_uri}' is not in the expected format. Please correct or remove the "
+            f"file to continue. Detailed error: {ex}") from ex
@@ -0,0 +1,105 @@
+import queue
+import threading
+import logging
+from typing import Callable, List
+import includes.common as common
+import includes.exceptions as exceptions
+
+log = logging.getLogger(__name__)
+
+# Sentinel pushed through every queue to tell each stage that no more items are coming
+_STOP = object()
+
+
+class Pipeline:
+    """
+    Runs a chain of handlers on their own threads, joined by bounded queues. Each handler receives the return value
+    of the previous handler. As the queues are bounded, a slow stage applies backpressure to the stages before it
+    (and to the caller of submit()) instead of letting items pile up in memory.
+
+    If a handler raises, the remaining items are drained without being handled, and the first error is re-raised to
+    the caller on the next submit() or on close().
+    """
+
+    def __init__(self, name: str, handlers: List[Callable], queue_size: int):
+        common.require_type(name, str, exceptions.InvalidArgumentException)
+        common.require_type(handlers, list, exceptions.InvalidArgumentException)
+        common.require_type(queue_size, int, exceptions.InvalidArgumentException)
+        if len(handlers) < 1 or queue_size < 1:
+            raise exceptions.InvalidArgumentException(
+                f"A pipeline requires at least one handler and a queue_size of 1 or greater. Received: "
+                f"{len(handlers)} handlers, queue_size {queue_size}")
+
+        self._name = name
+        self._error = None
+        self._error_lock = threading.Lock()
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in handlers]
+        self._threads = []
+        self._closed = False
+        for i, handler in enumerate(handlers):
+            output_queue = self._queues[i + 1] if i + 1 < len(handlers) else None
+            self._threads.append(threading.Thread(target=self._run_stage,
+                                                  args=(handler, self._queues[i], output_queue),
+                                                  name=f"{name}-stage{i}",
+                                                  daemon=True))
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Never mask an exception already being raised by the producer with one from the stages
+        self.close(raise_errors=exc_type is None)
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item) -> None:
+        if self._closed:
+            raise exceptions.InternalError(f"Pipeline {self._name} is closed and cannot accept new items.")
+        self._raise_if_failed()
+        # Blocks while the first queue is full, which is what throttles the producer
+        self._queues[0].put(item)
+
+    def close(self, *, raise_errors: bool = True) -> None:
+        if not self._closed:
+            self._closed = True
+            self._queues[0].put(_STOP)
+            for thread in self._threads:
+                thread.join()
+        if raise_errors:
+            self._raise_if_failed()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise exceptions.InternalError(
+                f"Pipeline {self._name} stage failed: {repr(self._error)}") from self._error
+
+    def _run_stage(self, handler: Callable, input_queue: queue.Queue, output_queue: queue.Queue | None) -> None:
+        while True:
+            item = input_queue.get()
+            if item is _STOP:
+                if output_queue is not None:
+                    output_queue.put(_STOP)
+                return
+
+            # Once any stage has failed we only drain the queue so that upstream stages never block forever
+            if self._error is not None:
+                continue
+
+            try:
+                result = handler(item)
+            except Exception as ex:
+                log.error(f"Pipeline {self._name} stage {threading.current_thread().name} failed: {repr(ex)}")
+                with self._error_lock:
+                    if self._error is None:
+                        self._error = ex
+                continue
+
+            if output_queue is not None:
+                output_queue.put(result)
@@ -0,0 +1,169 @@
+import time
+import logging
+from abc import ABC, abstractmethod
+import includes.common as common
+import includes.exceptions as exceptions
+
+log = logging.getLogger(__name__)
+
+# AWS quota: Each shard supports up to 5 GetRecords calls per second, shared by every consumer of the shard
+MAX_CALLS_PER_SECOND = 5.0
+# Lowest rate the adaptive controller throttles down to after repeated ProvisionedThroughputExceededExceptions
+MIN_CALLS_PER_SECOND = 0.2
+# Consecutive throttled get_records() calls retried before the ProvisionedThroughputExceededException is raised
+MAX_THROTTLED_RETRIES = 10
+# Calls per second added back after every successful call (the additive increase of AIMD)
+CALLS_PER_SECOND_INCREASE = 0.25
+# Below this many MillisBehindLatest, the shard is considered caught up with the tip of the stream
+CAUGHT_UP_MILLIS = 5000
+# AWS quota: The maximum Limit of a single get_records() call
+MAX_GET_RECORDS_LIMIT = 10000
+# Weight of the latest response in the moving average record size
+RECORD_SIZE_SMOOTHING = 0.3
+
+
+class PollController(ABC):
+    """Decides how long to wait before each get_records() call of a single shard."""
+
+    @property
+    @abstractmethod
+    def retry_throttled(self) -> bool:
+        """Whether a get_records() call that was throttled should be retried rather than raised."""
+        ...
+
+    @abstractmethod
+    def next_delay(self) -> float:
+        ...
+
+    def wait(self) -> None:
+        delay = self.next_delay()
+        if delay > 0:
+            log.debug(f"Waiting {delay} seconds before the next get_records() call...")
+            time.sleep(delay)
+
+    def records_received(self, records_count: int, millis_behind_latest: int) -> None:
+        pass
+
+    def throttled(self) -> None:
+        pass
+
+
+class FixedPollController(PollController):
+    """Always waits poll_delay seconds between calls."""
+
+    def __init__(self, poll_delay: float):
+        self._poll_delay = common.validate_numeric_pos(poll_delay)
+
+    @property
+    def retry_throttled(self) -> bool:
+        return False
+
+    def next_delay(self) -> float:
+        return self._poll_delay
+
+    def wait(self) -> None:
+        if self._poll_delay > 0:
+            log.info(f"Wait delay of {self._poll_delay} seconds per poll_delay setting...")
+            time.sleep(self._poll_delay)
+
+
+class AdaptivePollController(PollController):
+    """
+    Adjusts the delay between calls to the state of the shard:
+    - While the shard is far behind the tip of the stream (MillisBehindLatest), calls are made as fast as the current
+      call rate allows, including when empty responses are returned while crossing gaps in the stream.
+    - Once caught up, every consecutive empty response doubles the delay, up to max_poll_delay.
+    - The call rate starts at the 5 calls/second shard quota, is halved on every throttled call and increased by
+      CALLS_PER_SECOND_INCREASE on every successful one (AIMD), so scraping yields to other consumers of the shard.
+
+    The time spent between calls (e.g. writing records) counts towards the delay.
+    """
+
+    def __init__(self, poll_delay: float, max_poll_delay: float):
+        self._poll_delay = common.validate_numeric_pos(poll_delay)
+        self._max_poll_delay = common.validate_numeric_pos(max_poll_delay)
+        self._calls_per_second = MAX_CALLS_PER_SECOND
+        self._empty_polls = 0
+        self._millis_behind_latest = None
+        self._last_call = None
+
+    @property
+    def retry_throttled(self) -> bool:
+        return True
+
+    @property
+    def calls_per_second(self) -> float:
+        return self._calls_per_second
+
+    def next_delay(self) -> float:
+        interval = 1.0 / self._calls_per_second
+        # Nothing is known about the shard before the first response, so read it at the full rate
+        if self._millis_behind_latest is None or self._millis_behind_latest >= CAUGHT_UP_MILLIS:
+            return interval
+
+        delay = max(interval, self._poll_delay)
+        if self._empty_polls > 0:
+            delay = min(max(self._max_poll_delay, interval), delay * 2 ** self._empty_polls)
+        return delay
+
+    def wait(self) -> None:
+        delay = self.next_delay()
+        if self._last_call is not None:
+            delay -= time.monotonic() - self._last_call
+        if delay > 0:
+            log.debug(f"Waiting {delay} seconds before the next get_records() call...")
+            time.sleep(delay)
+        self._last_call = time.monotonic()
+
+    def records_received(self, records_count: int, millis_behind_latest: int) -> None:
+        self._millis_behind_latest = millis_behind_latest
+        self._empty_polls = self._empty_polls + 1 if records_count == 0 else 0
+        self._calls_per_second = min(MAX_CALLS_PER_SECOND, self._calls_per_second + CALLS_PER_SECOND_INCREASE)
+
+    def throttled(self) -> None:
+        self._calls_per_second = max(MIN_CALLS_PER_SECOND, self._calls_per_second / 2)
+        log.warning(f"get_records() call was throttled, reducing the poll rate to {self._calls_per_second} "
+                    f"calls per second")
+
+
+class AdaptiveBatchLimit:
+    """
+    Picks the get_records() Limit of a shard so each response holds about target_bytes of records, based on an
+    exponentially weighted moving average of the record sizes returned so far. Streams of small records are then
+    read with far fewer calls, while streams of large records keep responses (and memory usage) bounded.
+    """
+
+    def __init__(self, initial_limit: int, target_bytes: int):
+        common.require_type(initial_limit, int, exceptions.InvalidArgumentException)
+        common.require_type(target_bytes, int, exceptions.InvalidArgumentException)
+        self._limit = initial_limit
+        self._target_bytes = target_bytes
+        self._average_record_size = None
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def average_record_size(self) -> float | None:
+        return self._average_record_size
+
+    def observe(self, records_count: int, bytes_read: int) -> None:
+        # Empty responses say nothing about the record size
+        if records_count == 0:
+            return
+        record_size = bytes_read / records_count
+        if self._average_record_size is None:
+            self._average_record_size = record_size
+        else:
+            self._average_record_size = RECORD_SIZE_SMOOTHING * record_size \
+                                        + (1 - RECORD_SIZE_SMOOTHING) * self._average_record_size
+        self._limit = max(1, min(MAX_GET_RECORDS_LIMIT, int(self._target_bytes / max(1.0, self._average_record_size))))
+
+
+def new_poll_controller(poll_mode: str, *, poll_delay: float, max_poll_delay: float) -> PollController:
+    if poll_mode == 'fixed':
+        return FixedPollController(poll_delay)
+    if poll_mode == 'adaptive':
+        return AdaptivePollController(poll_delay, max_poll_delay)
+    raise exceptions.InvalidArgumentException(f"Unknown poll_mode: {common.type_repr(poll_mode)}")
@@ -0,0 +1,98 @@
+import time
+import threading
+import logging
+from typing import List, Tuple
+import includes.common as common
+import includes.exceptions as exceptions
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Refills at `rate` tokens per second, holding up to one second worth of tokens. Taking tokens may leave the bucket
+    in debt (e.g. when the size of a response is only known after it was received), which later callers wait out.
+    Safe to share between threads.
+    """
+
+    def __init__(self, rate: float):
+        if common.validate_numeric_pos(rate) == 0:
+            raise exceptions.InvalidArgumentException(f"rate must be greater than 0. Received: {common.type_repr(rate)}")
+        self._rate = float(rate)
+        self._tokens = self._rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def reserve(self, tokens: float) -> float:
+        """Takes the tokens right away and returns how many seconds the caller must wait before using them."""
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self._rate)
+
+    def debt_wait(self) -> float:
+        """Returns how many seconds it takes until the bucket is out of debt, without taking any tokens."""
+        with self._lock:
+            self._refill()
+            return max(0.0, -self._tokens / self._rate)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._rate, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+class ReadBudget:
+    """
+    Limits the get_records() calls and bytes read per second, for every shard individually and for the stream as a
+    whole, so the scraper only uses an agreed share of the read throughput other consumers rely on. A limit of 0 is
+    unlimited. One budget is shared by every parallel scrape worker.
+    """
+
+    def __init__(self, *, shard_calls_per_second: float = 0, shard_bytes_per_second: float = 0,
+                 stream_calls_per_second: float = 0, stream_bytes_per_second: float = 0):
+        self._shard_calls_per_second = common.validate_numeric_pos(shard_calls_per_second)
+        self._shard_bytes_per_second = common.validate_numeric_pos(shard_bytes_per_second)
+        self._stream_calls = self._new_bucket(stream_calls_per_second)
+        self._stream_bytes = self._new_bucket(stream_bytes_per_second)
+        self._shard_calls = {}
+        self._shard_bytes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._shard_calls_per_second > 0 or self._shard_bytes_per_second > 0 \
+            or self._stream_calls is not None or self._stream_bytes is not None
+
+    def before_call(self, shard_id: str) -> None:
+        """Blocks until a get_records() call for the shard fits in the budget."""
+        call_buckets, bytes_buckets = self._buckets(shard_id)
+        wait = max([0.0] + [i.reserve(1) for i in call_buckets] + [i.debt_wait() for i in bytes_buckets])
+        if wait > 0:
+            log.debug(f"Waiting {wait} seconds for the read budget of shard {shard_id}...")
+            time.sleep(wait)
+
+    def after_call(self, shard_id: str, bytes_read: int) -> None:
+        """Charges the bytes of a received response to the budget. Any excess is waited out by the next calls."""
+        call_buckets, bytes_buckets = self._buckets(shard_id)
+        for bucket in bytes_buckets:
+            bucket.reserve(bytes_read)
+
+    def _buckets(self, shard_id: str) -> Tuple[List[TokenBucket], List[TokenBucket]]:
+        with self._lock:
+            if shard_id not in self._shard_calls:
+                self._shard_calls[shard_id] = self._new_bucket(self._shard_calls_per_second)
+                self._shard_bytes[shard_id] = self._new_bucket(self._shard_bytes_per_second)
+            call_buckets = [self._shard_calls[shard_id], self._stream_calls]
+            bytes_buckets = [self._shard_bytes[shard_id], self._stream_bytes]
+        return [i for i in call_buckets if i is not None], [i for i in bytes_buckets if i is not None]
+
+    @staticmethod
+    def _new_bucket(rate: float) -> TokenBucket | None:
+        if common.validate_numeric_pos(rate) == 0:
+            return None
+        return TokenBucket(rate)
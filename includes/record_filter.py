@@ -0,0 +1,89 @@
+import re
+import json
+import base64
+import logging
+import threading
+from typing import Tuple
+import includes.common as common
+import includes.exceptions as exceptions
+
+log = logging.getLogger(__name__)
+
+# Marks a Data field missing from a record, as None is a valid JSON value
+_MISSING = object()
+
+
+class RecordFilter:
+    """
+    Keeps only the records matching every configured condition:
+    - partition_keys: The PartitionKey is one of these keys
+    - partition_key_pattern: The PartitionKey matches this regular expression (re.search)
+    - data_fields: The Data of the record is a JSON object and, for every dotted path (e.g. "detail.status"), holds
+      the given value, or one of the given values if a list is passed
+
+    Conditions are compiled once, and the Data of a record is only decoded if its PartitionKey matched. Counts of the
+    records scanned and matched are kept per shard. Safe to share between threads.
+    """
+
+    def __init__(self, *, partition_keys: list = None, partition_key_pattern: str = None, data_fields: dict = None):
+        self._partition_keys = None if partition_keys is None else set(partition_keys)
+        self._partition_key_pattern = None
+        if partition_key_pattern is not None:
+            try:
+                self._partition_key_pattern = re.compile(partition_key_pattern)
+            except (re.error, TypeError) as ex:
+                raise exceptions.InvalidArgumentException(
+                    f"Invalid partition_key_pattern: {common.type_repr(partition_key_pattern)} {ex}") from ex
+        self._data_fields = []
+        for path, expected in ({} if data_fields is None else data_fields).items():
+            common.require_type(path, str, exceptions.InvalidArgumentException)
+            expected_values = expected if isinstance(expected, list) else [expected]
+            self._data_fields.append((path.split('.'), expected_values))
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._partition_keys is not None or self._partition_key_pattern is not None \
+            or len(self._data_fields) > 0
+
+    def apply(self, shard_id: str, records) -> list:
+        """Returns the matching records, keeping their order."""
+        matched = [i for i in records if self.matches(i)]
+        with self._lock:
+            scanned_count, matched_count = self._counters.get(shard_id, (0, 0))
+            self._counters[shard_id] = (scanned_count + len(records), matched_count + len(matched))
+        return matched
+
+    def matches(self, record) -> bool:
+        if self._partition_keys is not None and record.PartitionKey not in self._partition_keys:
+            return False
+        if self._partition_key_pattern is not None and self._partition_key_pattern.search(record.PartitionKey) is None:
+            return False
+        if len(self._data_fields) == 0:
+            return True
+
+        data = decode_data(record)
+        for path, expected_values in self._data_fields:
+            value = data
+            for key in path:
+                value = value.get(key, _MISSING) if isinstance(value, dict) else _MISSING
+            if value is _MISSING or value not in expected_values:
+                return False
+        return True
+
+    def counters(self, shard_id: str) -> Tuple[int, int]:
+        """Returns how many records of the shard were scanned, and how many of them matched."""
+        with self._lock:
+            return self._counters.get(shard_id, (0, 0))
+
+
+def decode_data(record) -> object:
+    """Returns the Data of a record parsed as JSON, or None if it is not valid UTF-8 JSON."""
+    data = record.Data
+    try:
+        if record.base64_encoded:
+            data = base64.b64decode(data)
+        return json.loads(common.to_bytes(data))
+    except (ValueError, TypeError):
+        return None
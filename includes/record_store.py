@@ -0,0 +1,410 @@
+import os
+import re
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+import includes.common as common
+import includes.exceptions as exceptions
+
+log = logging.getLogger(__name__)
+
+# One file per record, named <prefix>-<timestamp>.json (the original on-disk layout)
+FILE_NAME_PATTERN = r'^\d{1,10}-\d{4}-\d{2}-\d{2}_\d{2};\d{2};\d{2}\.json$'
+# Append-only newline delimited JSON files holding many records each
+SEGMENT_NAME_PATTERN = r'^segment-(\d{6,})\.jsonl$'
+# A single record inside a segment file, referenced by the byte offset its line starts at
+SEGMENT_REF_PATTERN = r'^segment-\d{6,}\.jsonl@\d+$'
+# The byte offset of every record of the segment of the same number, so a replay can list them without reading it
+SEGMENT_INDEX_NAME_PATTERN = r'^segment-(\d{6,})\.idx$'
+
+
+class RecordWriter(ABC):
+    """
+    Persists the records scraped from a single shard. Writing is split in two steps, encode() and write(), so the
+    encoding can run on a different thread than the disk writes (see Client._records_pipeline()).
+    """
+
+    def __init__(self, shard_id: str, *, base_dir: str = 'scraped_events'):
+        common.require_type(shard_id, str, exceptions.InvalidArgumentException)
+        # Safety: We strip all but safe characters before creating any files/dirs
+        self._shard_id = re.sub(r'[^A-Za-z0-9-_]', '', shard_id)
+        self._dir_path = shard_dir(shard_id, base_dir=base_dir)
+
+    @property
+    def shard_id(self) -> str:
+        return self._shard_id
+
+    @property
+    def dir_path(self) -> str:
+        return self._dir_path
+
+    @abstractmethod
+    def encode(self, records) -> list:
+        ...
+
+    @abstractmethod
+    def write(self, encoded_records: list) -> None:
+        ...
+
+    @property
+    @abstractmethod
+    def record_count(self) -> int | None:
+        ...
+
+    @property
+    def position(self) -> str | None:
+        """Identifies the end of the written output, allowing a later writer to discard anything written after it."""
+        return None
+
+    @abstractmethod
+    def truncate(self, record_count: int, position: str | None) -> None:
+        """Discards every record written after the given record_count/position, e.g. when resuming a checkpoint."""
+        ...
+
+    @abstractmethod
+    def adopt(self, dir_path: str) -> None:
+        """Forces every record written so far to disk, e.g. before saving a checkpoint that points past them."""
+        ...
+
+    def sync(self) -> None:
+        """Forces every record written so far to disk, e.g. before saving a checkpoint pointing past them."""
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def _make_dir(self) -> None:
+        # Only called when writing, so a shard that never returns any records does not leave an empty directory
+        if not os.path.exists(self._dir_path):
+            log.debug(f'mkdirs path: {self._dir_path}')
+            os.makedirs(self._dir_path)
+
+
+class FileRecordWriter(RecordWriter):
+    """
+    Writes every record to its own pretty-printed <prefix>-<timestamp>.json file.
+
+    The prefix is a running count of the records in the shard directory. It is kept in memory and only seeded once,
+    either from the passed record_count or, if None, by counting the files in the directory on the first write.
+    """
+
+    def __init__(self, shard_id: str, *, record_count: int | None = None, base_dir: str = 'scraped_events'):
+        super().__init__(shard_id, base_dir=base_dir)
+        if record_count is not None:
+            common.require_type(record_count, int, exceptions.InvalidArgumentException)
+        self._record_count = record_count
+        # Files written since the last sync()
+        self._unsynced_files = []
+
+    @property
+    def record_count(self) -> int | None:
+        return self._record_count
+
+    def encode(self, records) -> List[Tuple[str, str]]:
+        # Returns a (timestamp, file contents) pair per record, the timestamp being used to build the file name
+        encoded = []
+        for record in records:
+            # Safety: We strip all but safe characters before creating any files/dirs
+            timestamp = re.sub(r'[^A-Za-z0-9-:_]', '',
+                               record.ApproximateArrivalTimestamp.strftime('%Y-%m-%d_%H:%M:%S'))
+            encoded.append((timestamp, record.toJson(indent=4)))
+        return encoded
+
+    def write(self, encoded_records: List[Tuple[str, str]]) -> None:
+        log.debug(f'Processing records for batch')
+        self._make_dir()
+        if self._record_count is None:
+            self._record_count = common.count_files_in_dir(self._dir_path)
+        log.debug(f'Initial prefix is: {self._record_count}')
+        for timestamp, contents in encoded_records:
+            prefix = self._record_count + 1
+            log.debug(f'timestamp: {timestamp}')
+            filename_uri = f"{self._dir_path}/{prefix}-{timestamp.replace(':', ';')}.json"
+            log.debug(f'Filename: {filename_uri}')
+
+            try:
+                with open(filename_uri, "x") as f:
+                    f.write(contents)
+                self._unsynced_files.append(filename_uri)
+            except FileExistsError as ex:
+                raise FileExistsError(f'The file "{filename_uri}" already exists when trying to create an event '
+                                      f'record file. Be sure scraping is not being run with a populated '
+                                      f'scraped_events/{self._shard_id} directory.') from ex
+            self._record_count = prefix
+
+    def sync(self) -> None:
+        for filename_uri in self._unsynced_files:
+            with open(filename_uri, 'rb') as f:
+                os.fsync(f.fileno())
+        self._unsynced_files = []
+
+    def truncate(self, record_count: int, position: str | None) -> None:
+        common.require_type(record_count, int, exceptions.InvalidArgumentException)
+        self._unsynced_files = []
+        if os.path.exists(self._dir_path):
+            for file_name in os.listdir(self._dir_path):
+                prefix = re.search(r'^(\d+)-', file_name)
+                if prefix is not None and int(prefix.group(1)) > record_count:
+                    log.warning(f'Removing {self._dir_path}/{file_name} written after the last checkpoint')
+                    os.remove(f'{self._dir_path}/{file_name}')
+        self._record_count = record_count
+
+    def adopt(self, dir_path: str) -> None:
+        if not os.path.exists(dir_path):
+            return
+        self._make_dir()
+        if self._record_count is None:
+            self._record_count = common.count_files_in_dir(self._dir_path)
+
+        file_names = [i for i in os.listdir(dir_path) if re.match(FILE_NAME_PATTERN, i)]
+        for file_name in sorted(file_names, key=lambda i: int(i.split('-', 1)[0])):
+            prefix = self._record_count + 1
+            filename_uri = f"{self._dir_path}/{prefix}-{file_name.split('-', 1)[1]}"
+            if os.path.exists(filename_uri):
+                raise FileExistsError(f'The file "{filename_uri}" already exists when trying to move the event record '
+                                      f'file "{dir_path}/{file_name}" into place.')
+            os.replace(f"{dir_path}/{file_name}", filename_uri)
+            self._record_count = prefix
+
+
+class SegmentRecordWriter(RecordWriter):
+    """
+    Appends records as single line JSON to segment-XXXXXX.jsonl files, rotating to a new segment once the current one
+    holds max_records records or max_bytes bytes. Existing segments are never appended to: a new writer always starts
+    the segment after the highest numbered one on disk. A segment-XXXXXX.idx index is written next to every segment as
+    it is closed (see segment_refs()).
+    """
+
+    def __init__(self, shard_id: str, *, max_records: int, max_bytes: int, record_count: int = 0,
+                 base_dir: str = 'scraped_events'):
+        super().__init__(shard_id, base_dir=base_dir)
+        common.require_type(max_records, int, exceptions.InvalidArgumentException)
+        common.require_type(max_bytes, int, exceptions.InvalidArgumentException)
+        common.require_type(record_count, int, exceptions.InvalidArgumentException)
+        self._max_records = max_records
+        self._max_bytes = max_bytes
+        self._record_count = record_count
+        self._segment_number = None
+        self._file = None
+        self._segment_records = 0
+        self._segment_bytes = 0
+        self._segment_offsets = []
+
+    @property
+    def record_count(self) -> int:
+        return self._record_count
+
+    @property
+    def position(self) -> str | None:
+        if self._segment_number is None:
+            return None
+        return f"segment-{self._segment_number:06d}.jsonl@{self._segment_bytes}"
+
+    def encode(self, records) -> List[bytes]:
+        return [record.toJson().encode('utf-8') + b'\n' for record in records]
+
+    def write(self, encoded_records: List[bytes]) -> None:
+        for line in encoded_records:
+            if self._file is None or self._segment_records >= self._max_records \
+                    or self._segment_bytes >= self._max_bytes:
+                self._rotate()
+            self._file.write(line)
+            self._segment_offsets.append(self._segment_bytes)
+            self._segment_records += 1
+            self._segment_bytes += len(line)
+            self._record_count += 1
+        if self._file is not None:
+            self._file.flush()
+
+    def truncate(self, record_count: int, position: str | None) -> None:
+        common.require_type(record_count, int, exceptions.InvalidArgumentException)
+        if position is not None and not is_segment_ref(position):
+            raise exceptions.InvalidArgumentException(f"Invalid segment position: {common.type_repr(position)}")
+        self.close()
+
+        last_segment, offset = split_segment_ref(position) if position is not None else (None, 0)
+        last_number = segment_number(last_segment) if last_segment is not None else 0
+        if os.path.exists(self._dir_path):
+            for file_name in list_segments(self._dir_path):
+                if segment_number(file_name) > last_number:
+                    log.warning(f'Removing {self._dir_path}/{file_name} written after the last checkpoint')
+                    os.remove(f'{self._dir_path}/{file_name}')
+                    if os.path.exists(f'{self._dir_path}/{segment_index_name(file_name)}'):
+                        os.remove(f'{self._dir_path}/{segment_index_name(file_name)}')
+                elif file_name == last_segment:
+                    os.truncate(f'{self._dir_path}/{file_name}', offset)
+                    # The segment was likely still open when scraping stopped, so it has no index yet
+                    write_segment_index(self._dir_path, file_name,
+                                        [split_segment_ref(i)[1] for i in segment_refs(self._dir_path, file_name)])
+        self._record_count = record_count
+        # Writing always resumes in a fresh segment after the truncated one
+        self._segment_number = None
+
+    def adopt(self, dir_path: str) -> None:
+        if not os.path.exists(dir_path):
+            return
+        # The adopted segments follow the current one, and writing then continues in a new segment after them
+        self.close()
+        self._make_dir()
+        if self._segment_number is None:
+            self._segment_number = max([0] + [segment_number(i) for i in list_segments(self._dir_path)])
+
+        for file_name in list_segments(dir_path):
+            self._segment_number += 1
+            filename_uri = f"{self._dir_path}/segment-{self._segment_number:06d}.jsonl"
+            if os.path.exists(filename_uri):
+                raise FileExistsError(f'The segment file "{filename_uri}" already exists when trying to move the '
+                                      f'segment file "{dir_path}/{file_name}" into place.')
+            self._record_count += len(segment_refs(dir_path, file_name))
+            os.replace(f"{dir_path}/{file_name}", filename_uri)
+            if os.path.exists(f"{dir_path}/{segment_index_name(file_name)}"):
+                os.replace(f"{dir_path}/{segment_index_name(file_name)}",
+                           f"{self._dir_path}/{segment_index_name(os.path.basename(filename_uri))}")
+            # Keeps position pointing at the end of the output
+            self._segment_bytes = os.path.getsize(filename_uri)
+
+    def sync(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        # Segments are synced as they are closed, so sync() only ever has the current segment left to force to disk
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+            write_segment_index(self._dir_path, f"segment-{self._segment_number:06d}.jsonl", self._segment_offsets)
+
+    def _rotate(self) -> None:
+        self.close()
+        if self._segment_number is None:
+            self._make_dir()
+            self._segment_number = max([0] + [segment_number(i) for i in list_segments(self._dir_path)])
+        self._segment_number += 1
+        filename_uri = f"{self._dir_path}/segment-{self._segment_number:06d}.jsonl"
+        log.debug(f'Starting segment file: {filename_uri}')
+        try:
+            self._file = open(filename_uri, "xb")
+        except FileExistsError as ex:
+            raise FileExistsError(f'The segment file "{filename_uri}" already exists. Be sure scraping is not being '
+                                  f'run more than once at the same time for shard {self._shard_id}.') from ex
+        self._segment_records = 0
+        self._segment_bytes = 0
+        self._segment_offsets = []
+
+
+def shard_dir(shard_id: str, *, base_dir: str = 'scraped_events') -> str:
+    # Safety: We strip all but safe characters before creating any files/dirs
+    return f"{base_dir}/{re.sub(r'[^A-Za-z0-9-_]', '', shard_id)}"
+
+
+def is_segment_name(file_name: str) -> bool:
+    return re.match(SEGMENT_NAME_PATTERN, file_name) is not None
+
+
+def is_segment_ref(ref: str) -> bool:
+    return re.match(SEGMENT_REF_PATTERN, ref) is not None
+
+
+def is_segment_index_name(file_name: str) -> bool:
+    return re.match(SEGMENT_INDEX_NAME_PATTERN, file_name) is not None
+
+
+def segment_index_name(file_name: str) -> str:
+    return f"segment-{segment_number(file_name):06d}.idx"
+
+
+def segment_number(file_name: str) -> int:
+    return int(re.match(SEGMENT_NAME_PATTERN, file_name).group(1))
+
+
+def list_segments(dir_path: str) -> List[str]:
+    return sorted([i for i in os.listdir(dir_path) if is_segment_name(i)], key=segment_number)
+
+
+def write_segment_index(dir_path: str, file_name: str, offsets: List[int]) -> None:
+    """Saves the byte offset of every record of the segment, along with the segment size it is valid for."""
+    index_uri = f"{dir_path}/{segment_index_name(file_name)}"
+    with open(f"{index_uri}.tmp", 'w') as f:
+        f.write(json.dumps({"bytes": os.path.getsize(f"{dir_path}/{file_name}"), "offsets": offsets}))
+    os.replace(f"{index_uri}.tmp", index_uri)
+
+
+def segment_refs(dir_path: str, file_name: str) -> List[str]:
+    """
+    Returns a 'segment-XXXXXX.jsonl@<offset>' reference for every record in the segment, in file order. They are taken
+    from the segment's index when it matches the segment's size, and the segment is only read when it has none (e.g.
+    written by a scraper that was killed) or the index is out of date.
+    """
+    index_uri = f"{dir_path}/{segment_index_name(file_name)}"
+    if os.path.exists(index_uri):
+        try:
+            with open(index_uri, 'r') as f:
+                index = json.loads(f.read())
+            if index["bytes"] == os.path.getsize(f"{dir_path}/{file_name}"):
+                return [f"{file_name}@{offset}" for offset in index["offsets"]]
+            log.debug(f'Segment index {index_uri} is out of date, reading the segment instead')
+        except (ValueError, KeyError, TypeError) as ex:
+            log.warning(f'Ignoring invalid segment index {index_uri}: {ex}')
+
+    refs = []
+    offset = 0
+    with open(f"{dir_path}/{file_name}", 'rb') as f:
+        for line in f:
+            if line.strip() != b'':
+                refs.append(f"{file_name}@{offset}")
+            offset += len(line)
+    return refs
+
+
+def split_segment_ref(ref: str) -> Tuple[str, int]:
+    file_name, offset = ref.rsplit('@', 1)
+    return file_name, int(offset)
+
+
+def read_record(dir_path: str, ref: str) -> str:
+    """Returns the raw JSON of a record given either a per-record file name or a segment reference."""
+    with RecordReader(dir_path) as reader:
+        return reader.read(ref)
+
+
+class RecordReader:
+    """
+    Reads the raw JSON of records given per-record file names or segment references, as listed for a replay. The
+    segment of the last record read is kept open, and only seeked when the next reference does not directly follow that
+    record, so a run of references in file order streams each segment once instead of opening it once per record.
+    """
+
+    def __init__(self, dir_path: str):
+        common.require_type(dir_path, str, exceptions.InvalidArgumentException)
+        self._dir_path = dir_path
+        self._segment_name = None
+        self._segment_file = None
+
+    def __enter__(self) -> 'RecordReader':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def read(self, ref: str) -> str:
+        if not is_segment_ref(ref):
+            with open(f"{self._dir_path}/{ref}", 'r') as f:
+                return f.read()
+
+        file_name, offset = split_segment_ref(ref)
+        if file_name != self._segment_name:
+            self.close()
+            self._segment_file = open(f"{self._dir_path}/{file_name}", 'rb')
+            self._segment_name = file_name
+        if self._segment_file.tell() != offset:
+            self._segment_file.seek(offset)
+        return self._segment_file.readline().decode('utf-8')
+
+    def close(self) -> None:
+        if self._segment_file is not None:
+            self._segment_file.close()
+        self._segment_file = None
+        self._segment_name = None
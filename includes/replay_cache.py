@@ -0,0 +1,104 @@
+import os
+import json
+import tempfile
+import threading
+import includes.common as common
+import includes.exceptions as exceptions
+import includes.kinesis_client as kinesis_client
+
+
+class ReplayCache:
+    """
+    Holds the records of a shard directory that were parsed and validated by the replay precheck, so replaying them does
+    not read and parse every file a second time. Up to max_records records are kept in memory; any further records are
+    spilled, as compact JSON lines, to a temporary file indexed by file reference. Records are removed from the cache
+    as they are taken for replay.
+
+    Spill files written by other processes (e.g. the precheck workers) can be adopted with their index, so the records
+    they hold never have to be passed to this process one by one. Adopted files are deleted on close().
+    """
+
+    def __init__(self, *, max_records: int):
+        common.require_type(max_records, int, exceptions.InvalidArgumentException)
+        if max_records < 0:
+            raise exceptions.InvalidArgumentException(f"max_records cannot be negative. Value provided: {max_records}")
+        self._max_records = max_records
+        self._records = {}
+        # Spill file, offset and length of each spilled record, by file reference
+        self._spilled = {}
+        self._spill_file = None
+        self._adopted_files = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'ReplayCache':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    @property
+    def memory_count(self) -> int:
+        return len(self._records)
+
+    @property
+    def spilled_count(self) -> int:
+        return len(self._spilled)
+
+    @property
+    def memory_capacity(self) -> int:
+        """How many more records are kept in memory before records are spilled."""
+        return max(0, self._max_records - len(self._records))
+
+    def add(self, ref: str, record: kinesis_client.Record) -> None:
+        common.require_type(ref, str, exceptions.InvalidArgumentException)
+        common.require_instance(record, kinesis_client.Record, exceptions.InvalidArgumentException)
+        with self._lock:
+            if len(self._records) < self._max_records:
+                self._records[ref] = record
+                return
+            if self._spill_file is None:
+                self._spill_file = tempfile.TemporaryFile()
+            line = record.toJson().encode('utf-8') + b'\n'
+            self._spill_file.seek(0, 2)
+            self._spilled[ref] = (self._spill_file, self._spill_file.tell(), len(line))
+            self._spill_file.write(line)
+
+    def adopt_spill_file(self, file_path: str, index: list) -> None:
+        """
+        Takes over a file of JSON records written by another process. index holds a (file reference, offset, length)
+        triple per record of the file. The file is deleted on close().
+        """
+        common.require_type(file_path, str, exceptions.InvalidArgumentException)
+        common.require_type(index, list, exceptions.InvalidArgumentException)
+        with self._lock:
+            spill_file = open(file_path, 'rb')
+            self._adopted_files.append((spill_file, file_path))
+            for ref, offset, length in index:
+                self._spilled[ref] = (spill_file, offset, length)
+
+    def pop(self, ref: str) -> kinesis_client.Record | None:
+        """Returns the record of the file reference and removes it from the cache, or None if it is not cached."""
+        with self._lock:
+            record = self._records.pop(ref, None)
+            if record is not None:
+                return record
+            position = self._spilled.pop(ref, None)
+            if position is None:
+                return None
+            spill_file, offset, length = position
+            spill_file.seek(offset)
+            line = spill_file.read(length)
+        # Spilled records were validated when added: they are only loaded back
+        return kinesis_client.Record.from_batch([json.loads(line)], base64_encoded=True)[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._records = {}
+            self._spilled = {}
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+            for spill_file, file_path in self._adopted_files:
+                spill_file.close()
+                os.remove(file_path)
+            self._adopted_files = []
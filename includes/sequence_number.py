@@ -0,0 +1,52 @@
+import re
+from typing import Union
+
+# Kinesis sequence numbers are decimal strings. Current ones are 56 digits long (about 186 bits)
+SEQUENCE_NUMBER_PATTERN = re.compile(r'[0-9]{1,78}')
+# Fixed width of the binary encoding. 32 bytes (256 bits) leave plenty of headroom over today's 186 bits
+ENCODED_SIZE = 32
+
+
+class SequenceNumber(int):
+    """
+    An exact, ordered Kinesis sequence number. Sequence numbers are too large for a float, and comparing them as
+    strings is only correct when both have the same number of digits, so they are parsed once into an int.
+
+    encode() returns a fixed width big-endian encoding, so encoded sequence numbers sort bytewise in the same order
+    as the numbers themselves and can be stored in fixed size index entries.
+    """
+
+    def __new__(cls, value: Union[str, int, 'SequenceNumber']):
+        if isinstance(value, SequenceNumber):
+            return value
+        number = value
+        if type(value) is str and SEQUENCE_NUMBER_PATTERN.fullmatch(value) is not None:
+            number = int(value)
+        if type(number) is not int or number < 0 or number.bit_length() > ENCODED_SIZE * 8:
+            raise ValueError(f"A sequence number must be a string of digits or an integer, from 0 to 2^256-1. "
+                             f"Value provided: {type(value)} {repr(value)}")
+        return super().__new__(cls, number)
+
+    def __str__(self) -> str:
+        return int.__repr__(self)
+
+    def __repr__(self) -> str:
+        return f"SequenceNumber('{self}')"
+
+    def encode(self) -> bytes:
+        return self.to_bytes(ENCODED_SIZE, 'big')
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'SequenceNumber':
+        if type(data) is not bytes or len(data) != ENCODED_SIZE:
+            raise ValueError(f"An encoded sequence number must be {ENCODED_SIZE} bytes. "
+                             f"Value provided: {type(data)} {repr(data)}")
+        return cls(int.from_bytes(data, 'big'))
+
+
+def is_sequence_number(value: object) -> bool:
+    try:
+        SequenceNumber(value)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from typing import List, Optional, Union
+import includes.common as common
+import includes.exceptions as exceptions
+
+log = logging.getLogger(__name__)
+
+
+class Shard(common.BaseCommonClass):
+    """A shard of the stream as returned by list_shards(), flattened."""
+
+    def __init__(self, passed_data: Union[dict, str]):
+        self._shard_id = None
+        self._parent_shard_id = None
+        self._adjacent_parent_shard_id = None
+        self._starting_hash_key = None
+        self._ending_hash_key = None
+        self._starting_sequence_number = None
+        self._ending_sequence_number = None
+
+        # Have to call parent after defining attributes
+        super().__init__(passed_data)
+
+    @classmethod
+    def _add_props(cls, proprules: common.PropRules) -> None:
+        proprules.add_prop("shard_id", types=[str])
+        proprules.add_prop("parent_shard_id", types=[str, type(None)])
+        proprules.add_prop("adjacent_parent_shard_id", types=[str, type(None)])
+        proprules.add_prop("starting_hash_key", types=[str])
+        proprules.add_prop("ending_hash_key", types=[str])
+        proprules.add_prop("starting_sequence_number", types=[str])
+        proprules.add_prop("ending_sequence_number", types=[str, type(None)])
+
+    @classmethod
+    def from_response(cls, node: dict) -> 'Shard':
+        """Builds a Shard from a single entry of the 'Shards' list of a list_shards() response."""
+        return cls({
+            "shard_id": node['ShardId'],
+            "parent_shard_id": node.get('ParentShardId'),
+            "adjacent_parent_shard_id": node.get('AdjacentParentShardId'),
+            "starting_hash_key": node['HashKeyRange']['StartingHashKey'],
+            "ending_hash_key": node['HashKeyRange']['EndingHashKey'],
+            "starting_sequence_number": node['SequenceNumberRange']['StartingSequenceNumber'],
+            "ending_sequence_number": node['SequenceNumberRange'].get('EndingSequenceNumber'),
+        })
+
+    @property
+    def shard_id(self) -> str:
+        return self._shard_id
+
+    @property
+    def parent_shard_id(self) -> Optional[str]:
+        return self._parent_shard_id
+
+    @property
+    def adjacent_parent_shard_id(self) -> Optional[str]:
+        return self._adjacent_parent_shard_id
+
+    @property
+    def starting_hash_key(self) -> str:
+        return self._starting_hash_key
+
+    @property
+    def ending_hash_key(self) -> str:
+        return self._ending_hash_key
+
+    @property
+    def starting_sequence_number(self) -> str:
+        return self._starting_sequence_number
+
+    @property
+    def ending_sequence_number(self) -> Optional[str]:
+        """None while the shard is open. Set once the shard was closed by a split or merge."""
+        return self._ending_sequence_number
+
+    @property
+    def closed(self) -> bool:
+        return self._ending_sequence_number is not None
+
+    def owns_hash_key(self, key: int) -> bool:
+        return int(self._starting_hash_key) <= key <= int(self._ending_hash_key)
+
+    def toDict(self) -> dict:
+        return {
+            "shard_id": self.shard_id,
+            "parent_shard_id": self.parent_shard_id,
+            "adjacent_parent_shard_id": self.adjacent_parent_shard_id,
+            "starting_hash_key": self.starting_hash_key,
+            "ending_hash_key": self.ending_hash_key,
+            "starting_sequence_number": self.starting_sequence_number,
+            "ending_sequence_number": self.ending_sequence_number,
+        }
+
+
+def hash_key(partition_key: str) -> int:
+    """Returns the 128-bit hash key Kinesis routes the partition key to: the MD5 of the key, as an unsigned integer."""
+    common.require_type(partition_key, str, exceptions.InvalidArgumentException)
+    return int(hashlib.md5(partition_key.encode('utf-8')).hexdigest(), 16)
+
+
+def owning_shards(shards: List[Shard], partition_keys: list) -> List[Shard]:
+    """
+    Returns the shards whose hash key range holds any of the partition keys, keeping their order. Closed shards are
+    matched as well, as they hold the records of the keys from before the stream was resharded.
+    """
+    hash_keys = [hash_key(i) for i in partition_keys]
+    return [shard for shard in shards if any([shard.owns_hash_key(i) for i in hash_keys])]
+
+
+class ShardMapCache:
+    """
+    Keeps the shards last listed for a stream at shard_maps/<stream_name>.json, so repeated runs do not have to list
+    every shard of a large stream again. A cached map is only used for the same shard filter, and for ttl seconds
+    after it was listed. Resharding only changes the map every few minutes at most, so a short ttl is safe.
+    """
+
+    def __init__(self, stream_name: str, *, ttl: int, base_dir: str = 'shard_maps'):
+        common.require_type(stream_name, str, exceptions.InvalidArgumentException)
+        common.require_type(ttl, int, exceptions.InvalidArgumentException)
+        self._ttl = ttl
+        # Safety: We strip all but safe characters before creating any files/dirs
+        self._file_path = f"{base_dir}/{re.sub(r'[^A-Za-z0-9-_.]', '', stream_name)}.json"
+
+    @property
+    def file_path(self) -> str:
+        return self._file_path
+
+    def load(self, shard_filter: Optional[dict]) -> Optional[List[Shard]]:
+        """Returns the cached shards, or None if there are none for this shard filter or they are too old."""
+        if not os.path.exists(self._file_path):
+            return None
+        try:
+            with open(self._file_path, 'r') as f:
+                contents = json.load(f)
+            if contents['shard_filter'] != shard_filter or time.time() - contents['listed_at'] >= self._ttl:
+                return None
+            return [Shard(i) for i in contents['shards']]
+        except Exception as ex:
+            # Only a cache: a damaged file is listed again and overwritten
+            log.warning(f"Ignoring unreadable shard map cache '{self._file_path}': {repr(ex)}")
+            return None
+
+    def save(self, shard_filter: Optional[dict], shards: List[Shard]) -> None:
+        dir_path = os.path.dirname(self._file_path)
+        if not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        with open(f"{self._file_path}.tmp", 'w') as f:
+            json.dump({
+                "shard_filter": shard_filter,
+                "listed_at": time.time(),
+                "shards": [i.toDict() for i in shards],
+            }, f, indent=4)
+        os.replace(f"{self._file_path}.tmp", self._file_path)
@@ -0,0 +1,92 @@
+import json
+from typing import Optional, Union
+import includes.common as common
+import includes.exceptions as exceptions
+from includes.sequence_number import SequenceNumber
+
+
+class ShardWindow(common.BaseCommonClass):
+    """
+    The records of a shard that arrived within a time window, identified by the sequence numbers of the first and
+    last of them. Both sequence numbers are None if no record of the shard arrived within the window.
+    """
+
+    def __init__(self, passed_data: Union[dict, str]):
+        self._shard_id = None
+        self._start_timestamp = None
+        self._end_timestamp = None
+        self._first_sequence_number = None
+        self._last_sequence_number = None
+
+        # Have to call parent after defining attributes
+        super().__init__(passed_data)
+
+    @classmethod
+    def _add_props(cls, proprules: common.PropRules) -> None:
+        proprules.add_prop("shard_id", types=[str])
+        proprules.add_prop("start_timestamp", types=[str])
+        proprules.add_prop("end_timestamp", types=[str])
+        proprules.add_prop("first_sequence_number", types=[str, type(None)])
+        proprules.add_prop("last_sequence_number", types=[str, type(None)])
+
+    @property
+    def shard_id(self) -> str:
+        return self._shard_id
+
+    @property
+    def start_timestamp(self) -> str:
+        return self._start_timestamp
+
+    @property
+    def end_timestamp(self) -> str:
+        """Exclusive: records that arrived at or after the end timestamp are not within the window."""
+        return self._end_timestamp
+
+    @property
+    def first_sequence_number(self) -> Optional[str]:
+        return self._first_sequence_number
+
+    @property
+    def last_sequence_number(self) -> Optional[str]:
+        return self._last_sequence_number
+
+    @property
+    def empty(self) -> bool:
+        return self._first_sequence_number is None
+
+    def _is_valid(self):
+        super()._is_valid()
+        if (self._first_sequence_number is None) != (self._last_sequence_number is None):
+            raise exceptions.InvalidArgumentException(
+                "first_sequence_number and last_sequence_number must either both be set or both be None")
+        if self.empty:
+            return
+        try:
+            first, last = SequenceNumber(self._first_sequence_number), SequenceNumber(self._last_sequence_number)
+        except ValueError as ex:
+            raise exceptions.InvalidArgumentException(f"Invalid window sequence number: {ex}") from ex
+        if first > last:
+            raise exceptions.InvalidArgumentException(
+                f"first_sequence_number cannot be greater than last_sequence_number. Values provided: "
+                f"{repr(self._first_sequence_number)} {repr(self._last_sequence_number)}")
+
+    def config_overrides(self) -> dict:
+        """Returns the ClientConfig values that scrape exactly this window of the shard (see ClientConfig.derive())."""
+        if self.empty:
+            raise exceptions.InvalidArgumentException(f"The window of shard {self._shard_id} holds no records")
+        return {
+            'shard_ids': [self._shard_id],
+            'starting_position': 'AT_SEQUENCE_NUMBER',
+            'starting_sequence_number': self._first_sequence_number,
+            'ending_position': 'AT_SEQUENCE_NUMBER',
+            'ending_sequence_number': self._last_sequence_number,
+        }
+
+    def toJson(self, *, indent: Optional[Union[int, None]] = None) -> str:
+        return json.dumps({
+            "shard_id": self.shard_id,
+            "start_timestamp": self.start_timestamp,
+            "end_timestamp": self.end_timestamp,
+            "first_sequence_number": self.first_sequence_number,
+            "last_sequence_number": self.last_sequence_number,
+        }, indent=indent)
@@ -47,7 +47,9 @@ def begin_replaying():
 
 def begin_scraping():
     config_yaml = common.read_config('config-kinesis_scraper.yaml')
-    kinesis_config = kinesis.ClientConfig(config_yaml, boto3.client('kinesis', config_yaml['region_name']))
+    kinesis_config = kinesis.ClientConfig(
+        config_yaml, boto3.client('kinesis', config_yaml['region_name']),
+        boto_client_factory=lambda: boto3.session.Session().client('kinesis', config_yaml['region_name']))
     kinesis_client = kinesis.Client(kinesis_config)
     kinesis_client.begin_scraping()
 
@@ -0,0 +1,112 @@
+import datetime
+import unittest
+import includes.kinesis_client as kinesis
+import includes.boundary as boundary
+import includes.exceptions as exceptions
+
+
+def generate_records(sequence_numbers: list, seconds: list = None) -> list:
+    if seconds is None:
+        seconds = [0] * len(sequence_numbers)
+    return [kinesis.Record({
+        "SequenceNumber": str(sequence_number),
+        "ApproximateArrivalTimestamp": datetime.datetime(2023, 1, 1, 10, 0, second, 500000),
+        "Data": "data",
+        "PartitionKey": "pkey",
+    }) for sequence_number, second in zip(sequence_numbers, seconds)]
+
+
+class TestSequenceNumberBoundary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_at(self):
+        ending = boundary.SequenceNumberBoundary('AT_SEQUENCE_NUMBER',
+                                                 '49590338271490256608559692538361571095921575989136588898')
+        self.assertEqual((2, False), ending.cut(generate_records([
+            '49590338271490256608559692538361571095921575989136588896',
+            '49590338271490256608559692538361571095921575989136588897'])))
+        self.assertEqual((1, True), ending.cut(generate_records([
+            '49590338271490256608559692538361571095921575989136588898',
+            '49590338271490256608559692538361571095921575989136588899'])))
+
+    def test_at_missing(self):
+        ending = boundary.SequenceNumberBoundary('AT_SEQUENCE_NUMBER', 15)
+        self.assertEqual((2, True), ending.cut(generate_records([10, 14, 16, 17])))
+
+    def test_after(self):
+        ending = boundary.SequenceNumberBoundary('AFTER_SEQUENCE_NUMBER', 15)
+        self.assertEqual((3, True), ending.cut(generate_records([10, 15, 16, 17])))
+
+    def test_after_next_record_in_next_batch(self):
+        ending = boundary.SequenceNumberBoundary('AFTER_SEQUENCE_NUMBER', 15)
+        self.assertEqual((2, False), ending.cut(generate_records([10, 15])))
+        self.assertEqual((0, False), ending.cut([]))
+        self.assertEqual((1, True), ending.cut(generate_records([16, 17])))
+
+    def test_before(self):
+        ending = boundary.SequenceNumberBoundary('BEFORE_SEQUENCE_NUMBER', 15)
+        self.assertEqual((1, True), ending.cut(generate_records([10, 15, 16])))
+        ending = boundary.SequenceNumberBoundary('BEFORE_SEQUENCE_NUMBER', 10)
+        self.assertEqual((0, True), ending.cut(generate_records([10, 15, 16])))
+
+    def test_invalid_position(self):
+        with self.assertRaises(exceptions.InvalidArgumentException) as ex:
+            boundary.SequenceNumberBoundary('AT_TIMESTAMP', 15)
+        self.assertIn("position must be one of: ['AT_SEQUENCE_NUMBER', 'AFTER_SEQUENCE_NUMBER', "
+                      "'BEFORE_SEQUENCE_NUMBER']. Received: <class 'str'> 'AT_TIMESTAMP'", str(ex.exception))
+
+
+class TestTimestampBoundary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_at_spanning_batches(self):
+        ending = boundary.TimestampBoundary('AT_TIMESTAMP', '2023-01-01 10:00:05')
+        self.assertEqual((3, False), ending.cut(generate_records([1, 2, 3], [4, 5, 5])))
+        self.assertEqual((1, True), ending.cut(generate_records([4, 5], [5, 6])))
+
+    def test_at_missing(self):
+        ending = boundary.TimestampBoundary('AT_TIMESTAMP', '2023-01-01 10:00:05')
+        self.assertEqual((1, True), ending.cut(generate_records([1, 2], [4, 6])))
+
+    def test_after(self):
+        ending = boundary.TimestampBoundary('AFTER_TIMESTAMP', '2023-01-01 10:00:05')
+        self.assertEqual((5, True), ending.cut(generate_records([1, 2, 3, 4, 5, 6], [4, 5, 5, 7, 7, 8])))
+
+    def test_before(self):
+        ending = boundary.TimestampBoundary('BEFORE_TIMESTAMP', '2023-01-01 10:00:05')
+        self.assertEqual((1, True), ending.cut(generate_records([1, 2, 3], [4, 5, 6])))
+
+    def test_to_utc_second(self):
+        eastern = datetime.timezone(datetime.timedelta(hours=-5))
+        self.assertEqual(datetime.datetime(2023, 1, 1, 15, 0, 5),
+                         boundary.to_utc_second(datetime.datetime(2023, 1, 1, 10, 0, 5, 999999, tzinfo=eastern)))
+        self.assertEqual(datetime.datetime(2023, 1, 1, 10, 0, 5), boundary.to_utc_second('2023-01-01 10:00:05'))
+
+    def test_no_boundary(self):
+        self.assertIsNone(boundary.new_ending_boundary('LATEST', sequence_number=None, timestamp=None))
+        self.assertIsNone(boundary.new_ending_boundary('TOTAL_RECORDS_PER_SHARD', sequence_number=None,
+                                                       timestamp=None))
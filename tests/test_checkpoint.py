@@ -0,0 +1,129 @@
+import os
+import json
+import tempfile
+import unittest
+import includes.checkpoint as checkpoint
+import includes.exceptions as exceptions
+
+
+class TestCheckpointStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_load_missing(self):
+        store = checkpoint.CheckpointStore("user_activities")
+        self.assertIsNone(store.load("shardId-1"))
+
+    def test_save_and_load(self):
+        store = checkpoint.CheckpointStore("user_activities")
+        store.save(checkpoint.ShardCheckpoint({
+            "shard_id": "shardId-1",
+            "sequence_number": "49590338271490256608559692538361571095921575989136588898",
+            "total_found_records": 20,
+            "record_count": 20,
+            "output_position": "segment-000002.jsonl@1234",
+            "completed": False,
+            "updated_at": "2023-01-01T10:00:00+00:00",
+        }))
+        self.assertEqual(["shardId-1.json"], os.listdir("checkpoints/user_activities"))
+
+        loaded = store.load("shardId-1")
+        self.assertEqual("49590338271490256608559692538361571095921575989136588898", loaded.sequence_number)
+        self.assertEqual(20, loaded.record_count)
+        self.assertEqual("segment-000002.jsonl@1234", loaded.output_position)
+        self.assertFalse(loaded.completed)
+
+    def test_load_invalid_file(self):
+        store = checkpoint.CheckpointStore("user_activities")
+        os.makedirs("checkpoints/user_activities")
+        with open("checkpoints/user_activities/shardId-1.json", "w") as f:
+            f.write('{"shard_id": "shardId-1", "record_count": "abc"}')
+        with self.assertRaises(exceptions.FileProcessingError) as ex:
+            store.load("shardId-1")
+        self.assertIn("The checkpoint file 'checkpoints/user_activities/shardId-1.json' is not in the expected "
+                      "format.", str(ex.exception))
+
+    def test_invalid_sequence_number(self):
+        with self.assertRaises(exceptions.InvalidArgumentException) as ex:
+            checkpoint.ShardCheckpoint({"shard_id": "shardId-1", "sequence_number": "4.9e55",
+                                        "total_found_records": 1, "record_count": 1, "output_position": None})
+        self.assertIn("Invalid checkpoint sequence_number: A sequence number must be a string of digits or an integer, "
+                      "from 0 to 2^256-1. Value provided: <class 'str'> '4.9e55'", str(ex.exception))
+
+
+class TestCheckpointTracker(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.store = checkpoint.CheckpointStore("user_activities")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def batch_written(self, tracker: checkpoint.CheckpointTracker, batch: int):
+        tracker.batch_written(sequence_number=str(batch * 10), total_found_records=batch * 10,
+                              record_count=batch * 10, output_position=None)
+
+    def test_saved_every_interval(self):
+        tracker = checkpoint.CheckpointTracker(self.store, "shardId-1", 3)
+        self.batch_written(tracker, 1)
+        self.batch_written(tracker, 2)
+        self.assertIsNone(self.store.load("shardId-1"))
+
+        self.batch_written(tracker, 3)
+        self.batch_written(tracker, 4)
+        self.assertEqual("30", self.store.load("shardId-1").sequence_number)
+
+    def test_flush(self):
+        tracker = checkpoint.CheckpointTracker(self.store, "shardId-1", 3)
+        tracker.flush()
+        self.assertIsNone(self.store.load("shardId-1"))
+
+        self.batch_written(tracker, 1)
+        tracker.flush()
+        self.assertEqual("10", self.store.load("shardId-1").sequence_number)
+        self.assertFalse(self.store.load("shardId-1").completed)
+
+        tracker.flush(completed=True)
+        with open("checkpoints/user_activities/shardId-1.json", "r") as f:
+            saved = json.loads(f.read())
+        self.assertTrue(saved["completed"])
+        self.assertEqual(10, saved["record_count"])
+
+    def test_synced_before_save(self):
+        saved_when_synced = []
+        tracker = checkpoint.CheckpointTracker(self.store, "shardId-1", 2,
+                                               sync=lambda: saved_when_synced.append(self.store.load("shardId-1")))
+        self.batch_written(tracker, 1)
+        self.assertEqual([], saved_when_synced)
+
+        self.batch_written(tracker, 2)
+        self.batch_written(tracker, 3)
+        tracker.flush()
+        self.assertEqual([None, "20"], [i and i.sequence_number for i in saved_when_synced])
+        self.assertEqual("30", self.store.load("shardId-1").sequence_number)
+
@@ -1,4 +1,6 @@
 import unittest
+import includes.common as common
+import includes.exceptions as exceptions
 from includes.common import list_append_upto_n_items_total, list_append_upto_n_items_from_new_list
 
 
@@ -209,3 +211,111 @@ class ListAppendUptoNItemsTotal(unittest.TestCase):
         self.assertEqual(base_list_new, [0, 1, 2, 3, 4, 0, 1, 2, 3, 4, 5, 6])
         self.assertEqual(base_list, list(range(5)))
         self.assertEqual(base_list, base_list_orig)
+
+
+class Model(common.BaseCommonClass):
+    def __init__(self, passed_data: dict):
+        self._name = None
+        self._tags = []
+        self.public = None
+        self._proprules = common.PropRules()
+        self._proprules.add_prop("name", types=[str])
+        super().__init__(passed_data)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def tags(self):
+        return self._tags
+
+    def method(self):
+        pass
+
+
+class ClassRulesModel(common.BaseCommonClass):
+    def __init__(self, passed_data: dict):
+        self._name = None
+        super().__init__(passed_data)
+
+    @classmethod
+    def _add_props(cls, proprules: common.PropRules) -> None:
+        proprules.add_prop("name", types=[str])
+
+    @property
+    def name(self):
+        return self._name
+
+
+class TestBaseCommonClassSchema(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_schema(self):
+        schema = common.schema_of(Model({"name": "a"}))
+        self.assertIs(schema, common.schema_of(Model({"name": "b"})))
+        self.assertEqual(["name", "public", "tags"], schema.public_names)
+        self.assertEqual("_name", schema.fields["name"])
+        self.assertEqual("public", schema.fields["public"])
+        self.assertNotIn("method", schema.fields)
+
+    def test_load(self):
+        model = Model({"name": "a", "tags": ["x"], "public": 1, "method": "ignored", "unknown": "ignored"})
+        self.assertEqual(("a", ["x"], 1), (model.name, model.tags, model.public))
+        self.assertTrue(callable(model.method))
+
+    def test_repr(self):
+        self.assertEqual("name='a',public=None,tags=['x']", repr(Model({"name": "a", "tags": ["x"]})))
+        self.assertEqual("name=a,public=None,tags=['x']", str(Model({"name": "a", "tags": ["x"]})))
+
+    def test_eq_and_hash(self):
+        model = Model({"name": "a", "tags": ["x", {"y": [1]}]})
+        same = Model({"name": "a", "tags": ["x", {"y": [1]}]})
+        self.assertEqual(model, same)
+        self.assertNotEqual(model, Model({"name": "a", "tags": ["z"]}))
+        self.assertNotEqual(model, "name='a',public=None,tags=['x', {'y': [1]}]")
+        self.assertEqual(hash(model), hash(same))
+        self.assertEqual(1, len({model, same}))
+        self.assertEqual("cached", {model: "cached"}[same])
+
+    def test_eq_and_hash_dict_order(self):
+        model = Model({"name": "a", "tags": [{"x": 1, "y": {"z": 2, "w": 3}}]})
+        reordered = Model({"name": "a", "tags": [{"y": {"w": 3, "z": 2}, "x": 1}]})
+        self.assertEqual(model, reordered)
+        self.assertEqual(hash(model), hash(reordered))
+        self.assertEqual(common.hashable({"x": 1, "y": 2}), common.hashable({"y": 2, "x": 1}))
+
+    def test_eq_collection(self):
+        class Items(common.Collection):
+            pass
+
+        class OtherItems(common.Collection):
+            pass
+
+        self.assertEqual(Items([1, "a"]), Items([1, "a"]))
+        self.assertNotEqual(Items([1, "a"]), Items([1, "b"]))
+        self.assertNotEqual(Items([1, "a"]), OtherItems([1, "a"]))
+        self.assertNotEqual(Items([1, "a"]), repr(Items([1, "a"])))
+        with self.assertRaises(TypeError):
+            hash(Items([1, "a"]))
+
+    def test_class_proprules(self):
+        model = ClassRulesModel({"name": "a"})
+        self.assertIs(model._proprules, ClassRulesModel({"name": "b"})._proprules)
+        self.assertIs(model._proprules.validator(), ClassRulesModel({"name": "c"})._proprules.validator())
+        with self.assertRaises(exceptions.ValidationError):
+            ClassRulesModel({"name": 1})
+        # Objects setting their own rules are unaffected
+        self.assertIsNot(Model({"name": "a"})._proprules, Model({"name": "b"})._proprules)
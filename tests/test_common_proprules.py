@@ -1363,3 +1363,39 @@ class PropRules(unittest.TestCase):
 
         DynamicClass = DynamicClass(common.BaseCommonClass)
         self.assertIsInstance(DynamicClass(data), DynamicClass)
+
+    def test_validator_cached_per_rules(self):
+        def build_rules(types):
+            proprules = common.PropRules()
+            proprules.add_prop("attrib_types", types=types)
+            proprules.add_prop("attrib_regexp", regexp=r"^\d+$")
+            return proprules
+
+        self.assertIs(build_rules([str]).validator(), build_rules([str]).validator())
+        self.assertIsNot(build_rules([str]).validator(), build_rules([int]).validator())
+
+    def test_validator_rule_order(self):
+        proprules = common.PropRules()
+        proprules.add_prop("attrib_types", types=[int])
+        proprules.add_prop("attrib_populated", populated=True)
+        # Populated rules are checked before type rules, whatever order they were added in
+        with self.assertRaises(exceptions.ValidationError) as ex:
+            proprules.validate({"attrib_types": "5", "attrib_populated": ""})
+        self.assertIn("'attrib_populated' is a required attribute that must be populated", str(ex.exception))
+
+    def test_attribs_of_only_evaluates_ruled_props(self):
+        class Model:
+            attrib_ruled = 5
+
+            @property
+            def attrib_unruled(self):
+                raise AssertionError("Properties without rules must not be evaluated")
+
+            def attrib_method(self):
+                pass
+
+        proprules = common.PropRules()
+        proprules.add_prop("attrib_ruled", types=[int])
+        proprules.add_prop("attrib_method", types=[int])
+        proprules.add_prop("attrib_missing", types=[int])
+        self.assertEqual({"attrib_ruled": 5}, proprules.attribs_of(Model()))
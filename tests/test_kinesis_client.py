@@ -1,11 +1,22 @@
+import json
 import botocore
+import botocore.exceptions
+import botocore.config
+import boto3
 import uuid
+import concurrent.futures
+import threading
+import tempfile
 import datetime
 import unittest
 import unittest.mock as mock
 from unittest.mock import patch, call
 import os
 import includes.kinesis_client as kinesis
+import includes.lineage as lineage
+import includes.record_store as record_store
+import includes.checkpoint as checkpoint
+import includes.poll_controller as poll_controller
 import includes.exceptions as exceptions
 
 
@@ -31,6 +42,20 @@ def generate_record_raw_dict(*,
     return record
 
 
+def generate_shard_raw_dict(shard_id: str, *, parent_shard_id: str = None, ending_sequence_number: str = None,
+                            hash_key_range: tuple = (0, 2 ** 128 - 1)) -> dict:
+    shard = {
+        "ShardId": shard_id,
+        "HashKeyRange": {"StartingHashKey": str(hash_key_range[0]), "EndingHashKey": str(hash_key_range[1])},
+        "SequenceNumberRange": {"StartingSequenceNumber": "100"},
+    }
+    if parent_shard_id is not None:
+        shard["ParentShardId"] = parent_shard_id
+    if ending_sequence_number is not None:
+        shard["SequenceNumberRange"]["EndingSequenceNumber"] = ending_sequence_number
+    return shard
+
+
 def generate_record_obj(record_raw_dict=None) -> kinesis.Record:
     if record_raw_dict is None:
         record_raw_dict = generate_record_raw_dict()
@@ -127,6 +152,52 @@ class TestRecord(unittest.TestCase):
         self.assertEqual(record_obj.PartitionKey, "sample_event")
         self.assertEqual(record_obj.Data, "dataHere")
 
+    def test_record_has_no_instance_dict(self):
+        record_obj = kinesis.Record(generate_record_raw_dict())
+        self.assertFalse(hasattr(record_obj, '__dict__'))
+        with self.assertRaises(AttributeError):
+            record_obj.unknown_attribute = 1
+
+    def test_record_json(self):
+        record_raw = generate_record_raw_dict(sequence_number="1", timestamp="2023-01-01T00:00:00")
+        record_obj = kinesis.Record(json.dumps(record_raw))
+        self.assertEqual(kinesis.Record(record_raw), record_obj)
+
+    def test_record_hash(self):
+        record_raw = generate_record_raw_dict(sequence_number="1", timestamp="2023-01-01T00:00:00")
+        self.assertEqual(hash(kinesis.Record(record_raw)), hash(kinesis.Record(dict(record_raw))))
+        self.assertEqual(1, len({kinesis.Record(record_raw), kinesis.Record(dict(record_raw))}))
+        self.assertNotEqual(kinesis.Record(record_raw), repr(kinesis.Record(record_raw)))
+
+    def test_get_records_response_eq(self):
+        def response() -> kinesis.Boto3GetRecordsResponse:
+            return kinesis.Boto3GetRecordsResponse({
+                "Records": [generate_record_raw_dict(sequence_number=str(i), timestamp="2023-01-01T00:00:00")
+                            for i in range(2)],
+                "MillisBehindLatest": 0,
+                "NextShardIterator": "iter1",
+            })
+
+        self.assertEqual(response(), response())
+        with self.assertRaises(TypeError):
+            hash(response())
+
+    def test_from_batch(self):
+        record_obj = generate_record_obj(generate_record_raw_dict(sequence_number="1"))
+        records = kinesis.Record.from_batch([record_obj, generate_record_raw_dict(sequence_number="2")],
+                                            base64_encoded=True)
+        self.assertIs(record_obj, records[0])
+        self.assertEqual(["1", "2"], [i.SequenceNumber for i in records])
+        self.assertTrue(records[1].base64_encoded)
+
+    def test_from_batch_invalid_record(self):
+        record_raw = generate_record_raw_dict(sequence_number="2")
+        record_raw["PartitionKey"] = 1
+        with self.assertRaises(exceptions.ValidationError) as ex:
+            kinesis.Record.from_batch([generate_record_raw_dict(sequence_number="1"), record_raw])
+        self.assertIn("'PartitionKey' attribute must be of type: [<class 'str'>]. Received:<class 'int'> 1",
+                      str(ex.exception))
+
 
 class TestCalculateIterationUptoAdd(unittest.TestCase):
     @classmethod
@@ -155,14 +226,7 @@ class TestCalculateIterationUptoAdd(unittest.TestCase):
             'max_empty_polls': 5,
         }
         self.detected_shards = {
-            'StreamDescription':
-                {
-                    'StreamName': '123',
-                    'StreamARN': 'arn:123',
-                    'Shards': [{
-                        'ShardId': 'shardId-00001'
-                    }]
-                }
+            'Shards': [generate_shard_raw_dict('shardId-00001')]
         }
 
     def tearDown(self):
@@ -435,6 +499,39 @@ class TestGetRecordsIterationInput(unittest.TestCase):
         self.assertEqual(iteration_input.shard_iterator, "abc")
         self.assertEqual(iteration_input.shard_id, "shardId-123")
 
+    def test_input_setters_validate_deferred(self):
+        iteration_input = kinesis.GetRecordsIterationInput(
+            total_found_records=10,
+            response_no_records=0,
+            loop_count=15,
+            shard_iterator="abc",
+            shard_id="shardId-123"
+        )
+        iteration_input.loop_count += 1
+        iteration_input.response_no_records = -1
+        iteration_input.total_found_records = 11
+        with self.assertRaises(exceptions.ValidationError) as ex:
+            iteration_input.validate()
+        self.assertIn("'response_no_records' must be a positive numeric value. Received: <class 'int'> -1",
+                      str(ex.exception))
+
+        iteration_input.response_no_records = 0
+        iteration_input.validate()
+        self.assertEqual(16, iteration_input.loop_count)
+
+    def test_input_setters_validate_in_debug_mode(self):
+        with self.assertLogs('includes.kinesis_client', level='DEBUG'):
+            iteration_input = kinesis.GetRecordsIterationInput(
+                total_found_records=10,
+                response_no_records=0,
+                loop_count=15,
+                shard_iterator="abc",
+                shard_id="shardId-123"
+            )
+            kinesis.log.debug("Debug level set")
+        with self.assertRaises(exceptions.ValidationError):
+            iteration_input.loop_count = "16"
+
 
 class TestGetRecordsIterationOutput(unittest.TestCase):
     @classmethod
@@ -527,7 +624,7 @@ class TestGetRecordsIterationOutput(unittest.TestCase):
                 break_iteration=True
             )
 
-        self.assertIn("'next_shard_iterator' attribute must be of type: [<class 'str'>]. Received:<class 'int'> 5",
+        self.assertIn("'next_shard_iterator' attribute must be of type: [<class 'str'>, <class 'NoneType'>]. Received:<class 'int'> 5",
             str(ex.exception)
         )
 
@@ -685,20 +782,26 @@ class TestScrapeRecordsForShardIterator(unittest.TestCase):
             'max_empty_polls': 5,
         }
         self.detected_shards = {
-            'StreamDescription':
-                {
-                    'StreamName': '123',
-                    'StreamARN': 'arn:123',
-                    'Shards': [{
-                        'ShardId': 'shardId-00001'
-                    }]
-                }
+            'Shards': [generate_shard_raw_dict('shardId-00001')]
         }
 
     def tearDown(self):
         pass
 
-    @patch('includes.kinesis_client.Client._process_records', spec_set=kinesis.Client._process_records)
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    def test_changed_input_validated(self, mocked_get_records):
+        iteration_input = kinesis.GetRecordsIterationInput(total_found_records=0, response_no_records=0,
+                                                           shard_iterator='xyz', loop_count=0, shard_id="shard_abc")
+        iteration_input.response_no_records = -1
+
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(exceptions.ValidationError) as ex:
+            client._scrape_records_for_shard_iterator(iteration_input)
+        self.assertIn("'response_no_records' must be a positive numeric value. Received: <class 'int'> -1",
+                      str(ex.exception))
+        mocked_get_records.assert_not_called()
+
+    @patch('includes.kinesis_client.Client._process_records', autospec=True)
     @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
     def test_one_record(self,
                         mocked_get_records,
@@ -730,7 +833,7 @@ class TestScrapeRecordsForShardIterator(unittest.TestCase):
         self.assertEqual(iteration_response.next_shard_iterator, 'iter1')
         self.assertEqual(iteration_response.shard_id, 'shard_abc')
 
-    @patch('includes.kinesis_client.Client._process_records', spec_set=kinesis.Client._process_records)
+    @patch('includes.kinesis_client.Client._process_records', autospec=True)
     @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
     def test_multi_records_responses_all_variant_1(self,
                                                    mocked_get_records,
@@ -796,7 +899,7 @@ class TestScrapeRecordsForShardIterator(unittest.TestCase):
             next_shard_iterator = iterator_response_obj.next_shard_iterator
             loop_count = iterator_response_obj.loop_count
 
-    @patch('includes.kinesis_client.Client._process_records', spec_set=kinesis.Client._process_records)
+    @patch('includes.kinesis_client.Client._process_records', autospec=True)
     @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
     def test_multi_records_responses_all_variant_2(self,
                                                    mocked_get_records,
@@ -866,7 +969,7 @@ class TestScrapeRecordsForShardIterator(unittest.TestCase):
             next_shard_iterator = iterator_response_obj.next_shard_iterator
             loop_count = iterator_response_obj.loop_count
 
-    @patch('includes.kinesis_client.Client._process_records', spec_set=kinesis.Client._process_records)
+    @patch('includes.kinesis_client.Client._process_records', autospec=True)
     @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
     def test_multi_records_responses_total_records_no_gap_no_remainder_spanning_across_calls(self,
                                                                                              mocked_get_records,
@@ -931,14 +1034,14 @@ class TestScrapeRecordsForShardIterator(unittest.TestCase):
         # print(repr(args_list[2][0][1]) == repr(generated_get_records[3].Records))
 
         calls = []
-        calls.append(call(shard_id, generated_get_records[0].Records))
-        calls.append(call(shard_id, generated_get_records[1].Records))
-        calls.append(call(shard_id, generated_get_records[2].Records))
+        calls.append(call(client, shard_id, generated_get_records[0].Records))
+        calls.append(call(client, shard_id, generated_get_records[1].Records))
+        calls.append(call(client, shard_id, generated_get_records[2].Records))
 
         mocked_process_records.assert_has_calls(calls, any_order=False)
         self.assertEqual(3, mocked_process_records.call_count)
 
-    @patch('includes.kinesis_client.Client._process_records', spec_set=kinesis.Client._process_records)
+    @patch('includes.kinesis_client.Client._process_records', autospec=True)
     @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
     def test_multi_records_responses_total_records_no_remainder_spanning_across_calls(self,
                                                                                       mocked_get_records,
@@ -1005,13 +1108,13 @@ class TestScrapeRecordsForShardIterator(unittest.TestCase):
         # print(repr(args_list[2][0][1]) == repr(generated_get_records[3].Records))
 
         calls = []
-        calls.append(call(shard_id, generated_get_records[0].Records))
-        calls.append(call(shard_id, generated_get_records[1].Records))
-        calls.append(call(shard_id, generated_get_records[3].Records))
+        calls.append(call(client, shard_id, generated_get_records[0].Records))
+        calls.append(call(client, shard_id, generated_get_records[1].Records))
+        calls.append(call(client, shard_id, generated_get_records[3].Records))
         mocked_process_records.assert_has_calls(calls, any_order=False)
         self.assertEqual(3, mocked_process_records.call_count)
 
-    @patch('includes.kinesis_client.Client._process_records', spec_set=kinesis.Client._process_records)
+    @patch('includes.kinesis_client.Client._process_records', autospec=True)
     @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
     def test_multi_records_responses_total_records_with_remainder_spanning_across_calls(self,
                                                                                         mocked_get_records,
@@ -1079,15 +1182,15 @@ class TestScrapeRecordsForShardIterator(unittest.TestCase):
 
 
         calls = []
-        calls.append(call(shard_id, generated_get_records[0].Records))
-        calls.append(call(shard_id, generated_get_records[2].Records))
+        calls.append(call(client, shard_id, generated_get_records[0].Records))
+        calls.append(call(client, shard_id, generated_get_records[2].Records))
         # Since we only use a subset of the records returned to the last get_records call,
         # we extract the expected records from the last result set we will be writing
         # (ie if we only want to write 3 of the 10 records)
         subset_records = generated_get_records[3].Records._items[0:5]
         subset_records_collection = generated_get_records[3]
         subset_records_collection.Records._items = subset_records
-        calls.append(call(shard_id, subset_records_collection.Records))
+        calls.append(call(client, shard_id, subset_records_collection.Records))
 
         mocked_process_records.assert_has_calls(calls, any_order=False)
         self.assertEqual(3, mocked_process_records.call_count)
@@ -1120,14 +1223,7 @@ class TestClientFullCycle(unittest.TestCase):
             'max_empty_polls': 5,
         }
         self.detected_shards = {
-            'StreamDescription':
-                {
-                    'StreamName': '123',
-                    'StreamARN': 'arn:123',
-                    'Shards': [{
-                        'ShardId': 'shardId-00001'
-                    }]
-                }
+            'Shards': [generate_shard_raw_dict('shardId-00001')]
         }
 
     def tearDown(self):
@@ -1161,9 +1257,9 @@ class TestClientFullCycle(unittest.TestCase):
     #     ]
     #     mock.seal(mocked_get_records)
     #
-    #     self.boto_client.describe_stream = mock.Mock()
-    #     self.boto_client.describe_stream.return_value = self.detected_shards
-    #     mock.seal(self.boto_client.describe_stream)
+    #     self.boto_client.list_shards = mock.Mock()
+    #     self.boto_client.list_shards.return_value = self.detected_shards
+    #     mock.seal(self.boto_client.list_shards)
     #
     #     mocked_process_records.return_value = 'proc record'
     #     mock.seal(mocked_process_records)
@@ -1187,8 +1283,8 @@ class TestClientFullCycle(unittest.TestCase):
             "Records": generate_records(10), "NextShardIterator": uuid.uuid4().hex, "MillisBehindLatest": 0
         })
 
-        self.boto_client.describe_stream = mock.Mock()
-        self.boto_client.describe_stream.return_value = self.detected_shards
+        self.boto_client.list_shards = mock.Mock()
+        self.boto_client.list_shards.return_value = self.detected_shards
 
         self.config_input["shard_ids"] = ["shardId-12345"]
         client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
@@ -1196,3 +1292,1042 @@ class TestClientFullCycle(unittest.TestCase):
             client.begin_scraping()
         self.assertIn("Specified shard_id \"shardId-12345\" does not exist in stream \"user_activities\". "
                       "Detected shards: ['shardId-00001']", str(ex.exception))
+
+
+class TestScrapeShardsParallel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': [],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "LATEST",
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 5,
+            'shard_workers': 4,
+        }
+
+    def tearDown(self):
+        pass
+
+    @patch('includes.kinesis_client.Client._scrape_records_for_shard', spec_set=kinesis.Client._scrape_records_for_shard)
+    def test_all_shards_scraped(self, mocked_scrape_records_for_shard):
+        shard_ids = [f"shardId-{i}" for i in range(10)]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_shards(shard_ids)
+
+        scraped = sorted([i.args[0] for i in mocked_scrape_records_for_shard.call_args_list])
+        self.assertEqual(sorted(shard_ids), scraped)
+
+    @patch('includes.kinesis_client.Client._scrape_records_for_shard', spec_set=kinesis.Client._scrape_records_for_shard)
+    def test_failed_shard_isolated(self, mocked_scrape_records_for_shard):
+        def scrape(shard_id):
+            if shard_id == "shardId-3":
+                raise exceptions.AwsUnexpectedResponse("boom")
+
+        mocked_scrape_records_for_shard.side_effect = scrape
+        shard_ids = [f"shardId-{i}" for i in range(6)]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(exceptions.ShardScrapeError) as ex:
+            client._scrape_shards(shard_ids)
+
+        # Every other shard must still have been scraped despite the failure
+        self.assertEqual(6, mocked_scrape_records_for_shard.call_count)
+        self.assertIn("1 of 6 shards failed to scrape. Failed shards: shardId-3: AwsUnexpectedResponse('boom')",
+                      str(ex.exception))
+
+    @patch('includes.kinesis_client.Client._scrape_records_for_shard', spec_set=kinesis.Client._scrape_records_for_shard)
+    def test_children_after_parents(self, mocked_scrape_records_for_shard):
+        events = []
+        lock = threading.Lock()
+
+        def scrape(shard_id):
+            with lock:
+                events.append(f"start {shard_id}")
+            with lock:
+                events.append(f"end {shard_id}")
+
+        mocked_scrape_records_for_shard.side_effect = scrape
+        shard_lineage = lineage.ShardLineage({"shardId-0": [], "shardId-1": ["shardId-0"],
+                                              "shardId-2": ["shardId-0"], "shardId-3": ["shardId-1", "shardId-2"],
+                                              "shardId-9": []})
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_shards(shard_lineage.shard_ids, shard_lineage)
+
+        self.assertEqual(10, len(events))
+        for shard_id in shard_lineage.shard_ids:
+            for parent in shard_lineage.parents(shard_id):
+                self.assertLess(events.index(f"end {parent}"), events.index(f"start {shard_id}"))
+
+    @patch('includes.kinesis_client.Client._scrape_records_for_shard', spec_set=kinesis.Client._scrape_records_for_shard)
+    def test_failed_parent_skips_children(self, mocked_scrape_records_for_shard):
+        def scrape(shard_id):
+            if shard_id == "shardId-0":
+                raise exceptions.AwsUnexpectedResponse("boom")
+
+        mocked_scrape_records_for_shard.side_effect = scrape
+        shard_lineage = lineage.ShardLineage({"shardId-0": [], "shardId-1": ["shardId-0"], "shardId-9": []})
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(exceptions.ShardScrapeError) as ex:
+            client._scrape_shards(shard_lineage.shard_ids, shard_lineage)
+
+        self.assertEqual(["shardId-0", "shardId-9"],
+                         sorted([i.args[0] for i in mocked_scrape_records_for_shard.call_args_list]))
+        self.assertIn("2 of 3 shards failed to scrape", str(ex.exception))
+        self.assertIn("shardId-1: ShardScrapeError('Not scraped, as its parent shard shardId-0 failed to scrape')",
+                      str(ex.exception))
+
+    @patch('includes.kinesis_client.Client._new_boto_client', spec_set=kinesis.Client._new_boto_client)
+    def test_boto_client_per_worker(self, mocked_new_boto_client):
+        mocked_new_boto_client.side_effect = lambda: mock.Mock(spec=botocore.client.BaseClient)
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+
+        # The main thread keeps using the configured client
+        self.assertIs(self.boto_client, client._boto_client())
+
+        def worker_clients():
+            return client._boto_client(), client._boto_client()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            first, second = executor.submit(worker_clients).result()
+        self.assertIs(first, second)
+        self.assertIsNot(self.boto_client, first)
+        self.assertEqual(1, mocked_new_boto_client.call_count)
+
+    def test_new_boto_client_from_factory(self):
+        worker_client = mock.Mock(spec=botocore.client.BaseClient)
+        factory = mock.Mock(return_value=worker_client)
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client, boto_client_factory=factory))
+        self.assertIs(worker_client, client._new_boto_client())
+        self.assertIs(factory, client._client_config.derive(shard_ids=["shardId-1"]).boto_client_factory)
+
+        factory.return_value = "not a client"
+        with self.assertRaises(exceptions.InvalidArgumentException):
+            client._new_boto_client()
+
+    def test_invalid_boto_client_factory(self):
+        with self.assertRaises(exceptions.InvalidArgumentException):
+            kinesis.ClientConfig(self.config_input, self.boto_client, boto_client_factory="kinesis")
+
+    @mock.patch.dict(os.environ, {'AWS_ACCESS_KEY_ID': 'AKIDEXAMPLE', 'AWS_SECRET_ACCESS_KEY': 'secret'})
+    def test_new_boto_client_copies_configured_client(self):
+        configured_client = boto3.session.Session().client(
+            'kinesis', region_name='eu-west-1', endpoint_url='http://localhost:4566',
+            config=botocore.config.Config(read_timeout=7))
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, configured_client))
+
+        worker_client = client._new_boto_client()
+        self.assertIsNot(configured_client, worker_client)
+        self.assertEqual('eu-west-1', worker_client.meta.region_name)
+        self.assertEqual('http://localhost:4566', worker_client.meta.endpoint_url)
+        self.assertEqual(7, worker_client.meta.config.read_timeout)
+
+
+class TestRecordsPipeline(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': [],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "TOTAL_RECORDS_PER_SHARD",
+            'total_records_per_shard': 12,
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 5,
+            'pipeline_queue_size': 2,
+        }
+
+    def tearDown(self):
+        pass
+
+    @patch('includes.record_store.FileRecordWriter.write', spec_set=record_store.FileRecordWriter.write)
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_records_written_by_pipeline(self, mocked_shard_iterator, mocked_get_records,
+                                         mocked_writer_write):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.side_effect = [
+            generate_Boto3GetRecordsResponse(5, iterator="iter1"),
+            generate_Boto3GetRecordsResponse(0, iterator="iter2"),
+            generate_Boto3GetRecordsResponse(10, iterator="iter3"),
+        ]
+        writer_threads = []
+        mocked_writer_write.side_effect = \
+            lambda encoded: writer_threads.append(threading.current_thread().name)
+
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+
+        written = [len(i.args[0]) for i in mocked_writer_write.call_args_list]
+        self.assertEqual([5, 7], written)
+        self.assertEqual(["pipeline-shardId-000001-stage1"] * 2, writer_threads)
+        self.assertEqual({}, client._pipelines)
+
+    @patch('includes.record_store.FileRecordWriter.write', spec_set=record_store.FileRecordWriter.write)
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_write_failure_raised(self, mocked_shard_iterator, mocked_get_records, mocked_writer_write):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.side_effect = [generate_Boto3GetRecordsResponse(12, iterator="iter1")]
+        mocked_writer_write.side_effect = OSError("disk full")
+
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(exceptions.InternalError) as ex:
+            client._scrape_records_for_shard("shardId-000001")
+        self.assertIn("Pipeline pipeline-shardId-000001 stage failed: OSError('disk full')", str(ex.exception))
+
+
+class TestCheckpointResume(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.boto_client.get_shard_iterator = mock.Mock(return_value={'ShardIterator': 'the_iter_id'})
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': [],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "TOTAL_RECORDS_PER_SHARD",
+            'total_records_per_shard': 9,
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 5,
+            'checkpoint_interval': 1,
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def get_records_response(start: int, count: int) -> kinesis.Boto3GetRecordsResponse:
+        return kinesis.Boto3GetRecordsResponse({
+            "Records": [generate_record_obj(generate_record_raw_dict(sequence_number=str(i)))
+                        for i in range(start, start + count)],
+            "MillisBehindLatest": 0,
+            "NextShardIterator": f"iter{start}"
+        })
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    def test_resume_after_failure(self, mocked_get_records):
+        mocked_get_records.side_effect = [
+            self.get_records_response(0, 3),
+            self.get_records_response(3, 3),
+            exceptions.AwsUnexpectedResponse("connection lost"),
+        ]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(exceptions.AwsUnexpectedResponse):
+            client._scrape_records_for_shard("shardId-000001")
+
+        saved = client._checkpoint_store.load("shardId-000001")
+        self.assertEqual("5", saved.sequence_number)
+        self.assertEqual(6, saved.record_count)
+        self.assertFalse(saved.completed)
+
+        mocked_get_records.side_effect = [self.get_records_response(6, 5)]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+
+        self.boto_client.get_shard_iterator.assert_called_with(StreamName="user_activities",
+                                                               ShardId="shardId-000001",
+                                                               ShardIteratorType="AFTER_SEQUENCE_NUMBER",
+                                                               StartingSequenceNumber="5")
+        # The resumed shard continues counting towards total_records_per_shard from the checkpoint
+        self.assertEqual(9, len(os.listdir("scraped_events/shardId-000001")))
+        saved = client._checkpoint_store.load("shardId-000001")
+        # The last record read, even though records over total_records_per_shard are not written
+        self.assertEqual("10", saved.sequence_number)
+        self.assertTrue(saved.completed)
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    def test_filtered_tail_checkpointed_as_read(self, mocked_get_records):
+        self.config_input['record_filter'] = {'partition_key_pattern': '^keep$'}
+        mocked_get_records.side_effect = [
+            kinesis.Boto3GetRecordsResponse({
+                "Records": [generate_record_raw_dict(sequence_number=str(i), pkey=pkey)
+                            for i, pkey in enumerate(["keep", "keep", "drop"])],
+                "MillisBehindLatest": 0,
+                "NextShardIterator": "iter1"
+            }),
+            exceptions.AwsUnexpectedResponse("connection lost"),
+        ]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(exceptions.AwsUnexpectedResponse):
+            client._scrape_records_for_shard("shardId-000001")
+
+        saved = client._checkpoint_store.load("shardId-000001")
+        self.assertEqual(("2", 3, 2), (saved.sequence_number, saved.total_found_records, saved.record_count))
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    def test_completed_shard_skipped(self, mocked_get_records):
+        mocked_get_records.side_effect = [self.get_records_response(0, 9)]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+        client._scrape_records_for_shard("shardId-000001")
+
+        self.assertEqual(1, mocked_get_records.call_count)
+        self.assertEqual(1, self.boto_client.get_shard_iterator.call_count)
+
+    @patch('includes.kinesis_client.Client._scrape_shards', spec_set=kinesis.Client._scrape_shards)
+    def test_existing_dir_without_checkpoint_refused(self, mocked_scrape_shards):
+        self.boto_client.list_shards = mock.Mock(return_value={'Shards': [generate_shard_raw_dict('shardId-000001')]})
+        os.makedirs("scraped_events/shardId-000001")
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        # An empty directory holds nothing to duplicate
+        client.begin_scraping()
+
+        with open("scraped_events/shardId-000001/0-5.json", "w") as f:
+            f.write("{}")
+        with self.assertRaises(FileExistsError):
+            client.begin_scraping()
+        self.assertEqual(1, mocked_scrape_shards.call_count)
+
+        tracker = checkpoint.CheckpointTracker(client._checkpoint_store, "shardId-000001", 1)
+        tracker.batch_written(sequence_number="5", total_found_records=1, record_count=1, output_position=None)
+        client.begin_scraping()
+        self.assertEqual(2, mocked_scrape_shards.call_count)
+
+
+class TestExpiredIterator(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.boto_client.get_shard_iterator = mock.Mock(return_value={'ShardIterator': 'renewed_iter'})
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': [],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "TOTAL_RECORDS_PER_SHARD",
+            'total_records_per_shard': 5,
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 5,
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def client_error(code: str) -> botocore.exceptions.ClientError:
+        return botocore.exceptions.ClientError({'Error': {'Code': code, 'Message': 'Iterator expired'}},
+                                               'GetRecords')
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_renewed_after_last_sequence_number(self, mocked_shard_iterator, mocked_get_records):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.side_effect = [
+            TestCheckpointResume.get_records_response(0, 3),
+            self.client_error('ExpiredIteratorException'),
+            TestCheckpointResume.get_records_response(3, 2),
+        ]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+
+        self.boto_client.get_shard_iterator.assert_called_once_with(StreamName="user_activities",
+                                                                    ShardId="shardId-000001",
+                                                                    ShardIteratorType="AFTER_SEQUENCE_NUMBER",
+                                                                    StartingSequenceNumber="2")
+        self.assertEqual([call('the_iter_id', shard_id='shardId-000001'), call('iter0', shard_id='shardId-000001'),
+                          call('renewed_iter', shard_id='shardId-000001')],
+                         mocked_get_records.call_args_list)
+        self.assertEqual(5, len(os.listdir("scraped_events/shardId-000001")))
+        self.assertEqual({}, client._last_sequence_numbers)
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_renewed_from_starting_position(self, mocked_shard_iterator, mocked_get_records):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.side_effect = [
+            self.client_error('ExpiredIteratorException'),
+            TestCheckpointResume.get_records_response(0, 5),
+        ]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+
+        self.boto_client.get_shard_iterator.assert_called_once_with(StreamName="user_activities",
+                                                                    ShardId="shardId-000001",
+                                                                    ShardIteratorType="TRIM_HORIZON")
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_other_client_errors_raised(self, mocked_shard_iterator, mocked_get_records):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.side_effect = [self.client_error('AccessDeniedException')]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(botocore.exceptions.ClientError):
+            client._scrape_records_for_shard("shardId-000001")
+        self.boto_client.get_shard_iterator.assert_not_called()
+
+
+class TestPollMode(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': [],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "LATEST",
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 5,
+        }
+        self.throttled = botocore.exceptions.ClientError(
+            {'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Rate exceeded'}}, 'GetRecords')
+
+    def tearDown(self):
+        pass
+
+    @patch('time.sleep')
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    def test_adaptive_retries_throttled(self, mocked_get_records, mocked_sleep):
+        self.config_input['poll_mode'] = 'adaptive'
+        response = generate_Boto3GetRecordsResponse(0, iterator="iter1")
+        mocked_get_records.side_effect = [self.throttled, self.throttled, response]
+
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        self.assertIs(response, client._poll_records('the_iter_id', 'shardId-000001'))
+        self.assertEqual([call('the_iter_id', shard_id='shardId-000001')] * 3, mocked_get_records.call_args_list)
+        self.assertEqual(1.5, client._poll_controller('shardId-000001').calls_per_second)
+
+    @patch('time.sleep')
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    def test_adaptive_raises_throttled_after_max_retries(self, mocked_get_records, mocked_sleep):
+        self.config_input['poll_mode'] = 'adaptive'
+        mocked_get_records.side_effect = [self.throttled] * (poll_controller.MAX_THROTTLED_RETRIES + 2)
+
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(botocore.exceptions.ClientError) as ex:
+            client._poll_records('the_iter_id', 'shardId-000001')
+        self.assertEqual('ProvisionedThroughputExceededException', ex.exception.response['Error']['Code'])
+        self.assertEqual(poll_controller.MAX_THROTTLED_RETRIES + 1, mocked_get_records.call_count)
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    def test_fixed_raises_throttled(self, mocked_get_records):
+        mocked_get_records.side_effect = [self.throttled]
+
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(botocore.exceptions.ClientError):
+            client._poll_records('the_iter_id', 'shardId-000001')
+
+
+class TestGetRecords(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        # Boto3GetRecordsResponse re-packs the Records of the response it is given, so every call needs a new dict
+        self.boto_client.get_records = mock.Mock(side_effect=lambda **kwargs: {
+            "Records": [generate_record_raw_dict(data=b"0123456789", pkey="pkey") for i in range(3)],
+            "NextShardIterator": "iter1",
+            "MillisBehindLatest": 0
+        })
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': [],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "LATEST",
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 5,
+            'shard_read_bytes_per_second': 1000,
+        }
+
+    def tearDown(self):
+        pass
+
+    @patch('includes.read_budget.ReadBudget.after_call', autospec=True)
+    @patch('includes.read_budget.ReadBudget.before_call', autospec=True)
+    def test_response_bytes_charged(self, mocked_before_call, mocked_after_call):
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._get_records('the_iter_id', shard_id='shardId-000001')
+        mocked_before_call.assert_called_once_with(client._read_budget, 'shardId-000001')
+        mocked_after_call.assert_called_once_with(client._read_budget, 'shardId-000001', 42)
+
+    @patch('includes.read_budget.ReadBudget.before_call', autospec=True)
+    def test_disabled_by_default(self, mocked_before_call):
+        del self.config_input['shard_read_bytes_per_second']
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._get_records('the_iter_id', shard_id='shardId-000001')
+        mocked_before_call.assert_not_called()
+
+    def test_adaptive_limit(self):
+        self.config_input['poll_target_bytes'] = 4200
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._get_records('the_iter_id', shard_id='shardId-000001')
+        client._get_records('iter1', shard_id='shardId-000001')
+        # 14 bytes per record returned by the first call
+        self.assertEqual([call(ShardIterator='the_iter_id', Limit=100), call(ShardIterator='iter1', Limit=300)],
+                         self.boto_client.get_records.call_args_list)
+
+
+class TestStopAtLatest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': [],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "LATEST",
+            'poll_batch_size': 10,
+            'poll_delay': 0,
+            'max_empty_polls': 2000,
+            'stop_at_latest': True,
+        }
+
+    def tearDown(self):
+        pass
+
+    @staticmethod
+    def response(count: int, millis_behind_latest: int) -> kinesis.Boto3GetRecordsResponse:
+        return kinesis.Boto3GetRecordsResponse({
+            "Records": generate_records(count),
+            "NextShardIterator": uuid.uuid4().hex,
+            "MillisBehindLatest": millis_behind_latest
+        })
+
+    @patch('includes.kinesis_client.Client._process_records', autospec=True)
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_stops_on_short_caught_up_response(self, mocked_shard_iterator, mocked_get_records,
+                                               mocked_process_records):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.side_effect = [
+            self.response(10, 0),
+            self.response(0, 5000),
+            self.response(10, 2000),
+            self.response(4, 0),
+            self.response(10, 0),
+        ]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+
+        # A full response at MillisBehindLatest 0 may still be followed by more records
+        self.assertEqual(4, mocked_get_records.call_count)
+        self.assertEqual([10, 10, 4], [len(i.args[2]) for i in mocked_process_records.call_args_list])
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_stops_on_empty_caught_up_response(self, mocked_shard_iterator, mocked_get_records):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.side_effect = [self.response(0, 86400000), self.response(0, 0), self.response(0, 0)]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+        self.assertEqual(2, mocked_get_records.call_count)
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_disabled_by_default(self, mocked_shard_iterator, mocked_get_records):
+        del self.config_input['stop_at_latest']
+        self.config_input['max_empty_polls'] = 3
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.side_effect = [self.response(0, 0)] * 3
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+        self.assertEqual(3, mocked_get_records.call_count)
+
+
+class TestClosedShard(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.boto_client.get_shard_iterator = mock.Mock(return_value={'ShardIterator': 'position-0'})
+        # A closed shard returns no NextShardIterator once read to its end
+        self.boto_client.get_records = mock.Mock(side_effect=[
+            {'Records': [generate_record_raw_dict(sequence_number=str(i)) for i in range(2)],
+             'MillisBehindLatest': 0, 'NextShardIterator': 'position-2'},
+            {'Records': [generate_record_raw_dict(sequence_number="2")], 'MillisBehindLatest': 0},
+        ])
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': ["shardId-000001"],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "LATEST",
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 5,
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_read_to_its_end(self):
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+
+        self.assertEqual(2, self.boto_client.get_records.call_count)
+        sequence_numbers = []
+        for file_name in os.listdir("scraped_events/shardId-000001"):
+            with open(f"scraped_events/shardId-000001/{file_name}") as f:
+                sequence_numbers.append(json.load(f)['SequenceNumber'])
+        self.assertEqual(["0", "1", "2"], sorted(sequence_numbers))
+
+
+class TestEndingBoundary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': ["shardId-000001"],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "AT_SEQUENCE_NUMBER",
+            'ending_sequence_number': "12",
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 5,
+        }
+
+    def tearDown(self):
+        pass
+
+    @patch('includes.kinesis_client.Client._process_records', autospec=True)
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_trimmed_and_stopped(self, mocked_shard_iterator, mocked_get_records, mocked_process_records):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.side_effect = [
+            TestCheckpointResume.get_records_response(0, 10),
+            TestCheckpointResume.get_records_response(10, 10),
+            TestCheckpointResume.get_records_response(20, 10),
+        ]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+
+        self.assertEqual(2, mocked_get_records.call_count)
+        written = [[i.SequenceNumber for i in j.args[2]] for j in mocked_process_records.call_args_list]
+        self.assertEqual([[str(i) for i in range(10)], ["10", "11", "12"]], written)
+
+    @patch('includes.kinesis_client.Client._process_records', autospec=True)
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_records_past_boundary_logged(self, mocked_shard_iterator, mocked_get_records, mocked_process_records):
+        # Records dropped by the record filter are not past the ending position
+        self.config_input['record_filter'] = {'partition_key_pattern': '^none$'}
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.side_effect = [TestCheckpointResume.get_records_response(10, 10)]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertLogs('includes.kinesis_client', level='INFO') as logs:
+            client._scrape_records_for_shard("shardId-000001")
+
+        self.assertIn('Reached ending_position AT_SEQUENCE_NUMBER for shard shardId-000001, 7 records of the last '
+                      'batch were past it', '\n'.join(logs.output))
+        mocked_process_records.assert_not_called()
+
+
+class FakeShard:
+    """Serves get_shard_iterator() and get_records() calls from a list of records with sequence numbers 100 and up."""
+
+    def __init__(self, timestamps: list, *, closed: bool = False):
+        self.records = [generate_record_raw_dict(sequence_number=str(100 + i), timestamp=timestamp)
+                        for i, timestamp in enumerate(timestamps)]
+        self.closed = closed
+
+    def boto_client(self) -> mock.Mock:
+        boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        boto_client.get_shard_iterator = mock.Mock(side_effect=self.get_shard_iterator)
+        boto_client.get_records = mock.Mock(side_effect=self.get_records)
+        return boto_client
+
+    def get_shard_iterator(self, *, StreamName, ShardId, ShardIteratorType, Timestamp=None,
+                           StartingSequenceNumber=None):
+        if ShardIteratorType == 'AT_TIMESTAMP':
+            timestamp = datetime.datetime.fromisoformat(Timestamp)
+            position = len([i for i in self.records if i['ApproximateArrivalTimestamp'] < timestamp])
+        else:
+            position = [i['SequenceNumber'] for i in self.records].index(StartingSequenceNumber)
+        return {'ShardIterator': f'position-{position}'}
+
+    def get_records(self, *, ShardIterator, Limit):
+        position = int(ShardIterator.split('-')[1])
+        records = [dict(i) for i in self.records[position:position + Limit]]
+        at_end = position + len(records) == len(self.records)
+        if self.closed:
+            # A closed shard is behind the tip of the stream, and has no next iterator once read to its end
+            response = {'Records': records, 'MillisBehindLatest': 60000}
+            if not at_end:
+                response['NextShardIterator'] = f'position-{position + len(records)}'
+            return response
+        return {
+            'Records': records,
+            'MillisBehindLatest': 0 if at_end else 60000,
+            'NextShardIterator': f'position-{position + len(records)}',
+        }
+
+
+class TestTimestampSlices(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.shard = FakeShard([datetime.datetime(2023, 1, 1) + datetime.timedelta(seconds=10 * i)
+                                for i in range(30)])
+        self.boto_client = self.shard.boto_client()
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': ["shardId-000001"],
+            'starting_position': "AT_TIMESTAMP",
+            'starting_timestamp': "2023-01-01 00:00:00",
+            'ending_position': "BEFORE_TIMESTAMP",
+            'ending_timestamp': "2023-01-01 00:05:00",
+            'poll_batch_size': 7,
+            'poll_delay': 0,
+            'max_empty_polls': 2,
+            'timestamp_slices': 3,
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    @patch('includes.kinesis_client.Client._new_boto_client', spec_set=kinesis.Client._new_boto_client)
+    def test_slices_stitched_in_order(self, mocked_new_boto_client):
+        mocked_new_boto_client.return_value = self.boto_client
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard("shardId-000001")
+
+        # Each slice ends right before the first record of the next one
+        self.boto_client.get_shard_iterator.assert_any_call(StreamName="user_activities",
+                                                            ShardId="shardId-000001",
+                                                            ShardIteratorType="AT_SEQUENCE_NUMBER",
+                                                            StartingSequenceNumber="110")
+        self.boto_client.get_shard_iterator.assert_any_call(StreamName="user_activities",
+                                                            ShardId="shardId-000001",
+                                                            ShardIteratorType="AT_SEQUENCE_NUMBER",
+                                                            StartingSequenceNumber="120")
+        # The slice output was moved into place and removed
+        self.assertEqual(["shardId-000001"], os.listdir("scraped_events"))
+        file_names = os.listdir("scraped_events/shardId-000001")
+        sequence_numbers = {}
+        for file_name in file_names:
+            with open(f"scraped_events/shardId-000001/{file_name}") as f:
+                sequence_numbers[int(file_name.split('-')[0])] = json.load(f)['SequenceNumber']
+        self.assertEqual({i + 1: str(100 + i) for i in range(30)}, sequence_numbers)
+
+    @patch('includes.kinesis_client.Client._new_boto_client', spec_set=kinesis.Client._new_boto_client)
+    def test_failed_slice_raised(self, mocked_new_boto_client):
+        mocked_new_boto_client.return_value = self.boto_client
+        def get_records(**kwargs):
+            # Fails the second batch of the second slice
+            if kwargs['ShardIterator'] == 'position-17':
+                raise exceptions.AwsUnexpectedResponse("connection lost")
+            return self.shard.get_records(**kwargs)
+
+        self.boto_client.get_records.side_effect = get_records
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(exceptions.ShardScrapeError) as ex:
+            client._scrape_records_for_shard("shardId-000001")
+
+        self.assertIn("1 of 3 timestamp slices of shard shardId-000001 failed to scrape", str(ex.exception))
+        self.assertFalse(os.path.exists("scraped_events/shardId-000001"))
+        self.assertFalse(os.path.exists("scraped_events/.slices-shardId-000001"))
+
+
+class TestLocate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        # Three records per second at 00:00:00-00:00:09, then a gap, then three per second at 00:10:00-00:10:09
+        start = datetime.datetime(2023, 1, 1)
+        self.shard = FakeShard([start + datetime.timedelta(minutes=10 * j, seconds=i)
+                                for j in range(2) for i in range(10) for _ in range(3)])
+        self.boto_client = self.shard.boto_client()
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': ["shardId-000001"],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "LATEST",
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 2,
+        }
+
+    def tearDown(self):
+        pass
+
+    def test_window(self):
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        windows = client.locate("2023-01-01 00:00:05", "2023-01-01 00:10:02")
+
+        window = windows["shardId-000001"]
+        self.assertEqual("115", window.first_sequence_number)
+        self.assertEqual("135", window.last_sequence_number)
+        # Binary searching takes far fewer reads than the records in the window
+        self.assertLess(self.boto_client.get_records.call_count, 15)
+        self.assertEqual({'shard_ids': ["shardId-000001"],
+                          'starting_position': 'AT_SEQUENCE_NUMBER',
+                          'starting_sequence_number': "115",
+                          'ending_position': 'AT_SEQUENCE_NUMBER',
+                          'ending_sequence_number': "135"}, window.config_overrides())
+
+    def test_window_up_to_tip(self):
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        window = client.locate("2023-01-01 00:10:08")["shardId-000001"]
+        self.assertEqual("154", window.first_sequence_number)
+        self.assertEqual("159", window.last_sequence_number)
+
+    def test_empty_window(self):
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        window = client.locate("2023-01-01 00:01:00", "2023-01-01 00:10:00")["shardId-000001"]
+        self.assertTrue(window.empty)
+        self.assertIsNone(window.last_sequence_number)
+
+    def test_invalid_window(self):
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        with self.assertRaises(exceptions.InvalidArgumentException):
+            client.locate("2023-01-01 00:10:00", "2023-01-01 00:10:00")
+
+    def test_closed_shard(self):
+        self.shard.closed = True
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        window = client.locate("2023-01-01 00:10:08", "2023-01-01 00:20:00")["shardId-000001"]
+        self.assertEqual("154", window.first_sequence_number)
+        self.assertEqual("159", window.last_sequence_number)
+        self.assertTrue(client.locate("2023-01-01 00:11:00", "2023-01-01 00:20:00")["shardId-000001"].empty)
+
+    def test_all_shards_listed_at_start_timestamp(self):
+        # The shards are listed from the start of the window, not from the configured starting_position
+        self.config_input['shard_ids'] = []
+        self.config_input['starting_position'] = "LATEST"
+        self.boto_client.list_shards = mock.Mock(return_value={'Shards': [generate_shard_raw_dict('shardId-000001')]})
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        windows = client.locate("2023-01-01 00:00:05", "2023-01-01 00:10:02")
+
+        self.assertEqual(["shardId-000001"], list(windows.keys()))
+        self.assertEqual("115", windows["shardId-000001"].first_sequence_number)
+        self.boto_client.list_shards.assert_called_once_with(
+            StreamName="user_activities", ShardFilter={'Type': 'AT_TIMESTAMP', 'Timestamp': "2023-01-01 00:00:05"})
+
+
+class TestListShards(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.boto_client.list_shards = mock.Mock(side_effect=[
+            {'Shards': [generate_shard_raw_dict('shardId-0', ending_sequence_number="200"),
+                        generate_shard_raw_dict('shardId-1', ending_sequence_number="300")],
+             'NextToken': 'page-2'},
+            {'Shards': [generate_shard_raw_dict('shardId-2', parent_shard_id='shardId-0')]},
+        ])
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': [],
+            'starting_position': "AT_TIMESTAMP",
+            'starting_timestamp': "2022-12-01 00:00:00",
+            'ending_position': "LATEST",
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 5,
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_paginated_and_filtered(self):
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        self.assertEqual(['shardId-0', 'shardId-1', 'shardId-2'], client._get_shard_ids_of_stream())
+        self.assertEqual([call(StreamName="user_activities",
+                               ShardFilter={'Type': 'AT_TIMESTAMP', 'Timestamp': "2022-12-01 00:00:00"}),
+                          call(NextToken='page-2')], self.boto_client.list_shards.call_args_list)
+        self.assertFalse(os.path.exists("shard_maps"))
+
+    def test_configured_shard_ids_not_filtered(self):
+        self.config_input['shard_ids'] = ['shardId-2']
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._get_shard_ids_of_stream()
+        self.boto_client.list_shards.assert_any_call(StreamName="user_activities")
+
+    def test_cached(self):
+        self.config_input['shard_map_cache_ttl'] = 60
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        shards = client._list_shards()
+        self.assertEqual(shards, client._list_shards())
+        self.assertEqual(2, self.boto_client.list_shards.call_count)
+        self.assertEqual('shardId-0', shards[2].parent_shard_id)
+        self.assertTrue(shards[0].closed)
+
+        # A different filter is listed again
+        self.config_input['starting_position'] = "TRIM_HORIZON"
+        self.boto_client.list_shards.side_effect = [{'Shards': [generate_shard_raw_dict('shardId-2')]}]
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        self.assertEqual(['shardId-2'], client._get_shard_ids_of_stream())
+
+
+class TestPartitionKeys(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        # md5("a") falls in the lower half of the hash key space, md5("b") in the upper half
+        self.boto_client.list_shards = mock.Mock(return_value={'Shards': [
+            generate_shard_raw_dict('shardId-0', hash_key_range=(0, 2 ** 127 - 1)),
+            generate_shard_raw_dict('shardId-1', hash_key_range=(2 ** 127, 2 ** 128 - 1)),
+        ]})
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': [],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "LATEST",
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 1,
+            'partition_keys': ["b"],
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    @patch('includes.kinesis_client.Client._scrape_shards', spec_set=kinesis.Client._scrape_shards)
+    def test_owning_shards_scraped(self, mocked_scrape_shards):
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client.begin_scraping()
+        self.assertEqual(["shardId-1"], mocked_scrape_shards.call_args.args[0])
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_records_filtered(self, mocked_shard_iterator, mocked_get_records):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.return_value = kinesis.Boto3GetRecordsResponse({
+            "Records": [generate_record_obj(generate_record_raw_dict(sequence_number=str(i), pkey=pkey))
+                        for i, pkey in enumerate(["a", "b", "c", "b"])],
+            "MillisBehindLatest": 0,
+            "NextShardIterator": "iter2",
+        })
+        self.config_input['partition_key_filter'] = True
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        result = client._scrape_records_for_shard_iterator(kinesis.GetRecordsIterationInput(
+            total_found_records=0, response_no_records=0, loop_count=0, shard_iterator='the_iter_id',
+            shard_id="shardId-1"))
+
+        self.assertEqual(4, result.total_found_records)
+        sequence_numbers = []
+        for file_name in sorted(os.listdir("scraped_events/shardId-1")):
+            with open(f"scraped_events/shardId-1/{file_name}") as f:
+                sequence_numbers.append(json.load(f)['SequenceNumber'])
+        self.assertEqual(["1", "3"], sequence_numbers)
@@ -141,14 +141,14 @@ class ClientConfig(unittest.TestCase):
         with self.assertRaises(exceptions.ConfigValidationError) as ex:
             kinesis.ClientConfig(self.config_input, self.boto_client)
         self.assertIn("config-kinesis_scraper.yaml: If \"starting_position\" is *_SEQUENCE_NUMBER, the value must be "
-                      "a positive numeric string, float or an integer.\nValue provided: <class 'dict'> {}",
+                      "a positive numeric string or an integer.\nValue provided: <class 'dict'> {}",
                       str(ex.exception))
         self.config_input["starting_position"] = "AT_SEQUENCE_NUMBER"
         self.config_input["starting_sequence_number"] = "abc"
         with self.assertRaises(exceptions.ConfigValidationError) as ex:
             kinesis.ClientConfig(self.config_input, self.boto_client)
         self.assertIn("config-kinesis_scraper.yaml: If \"starting_position\" is *_SEQUENCE_NUMBER, the value must be "
-                      "a positive numeric string, float or an integer.\nValue provided: <class 'str'> 'abc'",
+                      "a positive numeric string or an integer.\nValue provided: <class 'str'> 'abc'",
                       str(ex.exception))
 
     def test_invalid_starting_before_sequence_number_type(self):
@@ -157,7 +157,7 @@ class ClientConfig(unittest.TestCase):
         with self.assertRaises(exceptions.ConfigValidationError) as ex:
             kinesis.ClientConfig(self.config_input, self.boto_client)
         self.assertIn("config-kinesis_scraper.yaml: If \"starting_position\" is *_SEQUENCE_NUMBER, the value must be "
-                      "a positive numeric string, float or an integer.\nValue provided: <class 'dict'> {}",
+                      "a positive numeric string or an integer.\nValue provided: <class 'dict'> {}",
                       str(ex.exception))
 
     def test_invalid_ending_at_timestamp_type(self):
@@ -196,14 +196,14 @@ class ClientConfig(unittest.TestCase):
         with self.assertRaises(exceptions.ConfigValidationError) as ex:
             kinesis.ClientConfig(self.config_input, self.boto_client)
         self.assertIn("config-kinesis_scraper.yaml: If \"ending_position\" is *_SEQUENCE_NUMBER, the value must be "
-                      "a positive numeric string, float or an integer.\nValue provided: <class 'dict'> {}",
+                      "a positive numeric string or an integer.\nValue provided: <class 'dict'> {}",
                       str(ex.exception))
         self.config_input["ending_position"] = "AT_SEQUENCE_NUMBER"
         self.config_input["ending_sequence_number"] = "abc"
         with self.assertRaises(exceptions.ConfigValidationError) as ex:
             kinesis.ClientConfig(self.config_input, self.boto_client)
         self.assertIn("config-kinesis_scraper.yaml: If \"ending_position\" is *_SEQUENCE_NUMBER, the value must be "
-                      "a positive numeric string, float or an integer.\nValue provided: <class 'str'> 'abc'",
+                      "a positive numeric string or an integer.\nValue provided: <class 'str'> 'abc'",
                       str(ex.exception))
 
     def test_invalid_ending_before_sequence_number_type(self):
@@ -212,14 +212,14 @@ class ClientConfig(unittest.TestCase):
         with self.assertRaises(exceptions.ConfigValidationError) as ex:
             kinesis.ClientConfig(self.config_input, self.boto_client)
         self.assertIn("config-kinesis_scraper.yaml: If \"ending_position\" is *_SEQUENCE_NUMBER, the value must be "
-                      "a positive numeric string, float or an integer.\nValue provided: <class 'dict'> {}",
+                      "a positive numeric string or an integer.\nValue provided: <class 'dict'> {}",
                       str(ex.exception))
         self.config_input["ending_position"] = "BEFORE_SEQUENCE_NUMBER"
         self.config_input["ending_sequence_number"] = "abc"
         with self.assertRaises(exceptions.ConfigValidationError) as ex:
             kinesis.ClientConfig(self.config_input, self.boto_client)
         self.assertIn("config-kinesis_scraper.yaml: If \"ending_position\" is *_SEQUENCE_NUMBER, the value must be "
-                      "a positive numeric string, float or an integer.\nValue provided: <class 'str'> 'abc'",
+                      "a positive numeric string or an integer.\nValue provided: <class 'str'> 'abc'",
                       str(ex.exception))
 
     def test_invalid_ending_after_sequence_number_type(self):
@@ -228,14 +228,14 @@ class ClientConfig(unittest.TestCase):
         with self.assertRaises(exceptions.ConfigValidationError) as ex:
             kinesis.ClientConfig(self.config_input, self.boto_client)
         self.assertIn("config-kinesis_scraper.yaml: If \"ending_position\" is *_SEQUENCE_NUMBER, the value must be "
-                      "a positive numeric string, float or an integer.\nValue provided: <class 'dict'> {}",
+                      "a positive numeric string or an integer.\nValue provided: <class 'dict'> {}",
                       str(ex.exception))
         self.config_input["ending_position"] = "AFTER_SEQUENCE_NUMBER"
         self.config_input["ending_sequence_number"] = "abc"
         with self.assertRaises(exceptions.ConfigValidationError) as ex:
             kinesis.ClientConfig(self.config_input, self.boto_client)
         self.assertIn("config-kinesis_scraper.yaml: If \"ending_position\" is *_SEQUENCE_NUMBER, the value must be "
-                      "a positive numeric string, float or an integer.\nValue provided: <class 'str'> 'abc'",
+                      "a positive numeric string or an integer.\nValue provided: <class 'str'> 'abc'",
                       str(ex.exception))
 
     def test_valid_validate_shard_ids_none_void(self):
@@ -435,10 +435,10 @@ class ClientConfig(unittest.TestCase):
                       "string, or an integer.\nValue provided: <class 'str'> 'abc'", str(ex.exception))
 
     def test_poll_batch_size_invalid_over_max(self):
-        self.config_input["poll_batch_size"] = 501
+        self.config_input["poll_batch_size"] = 10001
         with self.assertRaises(exceptions.ConfigValidationError) as ex:
             kinesis.ClientConfig(self.config_input, self.boto_client)
-        self.assertEqual("config-kinesis_scraper.yaml: poll_batch_size cannot exceed 500", str(ex.exception))
+        self.assertEqual("config-kinesis_scraper.yaml: poll_batch_size cannot exceed 10000", str(ex.exception))
 
     def test_max_empty_polls_invalid_string(self):
         self.config_input["max_empty_polls"] = "abc"
@@ -480,3 +480,136 @@ class ClientConfig(unittest.TestCase):
             kinesis.ClientConfig(self.config_input, self.boto_client)
         self.assertIn("If config-kinesis_scraper.yaml: \"poll_delay\" must be a positive numeric "
                       "string, a float, or an integer.\nValue provided: <class 'int'> -5", str(ex.exception))
+
+    def test_shard_workers_default(self):
+        self.assertEqual(1, kinesis.ClientConfig(self.config_input, self.boto_client).shard_workers)
+
+    def test_shard_workers_invalid_string(self):
+        self.config_input["shard_workers"] = "4"
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-kinesis_scraper.yaml: \"shard_workers\" must be an integer of 1 or greater.\n"
+                      "Value provided: <class 'str'> '4'", str(ex.exception))
+
+    def test_shard_workers_invalid_over_max(self):
+        self.config_input["shard_workers"] = 65
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertEqual("config-kinesis_scraper.yaml: shard_workers cannot exceed 64", str(ex.exception))
+
+    def test_checkpoint_interval_default(self):
+        self.assertEqual(0, kinesis.ClientConfig(self.config_input, self.boto_client).checkpoint_interval)
+
+    def test_checkpoint_interval_invalid_negative(self):
+        self.config_input["checkpoint_interval"] = -1
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-kinesis_scraper.yaml: \"checkpoint_interval\" must be an integer of 0 or greater.\n"
+                      "Value provided: <class 'int'> -1", str(ex.exception))
+
+    def test_poll_mode_default(self):
+        config = kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertEqual('fixed', config.poll_mode)
+        self.assertEqual(5.0, config.max_poll_delay)
+
+    def test_poll_mode_invalid(self):
+        self.config_input["poll_mode"] = "fast"
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-kinesis_scraper.yaml: poll_mode must be one of: ['fixed', 'adaptive']\n"
+                      "Value provided: <class 'str'> 'fast'", str(ex.exception))
+
+    def test_max_poll_delay_invalid_over_max(self):
+        self.config_input["max_poll_delay"] = 61
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertEqual("config-kinesis_scraper.yaml: max_poll_delay must be between 0-60", str(ex.exception))
+
+    def test_poll_target_bytes_invalid_over_max(self):
+        self.config_input["poll_target_bytes"] = 10485761
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-kinesis_scraper.yaml: \"poll_target_bytes\" must be an integer between 0-10485760.\n"
+                      "Value provided: <class 'int'> 10485761", str(ex.exception))
+
+    def test_stop_at_latest_invalid(self):
+        self.config_input["stop_at_latest"] = "yes"
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-kinesis_scraper.yaml: \"stop_at_latest\" must be true or false.\n"
+                      "Value provided: <class 'str'> 'yes'", str(ex.exception))
+
+    def test_timestamp_slices_default(self):
+        self.assertEqual(1, kinesis.ClientConfig(self.config_input, self.boto_client).timestamp_slices)
+
+    def test_timestamp_slices_invalid_max(self):
+        self.config_input["timestamp_slices"] = 65
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertEqual("config-kinesis_scraper.yaml: timestamp_slices cannot exceed 64", str(ex.exception))
+
+    def test_timestamp_slices_requires_timestamps(self):
+        self.config_input["timestamp_slices"] = 4
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-kinesis_scraper.yaml: If \"timestamp_slices\" is greater than 1, \"starting_position\" "
+                      "must be AT_TIMESTAMP and \"ending_position\" must be LATEST or *_TIMESTAMP.\n"
+                      "Values provided: 'TRIM_HORIZON' 'LATEST'", str(ex.exception))
+
+    def test_derive(self):
+        self.config_input["starting_position"] = "AT_TIMESTAMP"
+        self.config_input["timestamp_slices"] = 4
+        config = kinesis.ClientConfig(self.config_input, self.boto_client)
+        derived = config.derive(timestamp_slices=1, ending_position="BEFORE_SEQUENCE_NUMBER",
+                                ending_sequence_number="33333")
+
+        self.assertEqual(1, derived.timestamp_slices)
+        self.assertEqual("33333", derived.ending_sequence_number)
+        self.assertEqual("2022-12-01 00:00:00", derived.starting_timestamp)
+        self.assertIs(self.boto_client, derived.boto_client)
+        self.assertEqual(4, config.timestamp_slices)
+
+    def test_shard_map_cache_ttl_default(self):
+        self.assertEqual(0, kinesis.ClientConfig(self.config_input, self.boto_client).shard_map_cache_ttl)
+
+    def test_shard_map_cache_ttl_invalid(self):
+        self.config_input["shard_map_cache_ttl"] = 3601
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-kinesis_scraper.yaml: \"shard_map_cache_ttl\" must be an integer between 0-3600.\n"
+                      "Value provided: <class 'int'> 3601", str(ex.exception))
+
+    def test_partition_keys_invalid(self):
+        self.config_input["partition_keys"] = ["tenant-1", ""]
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-kinesis_scraper.yaml: \"partition_keys\" must be a list of strings, each 1-256 "
+                      "characters long.\nValue provided: <class 'list'> ['tenant-1', '']", str(ex.exception))
+
+    def test_partition_key_filter_requires_keys(self):
+        self.config_input["partition_key_filter"] = True
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertEqual("config-kinesis_scraper.yaml: partition_key_filter requires at least one of partition_keys",
+                         str(ex.exception))
+
+    def test_record_filter_unknown_key(self):
+        self.config_input["record_filter"] = {"data_field": {"status": "FAILED"}}
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-kinesis_scraper.yaml: \"record_filter\" must be a dictionary holding "
+                      "partition_key_pattern and/or data_fields.", str(ex.exception))
+
+    def test_record_filter_invalid_pattern(self):
+        self.config_input["record_filter"] = {"partition_key_pattern": "tenant-("}
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-kinesis_scraper.yaml: Invalid partition_key_pattern: <class 'str'> 'tenant-('",
+                      str(ex.exception))
+
+    def test_kpl_deaggregate_invalid(self):
+        self.config_input["kpl_deaggregate"] = "yes"
+        with self.assertRaises(exceptions.ConfigValidationError) as ex:
+            kinesis.ClientConfig(self.config_input, self.boto_client)
+        self.assertEqual("config-kinesis_scraper.yaml: \"kpl_deaggregate\" must be true or false.\nValue provided: "
+                         "<class 'str'> 'yes'", str(ex.exception))
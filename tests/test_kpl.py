@@ -0,0 +1,215 @@
+import os
+import json
+import base64
+import hashlib
+import datetime
+import tempfile
+import unittest
+import botocore
+from unittest import mock
+from unittest.mock import patch
+import includes.kpl as kpl
+import includes.kinesis_client as kinesis
+
+
+def encode_varint(value: int) -> bytes:
+    encoded = b''
+    while value > 0x7f:
+        encoded += bytes([(value & 0x7f) | 0x80])
+        value >>= 7
+    return encoded + bytes([value])
+
+
+def encode_field(field_number: int, value) -> bytes:
+    if isinstance(value, int):
+        return encode_varint(field_number << 3) + encode_varint(value)
+    return encode_varint(field_number << 3 | 2) + encode_varint(len(value)) + value
+
+
+def aggregate(user_records: list, *, explicit_hash_keys: list = None) -> bytes:
+    """Builds a KPL aggregated record from (partition key, explicit hash key index or None, data) tuples."""
+    partition_keys = []
+    for partition_key, _, _ in user_records:
+        if partition_key not in partition_keys:
+            partition_keys.append(partition_key)
+    message = b''.join([encode_field(1, i.encode('utf-8')) for i in partition_keys])
+    message += b''.join([encode_field(2, i.encode('utf-8')) for i in (explicit_hash_keys or [])])
+    for partition_key, explicit_hash_key_index, data in user_records:
+        record = encode_field(1, partition_keys.index(partition_key))
+        if explicit_hash_key_index is not None:
+            record += encode_field(2, explicit_hash_key_index)
+        record += encode_field(3, data)
+        message += encode_field(3, record)
+    return kpl.MAGIC + message + hashlib.md5(message).digest()
+
+
+def generate_record_raw_dict(data, *, sequence_number: str = "1") -> dict:
+    return {
+        "SequenceNumber": sequence_number,
+        "ApproximateArrivalTimestamp": datetime.datetime(2023, 1, 1),
+        "Data": data,
+        "PartitionKey": "aggregate-key",
+    }
+
+
+def generate_record(data, *, sequence_number: str = "1", base64_encoded: bool = False) -> kinesis.Record:
+    return kinesis.Record(generate_record_raw_dict(data, sequence_number=sequence_number),
+                          base64_encoded=base64_encoded)
+
+
+class TestKpl(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.aggregated = aggregate([("a", None, b'{"n": 0}'), ("b", 0, b'{"n": 1}'), ("a", None, b'')],
+                                    explicit_hash_keys=["12345"])
+
+    def tearDown(self):
+        pass
+
+    def test_is_aggregated(self):
+        self.assertTrue(kpl.is_aggregated(self.aggregated))
+        self.assertFalse(kpl.is_aggregated(b'{"n": 0}'))
+        self.assertFalse(kpl.is_aggregated(kpl.MAGIC))
+        self.assertFalse(kpl.is_aggregated(self.aggregated.decode('latin-1')))
+
+    def test_digest_mismatch(self):
+        damaged = self.aggregated[:-1] + bytes([self.aggregated[-1] ^ 0xff])
+        self.assertFalse(kpl.is_aggregated(damaged))
+        with self.assertRaises(ValueError) as ex:
+            kpl.deaggregate(damaged)
+        self.assertEqual("The data is not a KPL aggregated record (magic prefix or MD5 digest mismatch)",
+                         str(ex.exception))
+
+    def test_deaggregate(self):
+        self.assertEqual([("a", None, b'{"n": 0}'), ("b", "12345", b'{"n": 1}'), ("a", None, b'')],
+                         kpl.deaggregate(self.aggregated))
+
+    def test_try_deaggregate(self):
+        self.assertEqual(kpl.deaggregate(self.aggregated), kpl.try_deaggregate(self.aggregated))
+        self.assertIsNone(kpl.try_deaggregate(b'{"n": 0}'))
+
+    def test_deaggregate_large_record(self):
+        # Multi-byte varint lengths
+        data = b'x' * 70000
+        self.assertEqual([("a", None, data)], kpl.deaggregate(aggregate([("a", None, data)])))
+
+    def test_missing_table_entry(self):
+        with self.assertRaises(ValueError) as ex:
+            kpl.deaggregate(aggregate([("a", 3, b'data')], explicit_hash_keys=["12345"]))
+        self.assertIn("An aggregated user record references a missing table entry", str(ex.exception))
+
+    def test_truncated_message(self):
+        message = encode_field(1, b'a') + encode_varint(3 << 3 | 2) + encode_varint(50) + b'short'
+        with self.assertRaises(ValueError) as ex:
+            kpl.deaggregate(kpl.MAGIC + message + hashlib.md5(message).digest())
+        self.assertEqual("Truncated length delimited protobuf field", str(ex.exception))
+
+    def test_sub_records(self):
+        sub_records = generate_record(self.aggregated, sequence_number="42").sub_records()
+        self.assertEqual([0, 1, 2], [i.SubSequenceNumber for i in sub_records])
+        self.assertEqual(["42", "42", "42"], [i.SequenceNumber for i in sub_records])
+        self.assertEqual(["a", "b", "a"], [i.PartitionKey for i in sub_records])
+        self.assertEqual([None, "12345", None], [i.ExplicitHashKey for i in sub_records])
+        self.assertEqual({"SequenceNumber": "42", "ApproximateArrivalTimestamp": "2023-01-01 00:00:00",
+                          "Data": base64.b64encode(b'{"n": 1}').decode('utf-8'), "PartitionKey": "b",
+                          "SubSequenceNumber": 1, "ExplicitHashKey": "12345"},
+                         json.loads(sub_records[1].toJson()))
+
+    def test_sub_records_base64_encoded(self):
+        record = generate_record(base64.b64encode(self.aggregated).decode('utf-8'), base64_encoded=True)
+        self.assertEqual([b'{"n": 0}', b'{"n": 1}', b''], [i.Data for i in record.sub_records()])
+
+    def test_sub_records_not_aggregated(self):
+        record = generate_record(b'{"n": 0}')
+        self.assertEqual([record], record.sub_records())
+        self.assertNotIn("SubSequenceNumber", json.loads(record.toJson()))
+
+
+class TestKplScrape(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.config_input = {
+            'debug_level': "INFO",
+            'stream_name': "user_activities",
+            'shard_ids': ["shardId-1"],
+            'starting_position': "TRIM_HORIZON",
+            'ending_position': "TOTAL_RECORDS_PER_SHARD",
+            'total_records_per_shard': 2,
+            'poll_batch_size': 100,
+            'poll_delay': 0,
+            'max_empty_polls': 1,
+            'kpl_deaggregate': True,
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def scraped_records(self) -> list:
+        records = []
+        for file_name in sorted(os.listdir("scraped_events/shardId-1"), key=lambda x: int(x.split('-')[0])):
+            with open(f"scraped_events/shardId-1/{file_name}") as f:
+                records.append(json.load(f))
+        return records
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_records_deaggregated(self, mocked_shard_iterator, mocked_get_records):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        mocked_get_records.return_value = kinesis.Boto3GetRecordsResponse({
+            "Records": [
+                generate_record_raw_dict(aggregate([("a", None, b'0'), ("b", None, b'1')]), sequence_number="1"),
+                generate_record_raw_dict(b'2', sequence_number="2"),
+                generate_record_raw_dict(aggregate([("c", None, b'3')]), sequence_number="3"),
+            ],
+            "MillisBehindLatest": 0,
+            "NextShardIterator": "iter2",
+        })
+        self.config_input['record_filter'] = {'partition_key_pattern': '^(a|b)$'}
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        result = client._scrape_records_for_shard_iterator(kinesis.GetRecordsIterationInput(
+            total_found_records=0, response_no_records=0, loop_count=0, shard_iterator='the_iter_id',
+            shard_id="shardId-1"))
+
+        # total_records_per_shard counts Kinesis records, the record filter sees the user records
+        self.assertEqual(3, result.total_found_records)
+        self.assertTrue(result.break_iteration)
+        self.assertEqual([("1", 0, "a", "0"), ("1", 1, "b", "1")],
+                         [(i['SequenceNumber'], i['SubSequenceNumber'], i['PartitionKey'],
+                           base64.b64decode(i['Data']).decode('utf-8')) for i in self.scraped_records()])
+
+    @patch('includes.kinesis_client.Client._get_records', spec_set=kinesis.Client._get_records)
+    @patch('includes.kinesis_client.Client._shard_iterator', spec_set=kinesis.Client._shard_iterator)
+    def test_records_kept_aggregated(self, mocked_shard_iterator, mocked_get_records):
+        mocked_shard_iterator.return_value = 'the_iter_id'
+        aggregated = aggregate([("a", None, b'0'), ("b", None, b'1')])
+        mocked_get_records.return_value = kinesis.Boto3GetRecordsResponse({
+            "Records": [generate_record_raw_dict(aggregated, sequence_number="1")],
+            "MillisBehindLatest": 0,
+            "NextShardIterator": "iter2",
+        })
+        self.config_input['kpl_deaggregate'] = False
+        client = kinesis.Client(kinesis.ClientConfig(self.config_input, self.boto_client))
+        client._scrape_records_for_shard_iterator(kinesis.GetRecordsIterationInput(
+            total_found_records=0, response_no_records=0, loop_count=0, shard_iterator='the_iter_id',
+            shard_id="shardId-1"))
+
+        self.assertEqual([aggregated], [base64.b64decode(i['Data']) for i in self.scraped_records()])
@@ -0,0 +1,314 @@
+import os
+import base64
+import hashlib
+import datetime
+import tempfile
+import unittest
+import botocore
+from unittest import mock
+from unittest.mock import patch
+import includes.exceptions as exceptions
+import includes.kinesis_client as kinesis
+import includes.kpl as kpl
+import includes.lambda_client as lambda_client
+import includes.lineage as lineage
+import includes.record_store as record_store
+import includes.replay_cache as replay_cache
+
+
+def encode_varint(value: int) -> bytes:
+    encoded = b''
+    while value > 0x7f:
+        encoded += bytes([(value & 0x7f) | 0x80])
+        value >>= 7
+    return encoded + bytes([value])
+
+
+def encode_field(field_number: int, value) -> bytes:
+    if isinstance(value, int):
+        return encode_varint(field_number << 3) + encode_varint(value)
+    return encode_varint(field_number << 3 | 2) + encode_varint(len(value)) + value
+
+
+def aggregate(user_records: list) -> bytes:
+    """Builds a KPL aggregated record from (partition key, data) tuples."""
+    partition_keys = list(dict.fromkeys([i for i, _ in user_records]))
+    message = b''.join([encode_field(1, i.encode('utf-8')) for i in partition_keys])
+    for partition_key, data in user_records:
+        message += encode_field(3, encode_field(1, partition_keys.index(partition_key)) + encode_field(3, data))
+    return kpl.MAGIC + message + hashlib.md5(message).digest()
+
+
+class TestPrecheck(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.shard_id = "shardId-000000000001"
+        record_writer = record_store.FileRecordWriter(self.shard_id)
+        record_writer.write(record_writer.encode(kinesis.Record.from_batch([{
+            "SequenceNumber": str(i),
+            "ApproximateArrivalTimestamp": datetime.datetime(2023, 1, 1),
+            "Data": f"data-{i}".encode('utf-8'),
+            "PartitionKey": "pkey",
+        } for i in range(9)])))
+        record_writer.close()
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.config_input = {
+            "debug_level": "INFO",
+            "region_name": "us-east-1",
+            "function_name": "kworker",
+            "stream_name": "user_activities",
+            "batch_size": 4,
+            "local_dlq": False,
+            "local_dlq_fullevent": False,
+            "retry_attempts": 0,
+            "bisect_on_error": False,
+            "tumbling_window_seconds": "N/A",
+            "custom_checkpoints": "N/A",
+            "precheck_workers": 2,
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def precheck(self, records_cache: replay_cache.ReplayCache = None) -> None:
+        client = lambda_client.Client(lambda_client.ClientConfig(self.config_input, self.boto_client))
+        files = lambda_client.Files(shard_id=self.shard_id)
+        client._precheck_files_batch_iterator(lambda_client.FileListBatchIterator(files, self.shard_id, 4),
+                                              records_cache)
+
+    @patch('includes.lambda_client.PRECHECK_CHUNK_SIZE', 2)
+    def test_records_cached_in_file_order(self):
+        with replay_cache.ReplayCache(max_records=100) as records_cache:
+            self.precheck(records_cache)
+            self.assertEqual(9, records_cache.memory_count)
+            files = list(lambda_client.Files(shard_id=self.shard_id))
+            self.assertEqual([str(i) for i in range(9)], [records_cache.pop(i).SequenceNumber for i in files])
+
+    @patch('includes.lambda_client.PRECHECK_CHUNK_SIZE', 2)
+    def test_records_over_cache_spilled_by_workers(self):
+        with replay_cache.ReplayCache(max_records=3) as records_cache:
+            self.precheck(records_cache)
+            self.assertEqual((3, 6), (records_cache.memory_count, records_cache.spilled_count))
+            files = list(lambda_client.Files(shard_id=self.shard_id))
+            self.assertEqual([str(i) for i in range(9)], [records_cache.pop(i).SequenceNumber for i in files])
+
+    def test_worker_returns_records_within_budget(self):
+        files = list(lambda_client.Files(shard_id=self.shard_id))[0:4]
+        records, spill_path, spill_index, failures = lambda_client._precheck_files(
+            f"scraped_events/{self.shard_id}", files, 1, True)
+        try:
+            self.assertEqual([files[0]], [i for i, _ in records])
+            self.assertEqual(files[1:], [i for i, _, _ in spill_index])
+            self.assertEqual([], failures)
+        finally:
+            os.remove(spill_path)
+
+        records, spill_path, spill_index, failures = lambda_client._precheck_files(
+            f"scraped_events/{self.shard_id}", files, 0, False)
+        self.assertEqual(([], None, [], []), (records, spill_path, spill_index, failures))
+
+    @patch('includes.lambda_client.PRECHECK_CHUNK_SIZE', 2)
+    def test_failures_aggregated(self):
+        files = list(lambda_client.Files(shard_id=self.shard_id))
+        for file in [files[7], files[2]]:
+            with open(f"scraped_events/{self.shard_id}/{file}", 'w') as f:
+                f.write('{"SequenceNumber": 5}')
+        with self.assertRaises(exceptions.FileProcessingError) as ex:
+            self.precheck()
+        self.assertIn(f"Scrapped file 'scraped_events/{self.shard_id}/{files[2]}' is not in the expected format",
+                      str(ex.exception))
+        self.assertIn("'SequenceNumber' attribute must be of type", str(ex.exception))
+        self.assertIn("1 more files failed the check as well.", str(ex.exception))
+
+    def test_single_process(self):
+        self.config_input["precheck_workers"] = 1
+        with replay_cache.ReplayCache(max_records=100) as records_cache:
+            with patch('concurrent.futures.ProcessPoolExecutor') as mocked_executor:
+                self.precheck(records_cache)
+            mocked_executor.assert_not_called()
+            self.assertEqual(9, records_cache.memory_count)
+
+    def test_invalid_precheck_workers(self):
+        self.config_input["precheck_workers"] = 65
+        with self.assertRaises(ValueError) as ex:
+            lambda_client.ClientConfig(self.config_input, self.boto_client)
+        self.assertIn("config-lambda_replay.yaml: precheck_workers must be a whole number from 0 to 64.",
+                      str(ex.exception))
+
+
+class TestBeginProcessing(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.config_input = {
+            "debug_level": "INFO",
+            "region_name": "us-east-1",
+            "function_name": "kworker",
+            "stream_name": "user_activities",
+            "batch_size": 4,
+            "local_dlq": False,
+            "local_dlq_fullevent": False,
+            "retry_attempts": 0,
+            "bisect_on_error": False,
+            "tumbling_window_seconds": "N/A",
+            "custom_checkpoints": "N/A",
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    @patch('includes.lambda_client.Client._process_shard_dir', autospec=True)
+    def test_dot_directories_skipped(self, mocked_process_shard_dir):
+        os.makedirs("scraped_events/shardId-000000000001")
+        # Left behind by an interrupted timestamp slices scrape
+        os.makedirs("scraped_events/.slices-shardId-000000000002/slice-0/shardId-000000000002")
+        client = lambda_client.Client(lambda_client.ClientConfig(self.config_input, self.boto_client))
+        client.begin_processing()
+        mocked_process_shard_dir.assert_called_once_with(client, "shardId-000000000001")
+
+    @patch('includes.lambda_client.Client._process_shard_dir', autospec=True)
+    def test_lineage_order(self, mocked_process_shard_dir):
+        for i in range(4):
+            os.makedirs(f"scraped_events/shardId-00000000000{i}")
+        # shardId-000000000000 was split into shardId-000000000001 and shardId-000000000002. shardId-000000000003 is
+        # not in the lineage, so it is replayed last
+        lineage.ShardLineage({"shardId-000000000002": ["shardId-000000000000"],
+                              "shardId-000000000001": ["shardId-000000000000"],
+                              "shardId-000000000000": []}).save("scraped_events")
+        client = lambda_client.Client(lambda_client.ClientConfig(self.config_input, self.boto_client))
+        client.begin_processing()
+        self.assertEqual(["shardId-000000000000", "shardId-000000000002", "shardId-000000000001",
+                          "shardId-000000000003"],
+                         [i.args[1] for i in mocked_process_shard_dir.call_args_list])
+
+
+class TestBuildPayload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.shard_id = "shardId-000000000001"
+        record_writer = record_store.FileRecordWriter(self.shard_id)
+        record_writer.write(record_writer.encode(kinesis.Record.from_batch([{
+            "SequenceNumber": str(i),
+            "ApproximateArrivalTimestamp": datetime.datetime(2023, 1, 1),
+            "Data": data,
+            "PartitionKey": "pkey",
+        } for i, data in enumerate([aggregate([("a", b'0'), ("b", b'1')]), b'2'])])))
+        record_writer.close()
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.config_input = {
+            "debug_level": "INFO",
+            "region_name": "us-east-1",
+            "function_name": "kworker",
+            "stream_name": "user_activities",
+            "batch_size": 4,
+            "local_dlq": False,
+            "local_dlq_fullevent": False,
+            "retry_attempts": 0,
+            "bisect_on_error": False,
+            "tumbling_window_seconds": "N/A",
+            "custom_checkpoints": "N/A",
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def payload_records(self) -> list:
+        client = lambda_client.Client(lambda_client.ClientConfig(self.config_input, self.boto_client))
+        payload = client._build_payload(self.shard_id, lambda_client.Files(shard_id=self.shard_id))
+        return [(i["kinesis"]["sequenceNumber"], i["kinesis"]["partitionKey"],
+                 base64.b64decode(i["kinesis"]["data"])) for i in payload["Records"]]
+
+    def test_kpl_aggregation_expand(self):
+        self.config_input["kpl_aggregation"] = "expand"
+        self.assertEqual([("0", "a", b'0'), ("0", "b", b'1'), ("1", "pkey", b'2')], self.payload_records())
+
+    def test_kpl_aggregation_keep(self):
+        self.assertEqual([("0", "pkey", aggregate([("a", b'0'), ("b", b'1')])), ("1", "pkey", b'2')],
+                         self.payload_records())
+
+
+class TestDlq(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.shard_id = "shardId-000000000001"
+        record_writer = record_store.SegmentRecordWriter(self.shard_id, max_records=3, max_bytes=1000000)
+        record_writer.write(record_writer.encode(kinesis.Record.from_batch([{
+            "SequenceNumber": str(i),
+            "ApproximateArrivalTimestamp": datetime.datetime(2023, 1, 1),
+            "Data": f"data-{i}".encode('utf-8'),
+            "PartitionKey": "pkey",
+        } for i in range(5)])))
+        record_writer.close()
+        self.boto_client = mock.Mock(spec=botocore.client.BaseClient, create=True, autospec=True)
+        self.config_input = {
+            "debug_level": "INFO",
+            "region_name": "us-east-1",
+            "function_name": "kworker",
+            "stream_name": "user_activities",
+            "batch_size": 4,
+            "local_dlq": True,
+            "local_dlq_fullevent": False,
+            "retry_attempts": 0,
+            "bisect_on_error": False,
+            "tumbling_window_seconds": "N/A",
+            "custom_checkpoints": "N/A",
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_segment_records_written_to_dlq_segment(self):
+        files = list(lambda_client.Files(shard_id=self.shard_id))
+        client = lambda_client.Client(lambda_client.ClientConfig(self.config_input, self.boto_client))
+        client._dlq(self.shard_id, lambda_client.Files(file_list=files[1:4]))
+
+        dlq_dir = f"dlq/{self.shard_id}"
+        self.assertEqual(["segment-000001.jsonl"], record_store.list_segments(dlq_dir))
+        # The dlq directory is replayed like a scraped shard directory
+        dlq_refs = record_store.segment_refs(dlq_dir, "segment-000001.jsonl")
+        with record_store.RecordReader(dlq_dir) as reader:
+            self.assertEqual(["1", "2", "3"], [kinesis.Record(reader.read(i)).SequenceNumber for i in dlq_refs])
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+import includes.exceptions as exceptions
+import includes.lineage as lineage
+import includes.shard_map as shard_map
+
+
+def generate_shard(shard_id: str, parent_shard_id: str = None, adjacent_parent_shard_id: str = None):
+    return shard_map.Shard({
+        "shard_id": shard_id,
+        "parent_shard_id": parent_shard_id,
+        "adjacent_parent_shard_id": adjacent_parent_shard_id,
+        "starting_hash_key": "0",
+        "ending_hash_key": "100",
+        "starting_sequence_number": "1",
+    })
+
+
+class TestShardLineage(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        # shardId-0 was split into 2 and 3, which were then merged into 4. shardId-1 was never resharded
+        self.shards = [
+            generate_shard("shardId-4", "shardId-2", "shardId-3"),
+            generate_shard("shardId-3", "shardId-0"),
+            generate_shard("shardId-2", "shardId-0"),
+            generate_shard("shardId-1"),
+            generate_shard("shardId-0", "shardId-expired"),
+        ]
+
+    def tearDown(self):
+        pass
+
+    def test_order(self):
+        shard_lineage = lineage.ShardLineage.from_shards(self.shards)
+        self.assertEqual(["shardId-1", "shardId-0", "shardId-3", "shardId-2", "shardId-4"], shard_lineage.order())
+        self.assertEqual(["shardId-2", "shardId-3"], shard_lineage.parents("shardId-4"))
+        self.assertEqual([], shard_lineage.parents("shardId-0"))
+
+    def test_ready(self):
+        shard_lineage = lineage.ShardLineage.from_shards(self.shards)
+        self.assertEqual(["shardId-1", "shardId-0"], shard_lineage.ready(set()))
+        self.assertEqual(["shardId-3", "shardId-2"], shard_lineage.ready({"shardId-0", "shardId-1"}))
+        self.assertEqual(["shardId-2"], shard_lineage.ready({"shardId-0", "shardId-1", "shardId-3"}))
+
+    def test_descendants(self):
+        shard_lineage = lineage.ShardLineage.from_shards(self.shards)
+        self.assertEqual(["shardId-3", "shardId-2", "shardId-4"], shard_lineage.descendants("shardId-0"))
+        self.assertEqual([], shard_lineage.descendants("shardId-1"))
+
+    def test_subset_ignores_other_parents(self):
+        shard_lineage = lineage.ShardLineage.from_shards(self.shards, ["shardId-4", "shardId-2"])
+        self.assertEqual(["shardId-2"], shard_lineage.parents("shardId-4"))
+        self.assertEqual(["shardId-2", "shardId-4"], shard_lineage.order())
+
+    def test_cycle(self):
+        with self.assertRaises(exceptions.InvalidArgumentException):
+            lineage.ShardLineage({"shardId-0": ["shardId-1"], "shardId-1": ["shardId-0"]})
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.assertIsNone(lineage.load(temp_dir))
+            lineage.ShardLineage.from_shards(self.shards).save(temp_dir)
+            self.assertEqual([lineage.LINEAGE_FILE_NAME], os.listdir(temp_dir))
+            loaded = lineage.load(temp_dir)
+        self.assertEqual(["shardId-1", "shardId-0", "shardId-3", "shardId-2", "shardId-4"], loaded.order())
+        self.assertEqual(["shardId-2", "shardId-3"], loaded.parents("shardId-4"))
@@ -0,0 +1,83 @@
+import threading
+import unittest
+import includes.pipeline as pipeline
+import includes.exceptions as exceptions
+
+
+class TestPipeline(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_invalid_queue_size(self):
+        with self.assertRaises(exceptions.InvalidArgumentException) as ex:
+            pipeline.Pipeline("test", [lambda x: x], 0)
+        self.assertIn("A pipeline requires at least one handler and a queue_size of 1 or greater. Received: "
+                      "1 handlers, queue_size 0", str(ex.exception))
+
+    def test_items_flow_through_stages_in_order(self):
+        results = []
+        with pipeline.Pipeline("test", [lambda x: x * 2, lambda x: x + 1, results.append], 2) as test_pipeline:
+            for i in range(50):
+                test_pipeline.submit(i)
+        self.assertEqual([i * 2 + 1 for i in range(50)], results)
+
+    def test_stages_run_on_separate_threads(self):
+        thread_names = set()
+
+        def record_thread(item):
+            thread_names.add(threading.current_thread().name)
+            return item
+
+        with pipeline.Pipeline("test", [record_thread, record_thread], 1) as test_pipeline:
+            test_pipeline.submit(1)
+        self.assertEqual({"test-stage0", "test-stage1"}, thread_names)
+
+    def test_backpressure_blocks_submit(self):
+        release = threading.Event()
+        test_pipeline = pipeline.Pipeline("test", [lambda x: release.wait()], 1)
+        test_pipeline.start()
+
+        # One item is being handled, one sits in the queue: a third submit must block until the stage frees up
+        test_pipeline.submit(1)
+        test_pipeline.submit(2)
+        submitter = threading.Thread(target=test_pipeline.submit, args=(3,))
+        submitter.start()
+        submitter.join(timeout=0.2)
+        self.assertTrue(submitter.is_alive())
+
+        release.set()
+        submitter.join(timeout=5)
+        self.assertFalse(submitter.is_alive())
+        test_pipeline.close()
+
+    def test_stage_error_raised_on_close(self):
+        handled = []
+
+        def fail_on_two(item):
+            if item == 2:
+                raise ValueError("bad item")
+            handled.append(item)
+
+        test_pipeline = pipeline.Pipeline("test", [fail_on_two], 5)
+        test_pipeline.start()
+        for i in range(5):
+            try:
+                test_pipeline.submit(i)
+            except exceptions.InternalError:
+                break
+        with self.assertRaises(exceptions.InternalError) as ex:
+            test_pipeline.close()
+        self.assertIn("Pipeline test stage failed: ValueError('bad item')", str(ex.exception))
+        # Nothing after the failed item is handled
+        self.assertEqual([0, 1], handled)
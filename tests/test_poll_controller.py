@@ -0,0 +1,143 @@
+import unittest
+from unittest.mock import patch
+import includes.poll_controller as poll_controller
+import includes.exceptions as exceptions
+
+
+class TestFixedPollController(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    @patch('time.sleep')
+    def test_wait(self, mocked_sleep):
+        controller = poll_controller.FixedPollController(0.5)
+        controller.records_received(0, 0)
+        controller.wait()
+        mocked_sleep.assert_called_once_with(0.5)
+        self.assertFalse(controller.retry_throttled)
+
+    @patch('time.sleep')
+    def test_no_wait(self, mocked_sleep):
+        poll_controller.FixedPollController(0).wait()
+        mocked_sleep.assert_not_called()
+
+    def test_unknown_poll_mode(self):
+        with self.assertRaises(exceptions.InvalidArgumentException) as ex:
+            poll_controller.new_poll_controller('fast', poll_delay=0, max_poll_delay=5)
+        self.assertEqual("Unknown poll_mode: <class 'str'> 'fast'", str(ex.exception))
+
+
+class TestAdaptivePollController(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.controller = poll_controller.AdaptivePollController(0.5, 4)
+
+    def tearDown(self):
+        pass
+
+    def test_full_rate_while_behind(self):
+        self.assertEqual(0.2, self.controller.next_delay())
+        self.controller.records_received(100, 3600000)
+        self.assertEqual(0.2, self.controller.next_delay())
+        # Empty responses while far behind are gaps in the stream, not the end of it
+        self.controller.records_received(0, 3600000)
+        self.controller.records_received(0, 3600000)
+        self.assertEqual(0.2, self.controller.next_delay())
+
+    def test_exponential_backoff_when_caught_up(self):
+        self.controller.records_received(10, 0)
+        self.assertEqual(0.5, self.controller.next_delay())
+        delays = []
+        for i in range(5):
+            self.controller.records_received(0, 0)
+            delays.append(self.controller.next_delay())
+        self.assertEqual([1.0, 2.0, 4.0, 4.0, 4.0], delays)
+
+        self.controller.records_received(1, 0)
+        self.assertEqual(0.5, self.controller.next_delay())
+
+    def test_aimd_on_throttling(self):
+        self.controller.throttled()
+        self.controller.throttled()
+        self.assertEqual(1.25, self.controller.calls_per_second)
+        self.assertEqual(0.8, self.controller.next_delay())
+
+        for i in range(3):
+            self.controller.records_received(100, 3600000)
+        self.assertEqual(2.0, self.controller.calls_per_second)
+
+        for i in range(20):
+            self.controller.throttled()
+        self.assertEqual(poll_controller.MIN_CALLS_PER_SECOND, self.controller.calls_per_second)
+        for i in range(100):
+            self.controller.records_received(100, 3600000)
+        self.assertEqual(poll_controller.MAX_CALLS_PER_SECOND, self.controller.calls_per_second)
+
+    @patch('time.sleep')
+    @patch('time.monotonic')
+    def test_wait_deducts_elapsed_time(self, mocked_monotonic, mocked_sleep):
+        mocked_monotonic.side_effect = [100.0, 100.05, 100.2, 101.0, 101.0]
+        self.controller.wait()
+        mocked_sleep.assert_called_once_with(0.2)
+        self.controller.wait()
+        mocked_sleep.assert_called_with(0.2 - (100.05 - 100.0))
+        # Writing the previous batch already took longer than the delay
+        self.controller.wait()
+        self.assertEqual(2, mocked_sleep.call_count)
+
+
+class TestAdaptiveBatchLimit(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.batch_limit = poll_controller.AdaptiveBatchLimit(100, 1048576)
+
+    def tearDown(self):
+        pass
+
+    def test_initial_limit(self):
+        self.assertEqual(100, self.batch_limit.limit)
+        self.batch_limit.observe(0, 0)
+        self.assertEqual(100, self.batch_limit.limit)
+        self.assertIsNone(self.batch_limit.average_record_size)
+
+    def test_small_records_capped_at_api_max(self):
+        self.batch_limit.observe(100, 5000)
+        self.assertEqual(poll_controller.MAX_GET_RECORDS_LIMIT, self.batch_limit.limit)
+
+    def test_large_records(self):
+        self.batch_limit.observe(10, 10485760)
+        self.assertEqual(1, self.batch_limit.limit)
+        self.batch_limit.observe(1, 262144)
+        # Moving average: 0.3 * 256KB + 0.7 * 1MB
+        self.assertAlmostEqual(812646.4, self.batch_limit.average_record_size)
+        self.assertEqual(1, self.batch_limit.limit)
+        self.batch_limit.observe(10, 2621440)
+        self.assertEqual(1, self.batch_limit.limit)
+        for i in range(10):
+            self.batch_limit.observe(10, 2621440)
+        self.assertEqual(3, self.batch_limit.limit)
@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch
+import includes.read_budget as read_budget
+import includes.exceptions as exceptions
+
+
+class TestTokenBucket(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_invalid_rate(self):
+        with self.assertRaises(exceptions.InvalidArgumentException) as ex:
+            read_budget.TokenBucket(0)
+        self.assertEqual("rate must be greater than 0. Received: <class 'int'> 0", str(ex.exception))
+
+    @patch('time.monotonic')
+    def test_reserve(self, mocked_monotonic):
+        mocked_monotonic.return_value = 100.0
+        bucket = read_budget.TokenBucket(2)
+        self.assertEqual(0, bucket.reserve(1))
+        self.assertEqual(0, bucket.reserve(1))
+        self.assertEqual(0.5, bucket.reserve(1))
+        self.assertEqual(1.0, bucket.reserve(1))
+
+        # Refilled after waiting, but never to more than one second worth of tokens
+        mocked_monotonic.return_value = 110.0
+        self.assertEqual(0, bucket.reserve(2))
+        self.assertEqual(0.5, bucket.reserve(1))
+
+    @patch('time.monotonic')
+    def test_debt(self, mocked_monotonic):
+        mocked_monotonic.return_value = 100.0
+        bucket = read_budget.TokenBucket(1000)
+        self.assertEqual(0, bucket.debt_wait())
+        bucket.reserve(3000)
+        self.assertEqual(2.0, bucket.debt_wait())
+        mocked_monotonic.return_value = 101.5
+        self.assertEqual(0.5, bucket.debt_wait())
+
+
+class TestReadBudget(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_disabled(self):
+        self.assertFalse(read_budget.ReadBudget().enabled)
+        self.assertTrue(read_budget.ReadBudget(stream_bytes_per_second=1000).enabled)
+
+    @patch('time.sleep')
+    @patch('time.monotonic')
+    def test_shard_calls_limited_per_shard(self, mocked_monotonic, mocked_sleep):
+        mocked_monotonic.return_value = 100.0
+        budget = read_budget.ReadBudget(shard_calls_per_second=1)
+        budget.before_call("shardId-1")
+        budget.before_call("shardId-2")
+        mocked_sleep.assert_not_called()
+        budget.before_call("shardId-1")
+        mocked_sleep.assert_called_once_with(1.0)
+
+    @patch('time.sleep')
+    @patch('time.monotonic')
+    def test_stream_calls_shared_by_shards(self, mocked_monotonic, mocked_sleep):
+        mocked_monotonic.return_value = 100.0
+        budget = read_budget.ReadBudget(stream_calls_per_second=2)
+        budget.before_call("shardId-1")
+        budget.before_call("shardId-2")
+        budget.before_call("shardId-3")
+        mocked_sleep.assert_called_once_with(0.5)
+
+    @patch('time.sleep')
+    @patch('time.monotonic')
+    def test_bytes_waited_out_by_next_call(self, mocked_monotonic, mocked_sleep):
+        mocked_monotonic.return_value = 100.0
+        budget = read_budget.ReadBudget(shard_bytes_per_second=1000, stream_bytes_per_second=4000)
+        budget.before_call("shardId-1")
+        budget.after_call("shardId-1", 2500)
+        budget.before_call("shardId-2")
+        mocked_sleep.assert_not_called()
+        budget.before_call("shardId-1")
+        mocked_sleep.assert_called_once_with(1.5)
@@ -0,0 +1,75 @@
+import json
+import base64
+import datetime
+import unittest
+import includes.exceptions as exceptions
+import includes.kinesis_client as kinesis
+import includes.record_filter as record_filter
+
+
+def generate_record(pkey: str, data, *, base64_encoded: bool = False) -> kinesis.Record:
+    return kinesis.Record({
+        "SequenceNumber": "1",
+        "ApproximateArrivalTimestamp": datetime.datetime(2023, 1, 1),
+        "Data": data,
+        "PartitionKey": pkey,
+    }, base64_encoded=base64_encoded)
+
+
+class TestRecordFilter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.records = [
+            generate_record("tenant-1", json.dumps({"detail": {"status": "FAILED"}}).encode('utf-8')),
+            generate_record("tenant-2", json.dumps({"detail": {"status": "OK"}}).encode('utf-8')),
+            generate_record("tenant-1", b'not json'),
+            generate_record("tenant-3", json.dumps({"detail": {"status": "ERROR"}})),
+            generate_record("tenant-1", base64.b64encode(json.dumps({"detail": {"status": "ERROR"}}).encode('utf-8'))
+                            .decode('utf-8'), base64_encoded=True),
+        ]
+
+    def tearDown(self):
+        pass
+
+    def test_disabled(self):
+        self.assertFalse(record_filter.RecordFilter().enabled)
+        self.assertEqual(self.records, record_filter.RecordFilter().apply("shardId-1", self.records))
+
+    def test_partition_keys(self):
+        matched = record_filter.RecordFilter(partition_keys=["tenant-2", "tenant-3"]).apply("shardId-1", self.records)
+        self.assertEqual([self.records[1], self.records[3]], matched)
+
+    def test_partition_key_pattern(self):
+        matched = record_filter.RecordFilter(partition_key_pattern=r'-[23]$').apply("shardId-1", self.records)
+        self.assertEqual([self.records[1], self.records[3]], matched)
+
+    def test_data_fields(self):
+        data_filter = record_filter.RecordFilter(data_fields={"detail.status": ["FAILED", "ERROR"]})
+        self.assertEqual([self.records[0], self.records[3], self.records[4]],
+                         data_filter.apply("shardId-1", self.records))
+        self.assertEqual([], record_filter.RecordFilter(data_fields={"detail.status.code": "FAILED"})
+                         .apply("shardId-1", self.records))
+
+    def test_conditions_combined(self):
+        combined = record_filter.RecordFilter(partition_key_pattern=r'^tenant-1$', data_fields={"detail.status": "ERROR"})
+        self.assertEqual([self.records[4]], combined.apply("shardId-1", self.records))
+
+    def test_counters(self):
+        partition_key_filter = record_filter.RecordFilter(partition_keys=["tenant-1"])
+        partition_key_filter.apply("shardId-1", self.records)
+        partition_key_filter.apply("shardId-1", self.records[0:2])
+        partition_key_filter.apply("shardId-2", self.records[1:2])
+        self.assertEqual((7, 4), partition_key_filter.counters("shardId-1"))
+        self.assertEqual((1, 0), partition_key_filter.counters("shardId-2"))
+        self.assertEqual((0, 0), partition_key_filter.counters("shardId-3"))
+
+    def test_invalid_pattern(self):
+        with self.assertRaises(exceptions.InvalidArgumentException):
+            record_filter.RecordFilter(partition_key_pattern='(')
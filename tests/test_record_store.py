@@ -0,0 +1,263 @@
+import os
+import json
+import datetime
+import tempfile
+import unittest
+import unittest.mock
+import includes.kinesis_client as kinesis
+import includes.lambda_client as lambda_client
+import includes.record_store as record_store
+
+
+def generate_records(num: int, start: int = 0) -> kinesis.RecordsCollection:
+    return kinesis.RecordsCollection([kinesis.Record({
+        "SequenceNumber": str(i),
+        "ApproximateArrivalTimestamp": datetime.datetime(2023, 1, 1, 10, 0, i % 60),
+        "Data": f"data{i}",
+        "PartitionKey": "pkey",
+    }) for i in range(start, start + num)])
+
+
+class TestSegmentRecordWriter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_no_dir_created_without_records(self):
+        writer = record_store.SegmentRecordWriter("shardId-1", max_records=10, max_bytes=1000)
+        writer.write(writer.encode(generate_records(0)))
+        writer.close()
+        self.assertFalse(os.path.exists("scraped_events/shardId-1"))
+
+    def test_rotate_on_max_records(self):
+        writer = record_store.SegmentRecordWriter("shardId-1", max_records=4, max_bytes=1000000)
+        writer.write(writer.encode(generate_records(6)))
+        writer.write(writer.encode(generate_records(4, start=6)))
+        writer.close()
+
+        self.assertEqual(["segment-000001.jsonl", "segment-000002.jsonl", "segment-000003.jsonl"],
+                         record_store.list_segments("scraped_events/shardId-1"))
+        refs = record_store.segment_refs("scraped_events/shardId-1", "segment-000002.jsonl")
+        self.assertEqual(4, len(refs))
+        record = json.loads(record_store.read_record("scraped_events/shardId-1", refs[1]))
+        self.assertEqual("5", record["SequenceNumber"])
+
+    def test_rotate_on_max_bytes(self):
+        writer = record_store.SegmentRecordWriter("shardId-1", max_records=1000, max_bytes=1)
+        writer.write(writer.encode(generate_records(3)))
+        writer.close()
+        self.assertEqual(3, len(record_store.list_segments("scraped_events/shardId-1")))
+
+    def test_new_writer_starts_new_segment(self):
+        for i in range(2):
+            writer = record_store.SegmentRecordWriter("shardId-1", max_records=1000, max_bytes=1000000)
+            writer.write(writer.encode(generate_records(2)))
+            writer.close()
+        self.assertEqual(["segment-000001.jsonl", "segment-000002.jsonl"],
+                         record_store.list_segments("scraped_events/shardId-1"))
+
+    def test_segment_index(self):
+        writer = record_store.SegmentRecordWriter("shardId-1", max_records=3, max_bytes=1000000)
+        writer.write(writer.encode(generate_records(4)))
+        writer.close()
+
+        dir_path = "scraped_events/shardId-1"
+        self.assertEqual(["segment-000001.idx", "segment-000001.jsonl", "segment-000002.idx", "segment-000002.jsonl"],
+                         sorted(os.listdir(dir_path)))
+        refs = record_store.segment_refs(dir_path, "segment-000001.jsonl")
+        with unittest.mock.patch('includes.record_store.open', wraps=open) as mocked_open:
+            self.assertEqual(refs, record_store.segment_refs(dir_path, "segment-000001.jsonl"))
+        self.assertEqual([unittest.mock.call(f"{dir_path}/segment-000001.idx", 'r')], mocked_open.call_args_list)
+
+        # Without an index, or with one out of date, the segment itself is read
+        os.remove(f"{dir_path}/segment-000001.idx")
+        self.assertEqual(refs, record_store.segment_refs(dir_path, "segment-000001.jsonl"))
+        with open(f"{dir_path}/segment-000002.jsonl", "ab") as f:
+            f.write(writer.encode(generate_records(1, start=4))[0])
+        self.assertEqual(2, len(record_store.segment_refs(dir_path, "segment-000002.jsonl")))
+
+    def test_replay_files_reads_both_layouts(self):
+        file_writer = record_store.FileRecordWriter("shardId-1")
+        file_writer.write(file_writer.encode(generate_records(2)))
+        segment_writer = record_store.SegmentRecordWriter("shardId-1", max_records=2, max_bytes=1000000)
+        segment_writer.write(segment_writer.encode(generate_records(3, start=2)))
+        segment_writer.close()
+
+        files = list(lambda_client.Files(shard_id="shardId-1"))
+        self.assertEqual(["1-2023-01-01_10;00;00.json", "2-2023-01-01_10;00;01.json"], files[0:2])
+        self.assertEqual(5, len(files))
+
+        sequence_numbers = []
+        for file in files:
+            lambda_client.Files.validate_file_name(file)
+            contents = record_store.read_record("scraped_events/shardId-1", file)
+            sequence_numbers.append(kinesis.Record(contents).SequenceNumber)
+        self.assertEqual(["0", "1", "2", "3", "4"], sequence_numbers)
+
+
+    def test_truncate_to_position(self):
+        writer = record_store.SegmentRecordWriter("shardId-1", max_records=4, max_bytes=1000000)
+        writer.write(writer.encode(generate_records(6)))
+        position, record_count = writer.position, writer.record_count
+        writer.write(writer.encode(generate_records(5, start=6)))
+        writer.close()
+
+        writer = record_store.SegmentRecordWriter("shardId-1", max_records=4, max_bytes=1000000)
+        writer.truncate(record_count, position)
+        writer.write(writer.encode(generate_records(1, start=20)))
+        writer.close()
+
+        dir_path = "scraped_events/shardId-1"
+        self.assertEqual(["segment-000001.jsonl", "segment-000002.jsonl", "segment-000003.jsonl"],
+                         record_store.list_segments(dir_path))
+        self.assertEqual(2, len(record_store.segment_refs(dir_path, "segment-000002.jsonl")))
+        self.assertFalse(os.path.exists(f"{dir_path}/segment-000004.idx"))
+        self.assertEqual(7, writer.record_count)
+        refs = record_store.segment_refs(dir_path, "segment-000003.jsonl")
+        self.assertEqual("20", json.loads(record_store.read_record(dir_path, refs[0]))["SequenceNumber"])
+
+    def test_adopt_appends_segments(self):
+        writer = record_store.SegmentRecordWriter("shardId-1", max_records=2, max_bytes=1000000)
+        writer.write(writer.encode(generate_records(3)))
+        other = record_store.SegmentRecordWriter("shardId-1", max_records=2, max_bytes=1000000, base_dir="slice")
+        other.write(other.encode(generate_records(3, start=3)))
+        other.close()
+
+        writer.adopt("slice/shardId-1")
+        writer.write(writer.encode(generate_records(1, start=6)))
+        writer.close()
+
+        dir_path = "scraped_events/shardId-1"
+        self.assertEqual(7, writer.record_count)
+        self.assertEqual([], os.listdir("slice/shardId-1"))
+        sequence_numbers = []
+        for file_name in record_store.list_segments(dir_path):
+            for ref in record_store.segment_refs(dir_path, file_name):
+                sequence_numbers.append(json.loads(record_store.read_record(dir_path, ref))["SequenceNumber"])
+        self.assertEqual([str(i) for i in range(7)], sequence_numbers)
+
+
+class TestRecordReader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        writer = record_store.SegmentRecordWriter("shardId-1", max_records=3, max_bytes=1000000)
+        writer.write(writer.encode(generate_records(5)))
+        writer.close()
+        self.dir_path = "scraped_events/shardId-1"
+        self.refs = [j for i in record_store.list_segments(self.dir_path)
+                     for j in record_store.segment_refs(self.dir_path, i)]
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_segment_refs(self):
+        self.assertEqual(["segment-000001.jsonl@0", "segment-000002.jsonl@0"], [self.refs[0], self.refs[3]])
+        self.assertEqual(5, len(self.refs))
+        self.assertTrue(all([record_store.is_segment_ref(i) for i in self.refs]))
+
+    def test_each_segment_opened_once(self):
+        with unittest.mock.patch('includes.record_store.open', create=True, side_effect=open) as mocked_open:
+            with record_store.RecordReader(self.dir_path) as reader:
+                sequence_numbers = [json.loads(reader.read(i))["SequenceNumber"] for i in self.refs]
+        self.assertEqual([str(i) for i in range(5)], sequence_numbers)
+        self.assertEqual(2, mocked_open.call_count)
+
+    def test_out_of_order(self):
+        with record_store.RecordReader(self.dir_path) as reader:
+            sequence_numbers = [json.loads(reader.read(self.refs[i]))["SequenceNumber"] for i in [4, 1, 2, 0, 2]]
+        self.assertEqual(["4", "1", "2", "0", "2"], sequence_numbers)
+        self.assertEqual("3", json.loads(record_store.read_record(self.dir_path, self.refs[3]))["SequenceNumber"])
+
+
+class TestFileRecordWriter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_directory_counted_once(self):
+        os.makedirs("scraped_events/shardId-1")
+        for i in range(3):
+            with open(f"scraped_events/shardId-1/{i + 1}-2023-01-01_10;00;00.json", "x") as f:
+                f.write("{}")
+
+        writer = record_store.FileRecordWriter("shardId-1")
+        with unittest.mock.patch('includes.common.count_files_in_dir',
+                                 wraps=record_store.common.count_files_in_dir) as mocked_count_files_in_dir:
+            for i in range(4):
+                writer.write(writer.encode(generate_records(2, start=i * 2)))
+        self.assertEqual(1, mocked_count_files_in_dir.call_count)
+        self.assertEqual(11, writer.record_count)
+        self.assertTrue(os.path.exists("scraped_events/shardId-1/11-2023-01-01_10;00;07.json"))
+
+    def test_seeded_record_count(self):
+        writer = record_store.FileRecordWriter("shardId-1", record_count=41)
+        writer.write(writer.encode(generate_records(1)))
+        self.assertEqual(["42-2023-01-01_10;00;00.json"], os.listdir("scraped_events/shardId-1"))
+
+    def test_existing_file_not_overwritten(self):
+        writer = record_store.FileRecordWriter("shardId-1", record_count=0)
+        writer.write(writer.encode(generate_records(1)))
+        writer = record_store.FileRecordWriter("shardId-1", record_count=0)
+        with self.assertRaises(FileExistsError):
+            writer.write(writer.encode(generate_records(1)))
+
+    def test_truncate_removes_files_after_record_count(self):
+        writer = record_store.FileRecordWriter("shardId-1", record_count=0)
+        writer.write(writer.encode(generate_records(5)))
+
+        writer = record_store.FileRecordWriter("shardId-1")
+        writer.truncate(3, None)
+        writer.write(writer.encode(generate_records(1, start=10)))
+        self.assertEqual(["1-2023-01-01_10;00;00.json", "2-2023-01-01_10;00;01.json",
+                          "3-2023-01-01_10;00;02.json", "4-2023-01-01_10;00;10.json"],
+                         sorted(os.listdir("scraped_events/shardId-1")))
+
+    def test_adopt_renumbers_files(self):
+        writer = record_store.FileRecordWriter("shardId-1")
+        writer.write(writer.encode(generate_records(2)))
+        other = record_store.FileRecordWriter("shardId-1", base_dir="slice")
+        other.write(other.encode(generate_records(2, start=2)))
+
+        writer.adopt("slice/shardId-1")
+        writer.adopt("missing/shardId-1")
+        self.assertEqual(4, writer.record_count)
+        self.assertEqual(["1-2023-01-01_10;00;00.json", "2-2023-01-01_10;00;01.json",
+                          "3-2023-01-01_10;00;02.json", "4-2023-01-01_10;00;03.json"],
+                         sorted(os.listdir("scraped_events/shardId-1")))
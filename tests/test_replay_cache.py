@@ -0,0 +1,91 @@
+import os
+import datetime
+import tempfile
+import unittest
+import includes.exceptions as exceptions
+import includes.kinesis_client as kinesis
+import includes.replay_cache as replay_cache
+
+
+def generate_record(sequence_number: str) -> kinesis.Record:
+    return kinesis.Record({
+        "SequenceNumber": sequence_number,
+        "ApproximateArrivalTimestamp": datetime.datetime(2023, 1, 1).isoformat(),
+        "Data": "ZGF0YQ==",
+        "PartitionKey": "pkey",
+    }, base64_encoded=True)
+
+
+class TestReplayCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.records = [generate_record(str(i)) for i in range(5)]
+
+    def tearDown(self):
+        pass
+
+    def test_records_kept_in_memory(self):
+        with replay_cache.ReplayCache(max_records=10) as records_cache:
+            for i, record in enumerate(self.records):
+                records_cache.add(f"{i}-file.json", record)
+            self.assertEqual((5, 0), (records_cache.memory_count, records_cache.spilled_count))
+            self.assertIs(self.records[3], records_cache.pop("3-file.json"))
+            self.assertIsNone(records_cache.pop("3-file.json"))
+            self.assertEqual(4, records_cache.memory_count)
+
+    def test_records_spilled(self):
+        with replay_cache.ReplayCache(max_records=2) as records_cache:
+            for i, record in enumerate(self.records):
+                records_cache.add(f"segment-000001.jsonl@{i * 100}", record)
+            self.assertEqual((2, 3), (records_cache.memory_count, records_cache.spilled_count))
+            # Spilled records are read back in any order
+            for i in [4, 2, 0, 3, 1]:
+                record = records_cache.pop(f"segment-000001.jsonl@{i * 100}")
+                self.assertEqual(self.records[i], record)
+                self.assertTrue(record.base64_encoded)
+            self.assertEqual((0, 0), (records_cache.memory_count, records_cache.spilled_count))
+
+    def test_adopt_spill_file(self):
+        lines = [i.toJson().encode('utf-8') + b'\n' for i in self.records[0:2]]
+        with tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False) as f:
+            f.write(b''.join(lines))
+        records_cache = replay_cache.ReplayCache(max_records=1)
+        records_cache.add("1-file.json", self.records[2])
+        records_cache.adopt_spill_file(f.name, [("2-file.json", 0, len(lines[0])),
+                                                ("3-file.json", len(lines[0]), len(lines[1]))])
+        self.assertEqual((1, 2), (records_cache.memory_count, records_cache.spilled_count))
+        self.assertEqual(self.records[1], records_cache.pop("3-file.json"))
+        self.assertEqual(self.records[0], records_cache.pop("2-file.json"))
+        records_cache.close()
+        self.assertFalse(os.path.exists(f.name))
+
+    def test_memory_capacity(self):
+        with replay_cache.ReplayCache(max_records=2) as records_cache:
+            records_cache.add("1-file.json", self.records[0])
+            self.assertEqual(1, records_cache.memory_capacity)
+            records_cache.add("2-file.json", self.records[1])
+            records_cache.add("3-file.json", self.records[2])
+            self.assertEqual(0, records_cache.memory_capacity)
+
+    def test_pop_not_cached(self):
+        with replay_cache.ReplayCache(max_records=0) as records_cache:
+            self.assertIsNone(records_cache.pop("1-file.json"))
+
+    def test_close(self):
+        records_cache = replay_cache.ReplayCache(max_records=1)
+        records_cache.add("1-file.json", self.records[0])
+        records_cache.add("2-file.json", self.records[1])
+        records_cache.close()
+        self.assertEqual((0, 0), (records_cache.memory_count, records_cache.spilled_count))
+        self.assertIsNone(records_cache.pop("2-file.json"))
+
+    def test_invalid_max_records(self):
+        with self.assertRaises(exceptions.InvalidArgumentException):
+            replay_cache.ReplayCache(max_records=-1)
@@ -0,0 +1,55 @@
+import unittest
+from includes.sequence_number import SequenceNumber
+import includes.sequence_number as sequence_number
+
+
+class TestSequenceNumber(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_exact(self):
+        value = '49590338271490256608559692538361571095921575989136588898'
+        self.assertEqual(value, str(SequenceNumber(value)))
+        # Float parsing of the same value would make both equal
+        self.assertLess(SequenceNumber(value),
+                        SequenceNumber('49590338271490256608559692538361571095921575989136588899'))
+        self.assertEqual(SequenceNumber(value), SequenceNumber(int(value)))
+
+    def test_ordering_not_lexicographic(self):
+        self.assertLess(SequenceNumber('9'), SequenceNumber('10'))
+        self.assertEqual(['2', '10', '100'], [str(i) for i in sorted([SequenceNumber(j) for j in ['100', '2', '10']])])
+
+    def test_encode(self):
+        values = [SequenceNumber(i) for i in
+                  ['0', '9', '10', '49590338271490256608559692538361571095921575989136588898']]
+        encoded = [i.encode() for i in values]
+        self.assertEqual([sequence_number.ENCODED_SIZE] * 4, [len(i) for i in encoded])
+        self.assertEqual(encoded, sorted(encoded))
+        self.assertEqual(values, [SequenceNumber.decode(i) for i in encoded])
+
+    def test_repr(self):
+        self.assertEqual("SequenceNumber('123')", repr(SequenceNumber('123')))
+
+    def test_invalid(self):
+        for value in ['', 'abc', '-1', '1.5', '4.9e55', '12\n', -1, 1.5, None, {}, True, '9' * 78, 2 ** 256]:
+            with self.assertRaises(ValueError):
+                SequenceNumber(value)
+        self.assertFalse(sequence_number.is_sequence_number('1 2'))
+        self.assertTrue(sequence_number.is_sequence_number('0'))
+
+    def test_decode_invalid(self):
+        with self.assertRaises(ValueError) as ex:
+            SequenceNumber.decode(b'\x01')
+        self.assertEqual("An encoded sequence number must be 32 bytes. Value provided: <class 'bytes'> b'\\x01'",
+                         str(ex.exception))
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import includes.shard_map as shard_map
+
+
+def generate_shard(shard_id: str, starting_hash_key: str = "0", ending_hash_key: str = "100") -> shard_map.Shard:
+    return shard_map.Shard.from_response({
+        "ShardId": shard_id,
+        "HashKeyRange": {"StartingHashKey": starting_hash_key, "EndingHashKey": ending_hash_key},
+        "SequenceNumberRange": {"StartingSequenceNumber": "1"},
+    })
+
+
+class TestHashKeyRouting(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        # Two shards splitting the 128-bit hash key space in half
+        self.shards = [
+            generate_shard("shardId-0", "0", str(2 ** 127 - 1)),
+            generate_shard("shardId-1", str(2 ** 127), str(2 ** 128 - 1)),
+        ]
+
+    def tearDown(self):
+        pass
+
+    def test_hash_key(self):
+        self.assertEqual(0x0cc175b9c0f1b6a831c399e269772661, shard_map.hash_key("a"))
+
+    def test_owning_shards(self):
+        # md5("a") starts with 0x0c and md5("b") with 0x92
+        self.assertEqual(["shardId-0"], [i.shard_id for i in shard_map.owning_shards(self.shards, ["a"])])
+        self.assertEqual(["shardId-1"], [i.shard_id for i in shard_map.owning_shards(self.shards, ["b"])])
+        self.assertEqual(["shardId-0", "shardId-1"],
+                         [i.shard_id for i in shard_map.owning_shards(self.shards, ["b", "a"])])
+        self.assertEqual([], shard_map.owning_shards(self.shards, []))
+
+
+class TestShardMapCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.shard_filter = {'Type': 'AT_LATEST'}
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        cache = shard_map.ShardMapCache("user_activities", ttl=60)
+        self.assertIsNone(cache.load(self.shard_filter))
+        cache.save(self.shard_filter, [generate_shard("shardId-0"), generate_shard("shardId-1")])
+
+        shards = cache.load(self.shard_filter)
+        self.assertEqual(["shardId-0", "shardId-1"], [i.shard_id for i in shards])
+        self.assertFalse(shards[0].closed)
+        self.assertIsNone(cache.load(None))
+        self.assertEqual(["user_activities.json"], os.listdir("shard_maps"))
+
+    @patch('time.time')
+    def test_expired(self, mocked_time):
+        cache = shard_map.ShardMapCache("user_activities", ttl=60)
+        mocked_time.return_value = 1000.0
+        cache.save(self.shard_filter, [generate_shard("shardId-0")])
+        mocked_time.return_value = 1059.0
+        self.assertIsNotNone(cache.load(self.shard_filter))
+        mocked_time.return_value = 1060.0
+        self.assertIsNone(cache.load(self.shard_filter))
+
+    def test_damaged_file_ignored(self):
+        cache = shard_map.ShardMapCache("user_activities", ttl=60)
+        os.makedirs("shard_maps")
+        with open(cache.file_path, "w") as f:
+            f.write("{not json")
+        self.assertIsNone(cache.load(self.shard_filter))
@@ -0,0 +1,49 @@
+import unittest
+import includes.exceptions as exceptions
+from includes.shard_window import ShardWindow
+
+
+class TestShardWindow(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.window_input = {
+            'shard_id': "shardId-000001",
+            'start_timestamp': "2023-01-01 00:00:00",
+            'end_timestamp': "2023-01-01 01:00:00",
+            'first_sequence_number': "9",
+            'last_sequence_number': "10",
+        }
+
+    def tearDown(self):
+        pass
+
+    def test_valid(self):
+        window = ShardWindow(self.window_input)
+        self.assertFalse(window.empty)
+        self.assertEqual("10", window.config_overrides()['ending_sequence_number'])
+
+    def test_empty(self):
+        self.window_input['first_sequence_number'] = None
+        self.window_input['last_sequence_number'] = None
+        window = ShardWindow(self.window_input)
+        self.assertTrue(window.empty)
+        with self.assertRaises(exceptions.InvalidArgumentException):
+            window.config_overrides()
+
+    def test_invalid_half_empty(self):
+        self.window_input['last_sequence_number'] = None
+        with self.assertRaises(exceptions.InvalidArgumentException):
+            ShardWindow(self.window_input)
+
+    def test_invalid_order(self):
+        self.window_input['first_sequence_number'] = "11"
+        with self.assertRaises(exceptions.InvalidArgumentException) as ex:
+            ShardWindow(self.window_input)
+        self.assertIn("first_sequence_number cannot be greater than last_sequence_number", str(ex.exception))